@@ -0,0 +1,263 @@
+# backfill.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+import candleCache as cc
+import candleDecoder as cd
+import rateLimiter as rl
+
+
+def split_range(from_date, to_date, interval):
+    """
+    Split a date range into windows getCandleData serves in one request.
+
+    Parameters:
+        from_date (datetime): Start, naive IST.
+        to_date (datetime): End, naive IST.
+        interval (str): Candle interval (e.g., ONE_MINUTE).
+
+    Returns:
+        list: (start, end) datetimes, consecutive and non-overlapping.
+    """
+    span = timedelta(days=cc.MAX_DAYS[interval])
+    windows = []
+    start = from_date
+    while start <= to_date:
+        end = min(start + span, to_date)
+        windows.append((start, end))
+        start = end + timedelta(minutes=1)
+    return windows
+
+
+def stitch(parts):
+    """
+    Join window results in time order, keeping the later copy of a repeated bar.
+
+    Parameters:
+        parts (list): (ts, ohlc, volume) tuples as returned by candleDecoder.decode.
+
+    Returns:
+        tuple: (ts, ohlc, volume) sorted by timestamp with unique timestamps.
+    """
+    if not parts:
+        return cd.decode([])
+    ts = np.concatenate([p[0] for p in parts])
+    ohlc = np.concatenate([p[1] for p in parts])
+    volume = np.concatenate([p[2] for p in parts])
+    order = np.argsort(ts, kind='stable')
+    ts, ohlc, volume = ts[order], ohlc[order], volume[order]
+    last = np.append(ts[1:] != ts[:-1], True)
+    return ts[last], ohlc[last], volume[last]
+
+
+class BackfillProgress:
+    """Thread-safe counters of a backfill run."""
+
+    def __init__(self, windows):
+        self.windows = windows
+        self.done = 0
+        self.failed = 0
+        self.retries = 0
+        self.candles = 0
+        self.waited = 0.0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, candles=0, failed=0, retries=0, waited=0.0):
+        with self._lock:
+            self.done += 1
+            self.candles += candles
+            self.failed += failed
+            self.retries += retries
+            self.waited += waited
+
+    def snapshot(self):
+        """
+        Get the progress so far.
+
+        Returns:
+            dict: Windows done/total, failures, retries, candles, elapsed seconds,
+            windows and candles per second, rate limiter wait and ETA.
+        """
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            rate = self.done / elapsed if elapsed else 0.0
+            return {
+                'windows_done': self.done,
+                'windows_total': self.windows,
+                'failed': self.failed,
+                'retries': self.retries,
+                'candles': self.candles,
+                'elapsed_s': elapsed,
+                'windows_per_s': rate,
+                'candles_per_s': self.candles / elapsed if elapsed else 0.0,
+                'limiter_wait_s': self.waited,
+                'eta_s': (self.windows - self.done) / rate if rate else None,
+            }
+
+
+class Backfill:
+    """
+    Concurrent historical candle download.
+
+    Each (exchange, token, interval, from, to) job is split into windows no
+    longer than getCandleData allows. Windows of all jobs share one bounded
+    thread pool and the process-wide getCandleData rate limiter, and are
+    stitched back per job in time order with repeated bars removed.
+    """
+
+    def __init__(self, smartApi, workers=4, retries=3, limiter=None, on_progress=None):
+        self.smartApi = smartApi
+        self.workers = workers
+        self.retries = retries
+        self.limiter = limiter or rl.rate_limiter('getCandleData')
+        self.on_progress = on_progress
+        self.progress = None
+
+    def _fetch(self, exchange, symboltoken, interval, start, end):
+        historicParam = {
+            "exchange": exchange,
+            "symboltoken": str(symboltoken),
+            "interval": interval,
+            "fromdate": start.strftime("%Y-%m-%d %H:%M"),
+            "todate": end.strftime("%Y-%m-%d %H:%M"),
+        }
+        waited = 0.0
+        for attempt in range(self.retries + 1):
+            waited += self.limiter.acquire()
+            try:
+                hist_data = self.smartApi.getCandleData(historicParam)
+                if hist_data and hist_data.get('status'):
+                    return cd.decode(hist_data['data']), attempt, waited
+                message = hist_data.get('message') if hist_data else 'empty response'
+            except Exception as e:
+                message = str(e)
+            if attempt < self.retries:
+                time.sleep(0.5 * 2 ** attempt)
+        logger.error(f"Backfill of {exchange}:{symboltoken} {interval} {historicParam['fromdate']} - {historicParam['todate']} failed: {message}")
+        return None, self.retries, waited
+
+    def run(self, jobs):
+        """
+        Download every job and return the stitched candles.
+
+        Parameters:
+            jobs (list): (exchange, symboltoken, interval, from_date, to_date) tuples,
+                dates as naive IST datetimes.
+
+        Returns:
+            dict: (exchange, symboltoken, interval) -> candleCache.CandleFrame.
+                A window that still fails after the retries leaves a gap, see `progress.failed`.
+        """
+        windows = []
+        for exchange, symboltoken, interval, from_date, to_date in jobs:
+            key = (exchange, str(symboltoken), interval)
+            for i, (start, end) in enumerate(split_range(from_date, to_date, interval)):
+                windows.append((key, i, start, end))
+        self.progress = BackfillProgress(len(windows))
+
+        parts = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._fetch, key[0], key[1], key[2], start, end): (key, i)
+                       for key, i, start, end in windows}
+            for future in as_completed(futures):
+                key, i = futures[future]
+                candles, retries, waited = future.result()
+                self.progress.add(0 if candles is None else len(candles[0]), candles is None, retries, waited)
+                if candles is not None:
+                    parts.setdefault(key, []).append((i, candles))
+                if self.on_progress:
+                    self.on_progress(self.progress.snapshot())
+
+        frames = {}
+        for exchange, symboltoken, interval, from_date, to_date in jobs:
+            key = (exchange, str(symboltoken), interval)
+            frame = frames[key] = cc.CandleFrame()
+            frame.merge(*stitch([c for i, c in sorted(parts.get(key, []), key=lambda p: p[0])]))
+        return frames
+
+    def chain(self, chain, interval, from_date, to_date, spot=None, width=None, field='C'):
+        """
+        Download every strike of an option chain as one panel.
+
+        Parameters:
+            chain (optionChain.OptionChain): Chain of one underlying and expiry.
+            interval (str): Candle interval.
+            from_date (datetime): Start, naive IST.
+            to_date (datetime): End, naive IST.
+            spot (float, optional): Underlying price, to limit the panel to `width` strikes around ATM.
+            width (int, optional): Strikes on each side of ATM. Defaults to the whole chain.
+            field (str, optional): O, H, L, C or V. Defaults to 'C'.
+
+        Returns:
+            pandas.DataFrame: One row per timestamp (IST), columns (CE/PE, strike).
+        """
+        if width is None or spot is None:
+            rows = range(len(chain))
+        else:
+            i = chain.atm_index(spot)
+            rows = range(max(0, i - width), min(len(chain), i + width + 1))
+        legs = [(pe_ce, chain.strikes[i], token)
+                for pe_ce, tokens in (('CE', chain.ce_token), ('PE', chain.pe_token))
+                for i in rows for token in (tokens[i],) if token >= 0]
+        frames = self.run([(chain.exch_seg, token, interval, from_date, to_date) for _, _, token in legs])
+
+        columns = {}
+        for pe_ce, strike, token in legs:
+            frame = frames[(chain.exch_seg, str(token), interval)].to_frame()
+            columns[(pe_ce, strike)] = frame.set_index('timestamp')[field]
+        panel = pd.DataFrame(columns)
+        panel.columns = pd.MultiIndex.from_tuples(panel.columns, names=['pe_ce', 'strike'])
+        return panel.sort_index(axis=1)
+
+
+if __name__ == "__main__":
+    # Self-check against the local getCandleData stand-in
+    import warnings
+    warnings.filterwarnings('ignore')
+    from SmartApi import SmartConnect
+
+    import scripMaster as sm
+    import optionChain as oc
+    import fakeSmartApi as fake
+
+    # Broker-like latency, well above the request spacing, so windows overlap in flight
+    server = fake.FakeSmartApiServer(latency=1.0, rate_limit=rl.RATE_LIMITS['getCandleData'])
+    obj = SmartConnect(api_key='fake', root=server.start())
+    to_date = datetime(2024, 12, 6, 15, 30)
+    from_date = to_date - timedelta(days=90)
+
+    backfill = Backfill(obj, workers=4)
+    frames = backfill.run([('NSE', 26000, 'ONE_MINUTE', from_date, to_date), ('NSE', 26009, 'FIVE_MINUTE', from_date, to_date)])
+    stats = backfill.progress.snapshot()
+    for (exchange, token, interval), frame in frames.items():
+        expected = fake.candles(int(token), interval, from_date, to_date)
+        ts, ohlc, volume = cd.decode(expected)
+        assert np.array_equal(frame.ts, ts) and np.array_equal(frame.close, ohlc[:, 3]), (token, interval)
+        print("{}:{} {} : {} candles, stitched from {} windows".format(
+            exchange, token, interval, len(frame), len(split_range(from_date, to_date, interval))))
+    print("{windows_done}/{windows_total} windows, {candles} candles in {elapsed_s:.2f} s "
+          "({windows_per_s:.1f} windows/s, {candles_per_s:.0f} candles/s), {retries} retries, {failed} failed".format(**stats))
+    print("server: {} requests, {} rejected for rate".format(sum(server.requests.values()), server.rejected))
+
+    # An 11-strike chain, 5 days of 5-minute bars
+    strikes = np.arange(23750, 24300, 50)
+    rows = [{'token': 50000 + 2 * i + k, 'symbol': 'NIFTY12DEC24{}{}'.format(s, pe_ce), 'name': 'NIFTY',
+             'expiry': '12DEC2024', 'strike': s * 100.0, 'lotsize': 25, 'instrumenttype': 'OPTIDX',
+             'exch_seg': 'NFO', 'tick_size': 5.0}
+            for i, s in enumerate(strikes) for k, pe_ce in enumerate(('CE', 'PE'))]
+    table = sm.build_instrument_table(pd.DataFrame(rows).assign(expiry=lambda df: pd.to_datetime(df['expiry'], format='%d%b%Y')))
+    chain = oc.OptionChain(table, 'NIFTY', table['expiry'].iloc[0], 'OPTIDX')
+    panel = backfill.chain(chain, 'FIVE_MINUTE', to_date - timedelta(days=5), to_date)
+    stats = backfill.progress.snapshot()
+    assert panel.shape == (75 * 5, 2 * len(strikes)) and not panel.isna().any().any()
+    print("chain panel {} x {} in {:.2f} s ({:.1f} windows/s, {:.1f} s one at a time)".format(
+        panel.shape[0], panel.shape[1], stats['elapsed_s'], stats['windows_per_s'], stats['windows_total'] * server.latency))
+
+    server.stop()
@@ -0,0 +1,297 @@
+# basketOrder.py
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+from logzero import logger
+
+import rateLimiter as rl
+
+
+# What to do with the legs that were placed when another leg is rejected
+COMPENSATIONS = ('cancel', 'flatten', None)
+
+POOL_SIZE = 8
+
+
+def leg(token, symbol, qty, buy_sell, ordertype='MARKET', price=0, variety='NORMAL', exch_seg='NFO',
+        triggerprice=0, producttype='INTRADAY'):
+    """
+    Build the order parameters of one leg, as the strategies' place_order does.
+
+    Parameters:
+        token (str): Symbol token.
+        symbol (str): Trading symbol.
+        qty (int): Quantity.
+        buy_sell (str): BUY or SELL.
+        ordertype (str, optional): MARKET, LIMIT, STOPLOSS_LIMIT or STOPLOSS_MARKET. Defaults to MARKET.
+        price (float, optional): Limit price. Defaults to 0.
+        variety (str, optional): NORMAL, STOPLOSS, AMO or ROBO. Defaults to NORMAL.
+        exch_seg (str, optional): Exchange segment. Defaults to NFO.
+        triggerprice (float, optional): Trigger price. Defaults to 0.
+        producttype (str, optional): Product type. Defaults to INTRADAY.
+
+    Returns:
+        dict: placeOrder parameters.
+    """
+    return {
+        "variety": variety,
+        "tradingsymbol": symbol,
+        "symboltoken": str(token),
+        "transactiontype": buy_sell,
+        "exchange": exch_seg,
+        "ordertype": ordertype,
+        "producttype": producttype,
+        "duration": "DAY",
+        "price": price,
+        "squareoff": "0",
+        "stoploss": "0",
+        "quantity": qty,
+        "triggerprice": triggerprice,
+    }
+
+
+class OrderClient:
+    """
+    SmartAPI order endpoints over one pooled requests.Session.
+
+    SmartConnect opens a new connection (and TLS handshake) for every
+    request; this client keeps up to `pool_size` connections alive, so
+    concurrent legs do not wait on each other or on handshakes. Routes,
+    headers and the access token come from the SmartConnect session.
+    """
+
+    def __init__(self, smartApi, pool_size=POOL_SIZE, timeout=None):
+        self.smartApi = smartApi
+        self.timeout = timeout or smartApi.timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def post(self, route, params, endpoint=None):
+        """
+        Send one POST request to a SmartConnect route.
+
+        Parameters:
+            route (str): SmartConnect route name (e.g., api.order.place).
+            params (dict): Request body.
+            endpoint (str, optional): Rate limiter to wait on (e.g., placeOrder).
+
+        Returns:
+            dict: Response, or a failed response carrying the error message.
+        """
+        if endpoint is not None:
+            rl.rate_limiter(endpoint).acquire()
+        headers = self.smartApi.requestHeaders()
+        if self.smartApi.access_token:
+            headers["Authorization"] = "Bearer {}".format(self.smartApi.access_token)
+        try:
+            r = self.session.post(urljoin(self.smartApi.root, self.smartApi._routes[route]), data=json.dumps(params),
+                                  headers=headers, timeout=self.timeout, verify=not self.smartApi.disable_ssl)
+            return r.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"{route} failed: {e}")
+            return {'status': False, 'message': str(e), 'errorcode': '', 'data': None}
+
+    def place(self, orderparams):
+        """
+        Place one order.
+
+        Parameters:
+            orderparams (dict): placeOrder parameters, e.g. from leg().
+
+        Returns:
+            dict: Response of placeOrder.
+        """
+        return self.post("api.order.place", {k: v for k, v in orderparams.items() if v is not None}, 'placeOrder')
+
+    def cancel(self, orderid, variety='NORMAL'):
+        """
+        Cancel one order.
+
+        Parameters:
+            orderid (str): Order ID.
+            variety (str, optional): Order variety. Defaults to NORMAL.
+
+        Returns:
+            dict: Response of cancelOrder.
+        """
+        return self.post("api.order.cancel", {"variety": variety, "orderid": orderid}, 'cancelOrder')
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
+
+
+class LegResult:
+    """Outcome of one order: its parameters, order ID, status and submit-to-ack latency."""
+
+    __slots__ = ('params', 'orderid', 'status', 'message', 'latency_ms')
+
+    def __init__(self, params, response, latency_ms):
+        data = response.get('data') or {}
+        self.params = params
+        self.orderid = data.get('orderid') if response.get('status') else None
+        self.status = 'placed' if self.orderid else 'rejected'
+        self.message = response.get('message')
+        self.latency_ms = latency_ms
+
+    def __repr__(self):
+        return "LegResult({} {} {}: {} {} in {:.1f} ms)".format(
+            self.params['transactiontype'], self.params['quantity'], self.params['tradingsymbol'],
+            self.status, self.orderid or self.message, self.latency_ms)
+
+
+class BasketResult:
+    """Legs of a basket in submission order, with the compensating orders sent if a leg was rejected."""
+
+    def __init__(self, legs, compensations, elapsed_ms):
+        self.legs = legs
+        self.compensations = compensations
+        self.elapsed_ms = elapsed_ms
+
+    @property
+    def ok(self):
+        return all(result.status == 'placed' for result in self.legs)
+
+    @property
+    def orderids(self):
+        return [result.orderid for result in self.legs]
+
+    def __repr__(self):
+        return "BasketResult(ok={}, {:.1f} ms, legs={}, compensations={})".format(
+            self.ok, self.elapsed_ms, self.legs, self.compensations)
+
+
+class BasketOrder:
+    """
+    Submits every leg of a basket (a straddle, a strangle) at the same time.
+
+    Each leg goes out on its own thread over the client's pooled session,
+    so all legs reach the broker within one round trip instead of one
+    round trip each. If any leg is rejected, the legs that were placed are
+    compensated: 'cancel' cancels them (for orders that may still be open),
+    'flatten' sends an opposite MARKET order for each, None leaves them.
+    Only rejections at placement are seen here; an order the broker
+    accepts and rejects later shows up in the order book, not in the result.
+    """
+
+    def __init__(self, client, on_reject='flatten', workers=POOL_SIZE):
+        if on_reject not in COMPENSATIONS:
+            raise ValueError("on_reject must be one of {}".format(COMPENSATIONS))
+        self.client = client
+        self.on_reject = on_reject
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='basket')
+
+    def _place(self, orderparams):
+        start = time.perf_counter()
+        response = self.client.place(orderparams)
+        return LegResult(orderparams, response, (time.perf_counter() - start) * 1e3)
+
+    def _cancel(self, result):
+        start = time.perf_counter()
+        response = self.client.cancel(result.orderid, result.params['variety'])
+        cancelled = LegResult(result.params, response, (time.perf_counter() - start) * 1e3)
+        cancelled.orderid = result.orderid
+        cancelled.status = 'cancelled' if response.get('status') else 'cancel failed'
+        return cancelled
+
+    def _flatten(self, result):
+        opposite = dict(result.params, transactiontype='BUY' if result.params['transactiontype'] == 'SELL' else 'SELL',
+                        ordertype='MARKET', price=0, triggerprice=0)
+        return self._place(opposite)
+
+    def submit(self, legs):
+        """
+        Place all legs concurrently and wait for every acknowledgement.
+
+        Parameters:
+            legs (list): placeOrder parameters per leg, e.g. from leg().
+
+        Returns:
+            BasketResult: Per-leg results and latencies, and any compensating orders.
+        """
+        start = time.perf_counter()
+        results = list(self._pool.map(self._place, legs))
+        compensations = []
+        placed = [result for result in results if result.status == 'placed']
+        if len(placed) < len(results) and placed and self.on_reject is not None:
+            rejected = [result for result in results if result.status != 'placed']
+            logger.warning(f"Basket leg rejected ({rejected[0].message}); {self.on_reject} {len(placed)} placed leg(s)")
+            compensate = self._cancel if self.on_reject == 'cancel' else self._flatten
+            compensations = list(self._pool.map(compensate, placed))
+            for result in compensations:
+                if result.status not in ('placed', 'cancelled'):
+                    logger.error(f"Compensating order failed, position needs attention: {result}")
+        result = BasketResult(results, compensations, (time.perf_counter() - start) * 1e3)
+        logger.info(f"{result}")
+        return result
+
+    def close(self):
+        """Stop the worker threads and close the client."""
+        self._pool.shutdown()
+        self.client.close()
+
+
+if __name__ == "__main__":
+    # Offline check against a local stand-in for the order endpoints
+    import itertools
+    from SmartApi import SmartConnect
+    import fakeSmartApi as fake
+
+    server = fake.FakeSmartApiServer(latency=0.2)
+    orders, cancels, arrivals = [], [], []
+    ids = itertools.count(1)
+
+    def place(params):
+        orders.append(params)
+        arrivals.append(time.monotonic())
+        if params['tradingsymbol'].endswith('REJECT'):
+            return {'status': False, 'message': 'Order rejected: margin exceeds', 'errorcode': 'AB4036', 'data': None}
+        orderid = '2412060000{:05d}'.format(next(ids))
+        return {'status': True, 'message': 'SUCCESS', 'errorcode': '', 'data': {'script': params['tradingsymbol'], 'orderid': orderid}}
+
+    def cancel(params):
+        cancels.append(params['orderid'])
+        return {'status': True, 'message': 'SUCCESS', 'errorcode': '', 'data': {'orderid': params['orderid']}}
+
+    server.route(SmartConnect._routes['api.order.place'], place)
+    server.route(SmartConnect._routes['api.order.cancel'], cancel)
+    obj = SmartConnect(api_key='fake', access_token='jwt', root=server.start())
+
+    ce = leg('43512', 'NIFTY12DEC2424500CE', 25, 'SELL')
+    pe = leg('43513', 'NIFTY12DEC2424500PE', 25, 'SELL')
+
+    start = time.perf_counter()
+    obj.placeOrder(dict(ce))
+    obj.placeOrder(dict(pe))
+    sequential_ms = (time.perf_counter() - start) * 1e3
+
+    basket = BasketOrder(OrderClient(obj))
+    basket.submit([ce, pe])
+    del arrivals[:]
+    result = basket.submit([ce, pe])
+    assert result.ok and len(set(result.orderids)) == 2 and not result.compensations
+    print("straddle: sequential placeOrder {:.0f} ms, basket {:.0f} ms, legs {}".format(
+        sequential_ms, result.elapsed_ms, ['{:.0f} ms'.format(r.latency_ms) for r in result.legs]))
+    assert result.elapsed_ms < 0.75 * sequential_ms
+    # The placeOrder bucket lets both legs leave together rather than 1/rate apart
+    assert arrivals[1] - arrivals[0] < 0.5 * rl.rate_limiter('placeOrder').interval, arrivals
+
+    # A rejected PE leg: the CE leg is bought back
+    del orders[:]
+    result = basket.submit([ce, leg('43513', 'NIFTY12DEC2424500PE-REJECT', 25, 'SELL')])
+    print(result)
+    assert not result.ok and [r.status for r in result.legs] == ['placed', 'rejected']
+    assert [(o['tradingsymbol'], o['transactiontype'], o['ordertype']) for o in orders[2:]] == [('NIFTY12DEC2424500CE', 'BUY', 'MARKET')]
+
+    # With 'cancel', the placed leg is cancelled instead
+    basket.on_reject = 'cancel'
+    result = basket.submit([leg('43512', 'NIFTY12DEC2424500CE', 25, 'SELL', 'LIMIT', 120.5), leg('0', 'X-REJECT', 25, 'SELL')])
+    assert cancels == [result.legs[0].orderid] and result.compensations[0].status == 'cancelled'
+    basket.close()
+    server.stop()
+    print("rejections compensated: flatten and cancel")
@@ -0,0 +1,389 @@
+# candleCache.py
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+import scripMaster as sm
+import rateLimiter as rl
+import candleDecoder as cd
+
+
+# SmartAPI getCandleData intervals
+INTERVAL_SECONDS = {
+    'ONE_MINUTE': 60,
+    'THREE_MINUTE': 180,
+    'FIVE_MINUTE': 300,
+    'TEN_MINUTE': 600,
+    'FIFTEEN_MINUTE': 900,
+    'THIRTY_MINUTE': 1800,
+    'ONE_HOUR': 3600,
+    'ONE_DAY': 86400,
+}
+
+# Longest range getCandleData serves per request, in days
+MAX_DAYS = {
+    'ONE_MINUTE': 30,
+    'THREE_MINUTE': 60,
+    'FIVE_MINUTE': 100,
+    'TEN_MINUTE': 100,
+    'FIFTEEN_MINUTE': 200,
+    'THIRTY_MINUTE': 200,
+    'ONE_HOUR': 400,
+    'ONE_DAY': 2000,
+}
+
+NS = 1_000_000_000
+DAY_NS = 86400 * NS
+IST_OFFSET_NS = 19800 * NS
+
+
+class CandleFrame:
+    """
+    Append-only OHLCV series backed by numpy arrays.
+
+    Storage grows by doubling, so appending a bar is amortized O(1) and the
+    `ts`/`open`/... properties are views of the filled part, not copies.
+    Bars already held can be overwritten by timestamp (the forming bar is
+    updated every refresh); older history is never rewritten.
+    """
+
+    def __init__(self, capacity=1024):
+        self._ts = np.empty(capacity, dtype=np.int64)
+        self._ohlc = np.empty((capacity, 4), dtype=np.float64)
+        self._volume = np.empty(capacity, dtype=np.int64)
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def ts(self):
+        return self._ts[:self._n]
+
+    @property
+    def open(self):
+        return self._ohlc[:self._n, 0]
+
+    @property
+    def high(self):
+        return self._ohlc[:self._n, 1]
+
+    @property
+    def low(self):
+        return self._ohlc[:self._n, 2]
+
+    @property
+    def close(self):
+        return self._ohlc[:self._n, 3]
+
+    @property
+    def volume(self):
+        return self._volume[:self._n]
+
+    def _reserve(self, n):
+        if n <= len(self._ts):
+            return
+        capacity = max(n, 2 * len(self._ts))
+        for name in ('_ts', '_ohlc', '_volume'):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def append(self, ts, open, high, low, close, volume):
+        """
+        Append one bar later than every bar held.
+
+        Parameters:
+            ts (int): Bar time in ns since the epoch.
+            open, high, low, close (float): Prices.
+            volume (int): Volume.
+        """
+        self._reserve(self._n + 1)
+        self._ts[self._n] = ts
+        self._ohlc[self._n] = (open, high, low, close)
+        self._volume[self._n] = volume
+        self._n += 1
+
+    def merge(self, ts, ohlc, volume):
+        """
+        Merge bars by timestamp.
+
+        Bars with a timestamp already held overwrite it, later ones are
+        appended. Bars that would fall between held bars are dropped.
+
+        Parameters:
+            ts (numpy.ndarray): int64 ns timestamps, ascending.
+            ohlc (numpy.ndarray): float64 (n, 4) open/high/low/close.
+            volume (numpy.ndarray): int64 volume.
+
+        Returns:
+            int: Number of bars appended.
+        """
+        held = self.ts
+        pos = np.searchsorted(held, ts)
+        found = (pos < len(held)) & (held[np.minimum(pos, len(held) - 1)] == ts) if len(held) else np.zeros(len(ts), bool)
+        self._ohlc[pos[found]] = ohlc[found]
+        self._volume[pos[found]] = volume[found]
+
+        new = ts > held[-1] if len(held) else np.ones(len(ts), bool)
+        dropped = len(ts) - int(found.sum()) - int(new.sum())
+        if dropped:
+            logger.warning(f"{dropped} candles inside the held range were not merged.")
+        n = int(new.sum())
+        self._reserve(self._n + n)
+        self._ts[self._n:self._n + n] = ts[new]
+        self._ohlc[self._n:self._n + n] = ohlc[new]
+        self._volume[self._n:self._n + n] = volume[new]
+        self._n += n
+        return n
+
+    def to_frame(self, start=0):
+        """
+        Copy bars into a DataFrame in the strategies' hist_data layout.
+
+        Parameters:
+            start (int, optional): First bar position; negative counts from the end. Defaults to 0.
+
+        Returns:
+            pandas.DataFrame: timestamp (IST), O, H, L, C and V.
+        """
+        window = slice(start, self._n) if start >= 0 else slice(max(0, self._n + start), self._n)
+        return cd.to_frame(self._ts[window], self._ohlc[window].copy(), self._volume[window])
+
+    def tail(self, n=5):
+        """
+        Get the last `n` bars as a DataFrame.
+
+        Parameters:
+            n (int, optional): Number of bars. Defaults to 5.
+
+        Returns:
+            pandas.DataFrame: Same layout as to_frame.
+        """
+        return self.to_frame(-n)
+
+    def last(self):
+        """
+        Get the latest bar.
+
+        Returns:
+            pandas.Series: timestamp, O, H, L, C and V, or None if empty.
+        """
+        return self.to_frame(-1).iloc[0] if self._n else None
+
+
+def _naive_ist(ts):
+    # ns since the epoch -> naive IST datetime, as getCandleData takes dates
+    return pd.Timestamp(ts, tz='UTC').tz_convert(sm.IST).tz_localize(None).to_pydatetime()
+
+
+class CandleCache:
+    """
+    Candle history per (exchange, token, interval), refreshed incrementally.
+
+    The first request backfills `days` of history; every later refresh asks
+    getCandleData only for the bars from the last completed one onwards and
+    merges them by timestamp, so a polling loop costs one small request.
+    With an ohlcvStore.OHLCVStore, completed bars are persisted as they
+    close and the backfill starts from what the store already holds; if
+    the store starts inside the window, the bars before it are fetched too.
+    """
+
+    def __init__(self, smartApi, days=10, limiter=None, store=None):
+        self.smartApi = smartApi
+        self.days = days
+        self.limiter = limiter or rl.rate_limiter('getCandleData')
+        self.store = store
+        self._frames = {}
+        self._completed = {}
+
+    def _fetch(self, exchange, symboltoken, interval, from_date, to_date):
+        historicParam = {
+            "exchange": exchange,
+            "symboltoken": str(symboltoken),
+            "interval": interval,
+            "fromdate": from_date.strftime("%Y-%m-%d %H:%M"),
+            "todate": to_date.strftime("%Y-%m-%d %H:%M"),
+        }
+        try:
+            self.limiter.acquire()
+            hist_data = self.smartApi.getCandleData(historicParam)
+            return cd.decode(hist_data['data'])
+        except Exception as e:
+            logger.exception(f"Failed to fetch historical data: {e}")
+            return None
+
+    def get(self, exchange, symboltoken, interval, now=None):
+        """
+        Refresh and return the candles of an instrument.
+
+        Parameters:
+            exchange (str): Exchange name (e.g., NSE, NFO).
+            symboltoken (str): Symbol token.
+            interval (str): Candle interval (e.g., ONE_MINUTE, FIVE_MINUTE).
+            now (datetime, optional): Current time in IST. Defaults to now.
+
+        Returns:
+            CandleFrame: All bars held for the instrument, including the forming one.
+        """
+        key = (exchange, str(symboltoken), interval)
+        if now is None:
+            now = datetime.now(sm.IST).replace(tzinfo=None)
+        frame = self._frames.get(key)
+        from_date = now - timedelta(days=self.days)
+        if frame is None:
+            if self.store is not None:
+                frame = self.store.read(exchange, symboltoken, interval, start=from_date)
+                if len(frame) and frame.ts[0] - pd.Timestamp(from_date, tz=sm.IST).value >= INTERVAL_SECONDS[interval] * NS:
+                    # The store only holds recent bars: fetch the head of the window, up to the first stored bar
+                    head = self._fetch(exchange, symboltoken, interval, from_date, _naive_ist(frame.ts[0]))
+                    if head is not None and len(head[0]):
+                        stored = frame
+                        frame = CandleFrame(len(head[0]) + len(stored))
+                        frame.merge(*head)
+                        frame.merge(stored.ts, stored._ohlc[:len(stored)], stored.volume)
+            else:
+                frame = CandleFrame()
+            self._frames[key] = frame
+            # Stored bars had all closed when they were written
+            self._completed[key] = len(frame)
+        # An empty frame (first backfill failed or returned nothing) backfills the whole window again
+        if len(frame):
+            # Restart from the first bar that had not closed at the last refresh
+            completed = self._completed[key]
+            if completed < len(frame):
+                start = frame.ts[completed]
+            else:
+                start = frame.ts[-1] + INTERVAL_SECONDS[interval] * NS
+            from_date = _naive_ist(start)
+
+        candles = self._fetch(exchange, symboltoken, interval, from_date, now)
+        if candles is not None:
+            frame.merge(*candles)
+            now_ns = pd.Timestamp(now, tz=sm.IST).value
+            persisted = self._completed[key]
+            completed = self._completed[key] = int(np.searchsorted(frame.ts, now_ns - INTERVAL_SECONDS[interval] * NS, side='right'))
+            if self.store is not None and completed > persisted:
+                window = slice(persisted, completed)
+                self.store.append(exchange, symboltoken, interval, frame.ts[window], frame._ohlc[window], frame.volume[window])
+        return frame
+
+    def drop(self, exchange, symboltoken, interval):
+        """
+        Forget the candles of an instrument.
+
+        Parameters:
+            exchange (str): Exchange name.
+            symboltoken (str): Symbol token.
+            interval (str): Candle interval.
+        """
+        key = (exchange, str(symboltoken), interval)
+        self._frames.pop(key, None)
+        self._completed.pop(key, None)
+
+
+def benchmark(bars=3750, polls=100):
+    """
+    Compare re-downloading ten days of candles on every poll with the cache.
+
+    A stand-in for getCandleData serves synthetic one-minute bars so the
+    payload and parse costs can be measured without the API.
+
+    Parameters:
+        bars (int, optional): Bars in the backfill window. Defaults to 3750 (ten sessions).
+        polls (int, optional): Polls to time. Defaults to 100.
+
+    Returns:
+        dict: Mean milliseconds and candles transferred per poll.
+    """
+    start = pd.Timestamp('2024-12-02 09:15', tz=sm.IST)
+    stamps = [(start + pd.Timedelta(minutes=i)).strftime('%Y-%m-%dT%H:%M:%S%z') for i in range(bars + polls)]
+    stamps = [s[:-2] + ':' + s[-2:] for s in stamps]
+    rows = [[s, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1000 + i] for i, s in enumerate(stamps)]
+
+    class FakeApi:
+        served = 0
+        clock = bars
+
+        def getCandleData(self, param):
+            lo = pd.Timestamp(param['fromdate'], tz=sm.IST)
+            i = max(0, int((lo - start) / pd.Timedelta(minutes=1)))
+            data = rows[i:self.clock]
+            FakeApi.served += len(data)
+            return {'data': data}
+
+    def now_at(api):
+        return (start + pd.Timedelta(minutes=api.clock)).tz_localize(None).to_pydatetime()
+
+    api = FakeApi()
+    t0 = time.perf_counter()
+    for _ in range(polls):
+        data = api.getCandleData({'fromdate': stamps[0][:16].replace('T', ' ')})['data']
+        pd.DataFrame(data, columns=cd.COLUMNS).iloc[-1]
+    full_ms = (time.perf_counter() - t0) / polls * 1e3
+    full_rows = FakeApi.served / polls
+
+    api = FakeApi()
+    api.clock = bars
+    cache = CandleCache(api, days=10, limiter=rl.RateLimiter(1e9))
+    cache.get('NSE', '26000', 'ONE_MINUTE', now=now_at(api))
+    FakeApi.served = 0
+    t0 = time.perf_counter()
+    for _ in range(polls):
+        api.clock += 1
+        frame = cache.get('NSE', '26000', 'ONE_MINUTE', now=now_at(api))
+        frame.close[-1]
+    cached_ms = (time.perf_counter() - t0) / polls * 1e3
+    assert len(frame) == bars + polls and frame.close[-1] == rows[-1][4]
+
+    results = {'full_ms': full_ms, 'full_rows': full_rows, 'cached_ms': cached_ms, 'cached_rows': FakeApi.served / polls}
+    print("full window  : {:.2f} ms, {:.0f} candles per poll".format(full_ms, full_rows))
+    print("candle cache : {:.2f} ms, {:.1f} candles per poll".format(cached_ms, results['cached_rows']))
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
+
+    # A failed, then an empty first backfill: the next polls backfill the whole window again
+    class FlakyApi:
+        def __init__(self):
+            self.calls = []
+
+        def getCandleData(self, param):
+            self.calls.append(param['fromdate'])
+            if len(self.calls) == 1:
+                raise ConnectionError("timed out")
+            if len(self.calls) == 2:
+                return {'status': False, 'errorcode': 'AB1019', 'data': None}
+            return {'data': [['2024-12-06T09:15:00+05:30', 100.0, 101.0, 99.0, 100.5, 1000]]}
+
+    api = FlakyApi()
+    cache = CandleCache(api, days=10, limiter=rl.RateLimiter(1e9))
+    now = datetime(2024, 12, 6, 9, 20)
+    lengths = [len(cache.get('NSE', '26000', 'ONE_MINUTE', now=now)) for _ in range(3)]
+    assert lengths == [0, 0, 1] and api.calls == ['2024-11-26 09:20'] * 3, (lengths, api.calls)
+    print("failed and empty first backfills are retried over the whole window")
+
+    # A store holding only the last two sessions: the first eight days are fetched as well
+    import tempfile
+    import ohlcvStore as ohlcv
+    import fakeSmartApi as fake
+
+    class CandleApi:
+        def getCandleData(self, param):
+            from_date, to_date = (datetime.strptime(param[k], "%Y-%m-%d %H:%M") for k in ('fromdate', 'todate'))
+            return {'data': fake.candles(int(param['symboltoken']), param['interval'], from_date, to_date)}
+
+    now = datetime(2024, 12, 6, 15, 30)
+    with tempfile.TemporaryDirectory() as root:
+        store = ohlcv.OHLCVStore(root)
+        store.append('NSE', '26000', 'ONE_MINUTE', *cd.decode(fake.candles(26000, 'ONE_MINUTE', now - timedelta(days=2), now)))
+        frame = CandleCache(CandleApi(), days=10, limiter=rl.RateLimiter(1e9), store=store).get('NSE', '26000', 'ONE_MINUTE', now=now)
+        expected = cd.decode(fake.candles(26000, 'ONE_MINUTE', now - timedelta(days=10), now))
+        assert np.array_equal(frame.ts, expected[0]) and np.array_equal(frame.volume, expected[2])
+    print("a store holding only recent bars is completed back to the start of the window")
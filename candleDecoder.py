@@ -0,0 +1,129 @@
+# candleDecoder.py
+import time
+
+import numpy as np
+import pandas as pd
+
+import scripMaster as sm
+
+
+# Column layout of every candle DataFrame built from decoded arrays
+COLUMNS = ['timestamp', 'O', 'H', 'L', 'C', 'V']
+
+NS = 1_000_000_000
+
+# getCandleData stamps bars as "2024-12-02T09:15:00+05:30"
+ISO_LENGTH = 25
+
+
+def decode_timestamps(stamps):
+    """
+    Parse ISO-8601 timestamps with a UTC offset in one pass.
+
+    The date and time part is parsed by numpy's datetime64 conversion and
+    the "+HH:MM" offset is read from the raw bytes, so no Python object is
+    created per row. Other formats fall back to pandas.
+
+    Parameters:
+        stamps (numpy.ndarray | list): Timestamps as returned by getCandleData.
+
+    Returns:
+        numpy.ndarray: int64 ns since the epoch (UTC).
+    """
+    raw = np.asarray(stamps).astype('S')
+    if len(raw) == 0:
+        return np.empty(0, np.int64)
+    if raw.dtype.itemsize != ISO_LENGTH:
+        return pd.to_datetime(raw.astype(str), utc=True).asi8
+    local = raw.astype('S19').astype('datetime64[s]').astype(np.int64)
+    chars = raw.view(np.uint8).reshape(len(raw), ISO_LENGTH).astype(np.int64) - ord('0')
+    offset = (chars[:, 20] * 10 + chars[:, 21]) * 3600 + (chars[:, 23] * 10 + chars[:, 24]) * 60
+    offset = np.where(chars[:, 19] == ord('-') - ord('0'), -offset, offset)
+    return (local - offset) * NS
+
+
+def decode(data):
+    """
+    Convert getCandleData rows into typed arrays.
+
+    Parameters:
+        data (list): Rows of [timestamp, open, high, low, close, volume] as returned by SmartAPI.
+
+    Returns:
+        tuple: (ts, ohlc, volume) with ts as int64 ns since the epoch (UTC),
+        ohlc as a float64 (n, 4) array and volume as int64.
+    """
+    if not data:
+        return np.empty(0, np.int64), np.empty((0, 4), np.float64), np.empty(0, np.int64)
+    rows = np.array(data, dtype=object)
+    ts = decode_timestamps(rows[:, 0].astype('S'))
+    ohlc = np.ascontiguousarray(rows[:, 1:5], dtype=np.float64)
+    volume = rows[:, 5].astype(np.int64)
+    return ts, ohlc, volume
+
+
+def to_frame(ts, ohlc, volume):
+    """
+    Build the candle DataFrame of decoded arrays.
+
+    The O/H/L/C columns share memory with `ohlc` rather than copying it.
+
+    Parameters:
+        ts (numpy.ndarray): int64 ns timestamps.
+        ohlc (numpy.ndarray): float64 (n, 4) open/high/low/close.
+        volume (numpy.ndarray): int64 volume.
+
+    Returns:
+        pandas.DataFrame: timestamp (IST), O, H, L, C and V.
+    """
+    frame = pd.DataFrame(ohlc, columns=COLUMNS[1:5], copy=False)
+    frame.insert(0, 'timestamp', pd.DatetimeIndex(ts.view('datetime64[ns]'), tz='UTC').tz_convert(sm.IST))
+    frame['V'] = volume
+    return frame
+
+
+def benchmark(days=14, repeat=20):
+    """
+    Compare the decoder with the DataFrame/rename/to_datetime/set_index path of the strategies.
+
+    Parameters:
+        days (int, optional): Calendar days of one-minute candles. Defaults to 14 (ten sessions).
+        repeat (int, optional): Decodes per timing. Defaults to 20.
+
+    Returns:
+        dict: Mean milliseconds per payload.
+    """
+    from datetime import datetime, timedelta
+    import fakeSmartApi as fake
+
+    to_date = datetime(2024, 12, 6, 15, 30)
+    data = fake.candles(26000, 'ONE_MINUTE', to_date - timedelta(days=days), to_date)
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = fn()
+        return (time.perf_counter() - start) / repeat * 1e3, result
+
+    def dataframe_path():
+        df = pd.DataFrame(data)
+        df = df.rename(columns={0: "datetime", 1: "open", 2: "high", 3: "low", 4: "Close", 5: "volume"})
+        df['datetime'] = pd.to_datetime(df["datetime"])
+        return df.set_index('datetime')
+
+    old_ms, old = timed(dataframe_path)
+    new_ms, (ts, ohlc, volume) = timed(lambda: decode(data))
+    view_ms, frame = timed(lambda: to_frame(ts, ohlc, volume))
+    assert np.array_equal(ts, old.index.tz_convert('UTC').asi8)
+    assert np.array_equal(ohlc[:, 3], old['Close'].to_numpy()) and np.array_equal(volume, old['volume'].to_numpy())
+    assert frame['timestamp'].equals(pd.Series(old.index, name='timestamp').dt.tz_convert(sm.IST))
+
+    print("{} one-minute candles".format(len(data)))
+    print("DataFrame path : {:.2f} ms".format(old_ms))
+    print("decode         : {:.2f} ms ({:.1f}x)".format(new_ms, old_ms / new_ms))
+    print("DataFrame view : {:.2f} ms".format(view_ms))
+    return {'dataframe_ms': old_ms, 'decode_ms': new_ms, 'view_ms': view_ms}
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -9,7 +9,7 @@ import math
 import requests
 import pandas as pd
 
-url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
+import scripMaster as sm
 
 #d = requests.get(url).json()
 #token_df = pd.DataFrame.from_dict(d)
@@ -17,17 +17,16 @@ url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScrip
 #token_df = token_df.astype({'strike': float})
 #print(token_df)
 
-response = requests.get(url)
-
-if response.status_code == 200:
-    file_path = "ScripMaster.json"
-    
-    with open(file_path,"wb") as file:
-        file.write(response.content)
-        print("JSON data downloaded successfully to : ",file_path)
-
+# Revalidate against the server (ETag/Last-Modified); a new file also refreshes the .npz snapshot
+if sm.download_scrip_master(force=True):
+    print("JSON data downloaded successfully to : ",sm.CACHE_DIR)
+    # Patch yesterday's shared instrument store instead of rebuilding it
+    import instrumentStore as ist
+    diff = ist.update_store()
+    if diff is not None:
+        print("Instrument store updated : ",diff.summary())
 else:
-    print("Failed to fetch data from the url : ",url)
+    print("Scrip master in",sm.CACHE_DIR,"is already up to date")
 
 
 # with open(file_path,"r") as file:
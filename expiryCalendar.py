@@ -0,0 +1,208 @@
+# expiryCalendar.py
+import threading
+from bisect import bisect_left
+from datetime import datetime, date, time, timedelta
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+import scripMaster as sm
+
+
+# Contracts stop trading at the close, so the expiry day rolls over at 15:30 IST
+SESSION_CLOSE = time(15, 30)
+
+
+def _to_date(days):
+    return date(1970, 1, 1) + timedelta(days=int(days))
+
+
+def effective_day(as_of=None):
+    """
+    Get the first day whose expiries are still tradable at a timestamp.
+
+    Parameters:
+        as_of (datetime | date, optional): Reference time. Defaults to now in IST.
+
+    Returns:
+        int: Days since 1970-01-01.
+    """
+    if as_of is None:
+        as_of = datetime.now(sm.IST)
+    if isinstance(as_of, datetime):
+        if as_of.tzinfo is not None:
+            as_of = as_of.astimezone(sm.IST)
+        day = sm.expiry_to_days(as_of.date())
+        return day + 1 if as_of.time() >= SESSION_CLOSE else day
+    return sm.expiry_to_days(as_of)
+
+
+class ExpiryCalendar:
+    """
+    Sorted expiries per (underlying, instrument type) from the scrip master.
+
+    Answers current weekly, next weekly and monthly expiry as of a timestamp
+    with a binary search, and can rebuild option chains when an expiry rolls.
+    """
+
+    def __init__(self, table):
+        if not pd.api.types.is_integer_dtype(table['expiry']):
+            table = sm.build_instrument_table(table)
+        listed = table.loc[table['expiry'] != sm.NO_EXPIRY, ['name', 'instrumenttype', 'expiry']]
+        listed = listed.drop_duplicates().sort_values('expiry')
+
+        self._expiries = {}
+        self._monthly = {}
+        for (name, instrumenttype), group in listed.groupby(['name', 'instrumenttype'], observed=True, sort=False):
+            days = group['expiry'].to_numpy(dtype=np.int64)
+            self._expiries[(name, instrumenttype)] = days.tolist()
+            # The last listed expiry of each calendar month is the monthly one
+            months = days.astype('datetime64[D]').astype('datetime64[M]')
+            is_monthly = np.append(months[1:] != months[:-1], True)
+            self._monthly[(name, instrumenttype)] = days[is_monthly].tolist()
+
+        self._hooks = []
+        self._current = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def expiries(self, name, instrumenttype='OPTIDX'):
+        """
+        Get all listed expiries of an underlying.
+
+        Parameters:
+            name (str): Underlying name (e.g., NIFTY).
+            instrumenttype (str, optional): Instrument type. Defaults to 'OPTIDX'.
+
+        Returns:
+            list: Expiry dates in ascending order.
+        """
+        return [_to_date(d) for d in self._expiries.get((name, instrumenttype), [])]
+
+    def _nth(self, days, n, as_of):
+        i = bisect_left(days, effective_day(as_of)) + n
+        return _to_date(days[i]) if i < len(days) else None
+
+    def current(self, name, instrumenttype='OPTIDX', as_of=None):
+        """
+        Get the nearest expiry that is still trading.
+
+        Parameters:
+            name (str): Underlying name.
+            instrumenttype (str, optional): Instrument type. Defaults to 'OPTIDX'.
+            as_of (datetime | date, optional): Reference time. Defaults to now in IST.
+
+        Returns:
+            date: Expiry date, or None if nothing is listed.
+        """
+        return self._nth(self._expiries.get((name, instrumenttype), []), 0, as_of)
+
+    def next(self, name, instrumenttype='OPTIDX', as_of=None):
+        """
+        Get the expiry after the current one.
+
+        Parameters:
+            name (str): Underlying name.
+            instrumenttype (str, optional): Instrument type. Defaults to 'OPTIDX'.
+            as_of (datetime | date, optional): Reference time. Defaults to now in IST.
+
+        Returns:
+            date: Expiry date, or None if nothing is listed.
+        """
+        return self._nth(self._expiries.get((name, instrumenttype), []), 1, as_of)
+
+    def monthly(self, name, instrumenttype='OPTIDX', as_of=None):
+        """
+        Get the nearest monthly expiry that is still trading.
+
+        Parameters:
+            name (str): Underlying name.
+            instrumenttype (str, optional): Instrument type. Defaults to 'OPTIDX'.
+            as_of (datetime | date, optional): Reference time. Defaults to now in IST.
+
+        Returns:
+            date: Expiry date, or None if nothing is listed.
+        """
+        return self._nth(self._monthly.get((name, instrumenttype), []), 0, as_of)
+
+    def add_rollover_hook(self, name, callback, instrumenttype='OPTIDX'):
+        """
+        Call `callback(name, old_expiry, new_expiry)` when the current expiry rolls.
+
+        Parameters:
+            name (str): Underlying name.
+            callback (callable): Function to run on rollover.
+            instrumenttype (str, optional): Instrument type. Defaults to 'OPTIDX'.
+        """
+        key = (name, instrumenttype)
+        self._current.setdefault(key, self.current(name, instrumenttype))
+        self._hooks.append((key, callback))
+
+    def watch_chains(self, table, chains, instrumenttype='OPTIDX'):
+        """
+        Keep a dict of current-expiry option chains rebuilt across rollovers.
+
+        Parameters:
+            table (pandas.DataFrame): Instrument table the chains are built from.
+            chains (dict): Underlying name -> OptionChain of its current expiry; updated in place.
+            instrumenttype (str, optional): Instrument type. Defaults to 'OPTIDX'.
+        """
+        import optionChain as oc
+
+        def rebuild(name, old_expiry, new_expiry):
+            chains[name] = oc.OptionChain(table, name, new_expiry, instrumenttype)
+            logger.info(f"{name} option chain rolled from {old_expiry} to {new_expiry}")
+
+        for name in list(chains):
+            self.add_rollover_hook(name, rebuild, instrumenttype)
+
+    def check_rollover(self, as_of=None):
+        """
+        Run the hooks of every underlying whose current expiry has changed.
+
+        Hooks run on a background thread so the caller is never blocked by a rebuild.
+
+        Parameters:
+            as_of (datetime, optional): Reference time. Defaults to now in IST.
+
+        Returns:
+            list: (name, old_expiry, new_expiry) for each rollover found.
+        """
+        rolled = []
+        for key, old_expiry in list(self._current.items()):
+            new_expiry = self.current(key[0], key[1], as_of)
+            if new_expiry != old_expiry:
+                self._current[key] = new_expiry
+                rolled.append((key, old_expiry, new_expiry))
+
+        def run(key, old_expiry, new_expiry):
+            for hook_key, callback in self._hooks:
+                if hook_key == key:
+                    try:
+                        callback(key[0], old_expiry, new_expiry)
+                    except Exception as e:
+                        logger.exception(f"Rollover hook failed for {key[0]}: {e}")
+
+        for key, old_expiry, new_expiry in rolled:
+            threading.Thread(target=run, args=(key, old_expiry, new_expiry), daemon=True).start()
+        return [(key[0], old_expiry, new_expiry) for key, old_expiry, new_expiry in rolled]
+
+    def start(self, interval=30):
+        """
+        Check for rollovers every `interval` seconds on a daemon thread.
+
+        Parameters:
+            interval (float, optional): Seconds between checks. Defaults to 30.
+        """
+        def loop():
+            while not self._stop.wait(interval):
+                self.check_rollover()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the rollover thread started by start()."""
+        self._stop.set()
@@ -0,0 +1,385 @@
+# fakeSmartApi.py
+import json
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import scripMaster as sm
+import candleCache as cc
+
+
+CANDLE_ROUTE = "/rest/secure/angelbroking/historical/v1/getCandleData"
+MARKET_DATA_ROUTE = "/rest/secure/angelbroking/market/v1/quote"
+
+# Tokens per getMarketData request
+MARKET_DATA_TOKENS = 50
+
+SESSION_OPEN = (9, 15)
+SESSION_MINUTES = 375
+
+
+def price(token, minute):
+    """
+    Deterministic synthetic price of a token at a minute since the epoch.
+
+    Parameters:
+        token (int): Instrument token.
+        minute (int): Minutes since 1970-01-01 UTC.
+
+    Returns:
+        float: Price rounded to the 0.05 tick.
+    """
+    base = 100 + token % 1000
+    value = base * (1 + 0.02 * math.sin(minute / 97 + token) + 0.005 * math.sin(minute / 7.3))
+    return round(value * 20) / 20
+
+
+def candles(token, interval, from_date, to_date):
+    """
+    Synthetic session candles of a token between two times, as getCandleData returns them.
+
+    Parameters:
+        token (int): Instrument token.
+        interval (str): Candle interval (e.g., ONE_MINUTE).
+        from_date (datetime): Start, naive IST.
+        to_date (datetime): End, naive IST, inclusive.
+
+    Returns:
+        list: Rows of [timestamp, open, high, low, close, volume].
+    """
+    step = min(cc.INTERVAL_SECONDS[interval] // 60, SESSION_MINUTES)
+    rows = []
+    day = from_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day <= to_date:
+        if day.weekday() < 5:
+            session = day.replace(hour=SESSION_OPEN[0], minute=SESSION_OPEN[1])
+            for offset in range(0, SESSION_MINUTES, step):
+                start = session + timedelta(minutes=offset)
+                if start < from_date or start > to_date:
+                    continue
+                minute0 = int(sm.IST.localize(start).timestamp()) // 60
+                minutes = min(step, SESSION_MINUTES - offset)
+                prices = [price(token, minute0 + m) for m in range(minutes + 1)]
+                # Daily candles are stamped at midnight
+                stamp = day if interval == 'ONE_DAY' else start
+                rows.append([
+                    sm.IST.localize(stamp).isoformat(),
+                    prices[0], max(prices), min(prices), prices[-1],
+                    # A longer candle's volume is that of its one-minute candles
+                    sum(1000 + (token + minute0 + m) % 500 for m in range(minutes)),
+                ])
+        day += timedelta(days=1)
+    return rows
+
+
+class FakeSmartApiServer:
+    """
+    Local HTTP stand-in for the SmartAPI REST endpoints.
+
+    Point SmartConnect at it with `root=server.url`. It enforces the
+    per-request day limits and a per-endpoint requests-per-second limit the
+    way the broker does, counts requests and can add latency, so clients
+    can be exercised end to end without credentials or market hours.
+    """
+
+    def __init__(self, latency=0.0, rate_limit=None, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.requests = {}
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._recent = {}
+        self._routes = {CANDLE_ROUTE: self._candle_data, MARKET_DATA_ROUTE: self._market_data}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                status, payload = server._dispatch(self.path, json.loads(body or b'{}'))
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.url = "http://{}:{}".format(*self._server.server_address)
+        self._thread = None
+
+    def route(self, path, handler):
+        """
+        Serve another endpoint.
+
+        Parameters:
+            path (str): Route path as in SmartConnect._routes.
+            handler (callable): Function of the request params returning the response dict.
+        """
+        self._routes['/' + path.lstrip('/')] = handler
+
+    def _throttled(self, path):
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            recent = [t for t in self._recent.get(path, []) if now - t < 1.0]
+            if len(recent) >= self.rate_limit:
+                self._recent[path] = recent
+                self.rejected += 1
+                return True
+            recent.append(now)
+            self._recent[path] = recent
+        return False
+
+    def _dispatch(self, path, params):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+        handler = self._routes.get(path)
+        if handler is None:
+            return 404, {'status': False, 'message': 'Not found', 'errorcode': 'AB1000', 'data': None}
+        if self._throttled(path):
+            return 200, {'status': False, 'message': 'Access denied because of exceeding access rate', 'errorcode': 'AB1019', 'data': None}
+        if self.latency:
+            time.sleep(self.latency)
+        return 200, handler(params)
+
+    def _candle_data(self, params):
+        from_date = datetime.strptime(params['fromdate'], "%Y-%m-%d %H:%M")
+        to_date = datetime.strptime(params['todate'], "%Y-%m-%d %H:%M")
+        if (to_date - from_date).days > cc.MAX_DAYS[params['interval']]:
+            return {'status': False, 'message': 'Invalid date range', 'errorcode': 'AB1004', 'data': None}
+        data = candles(int(params['symboltoken']), params['interval'], from_date, to_date)
+        return {'status': True, 'message': 'SUCCESS', 'errorcode': '', 'data': data}
+
+    def _market_data(self, params):
+        tokens = [(exchange, token) for exchange, listed in params['exchangeTokens'].items() for token in listed]
+        if len(tokens) > MARKET_DATA_TOKENS:
+            return {'status': False, 'message': 'Too many tokens', 'errorcode': 'AB4008', 'data': None}
+        minute = int(time.time()) // 60
+        fetched = []
+        for exchange, token in tokens:
+            ltp = price(int(token), minute)
+            quote = {'exchange': exchange, 'tradingSymbol': token, 'symbolToken': token, 'ltp': ltp}
+            if params['mode'] in ('OHLC', 'FULL'):
+                quote.update(open=price(int(token), minute - 60), high=ltp * 1.01, low=ltp * 0.99, close=price(int(token), minute - 375))
+            fetched.append(quote)
+        return {'status': True, 'message': 'SUCCESS', 'errorcode': '', 'data': {'fetched': fetched, 'unfetched': []}}
+
+    def start(self):
+        """
+        Serve on a daemon thread.
+
+        Returns:
+            str: Root URL to pass to SmartConnect.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        """Shut the server down."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def tick_packet(mode, exchange_type, token, sequence, ts_ms, ltp):
+    """
+    Binary market data packet in the SmartWebSocketV2 layout.
+
+    Parameters:
+        mode (int): 1 LTP, 2 QUOTE or 3 SNAP_QUOTE.
+        exchange_type (int): SmartWebSocketV2 exchange type.
+        token (int): Instrument token.
+        sequence (int): Packet sequence number.
+        ts_ms (int): Exchange time in ms since the epoch.
+        ltp (float): Last traded price in rupees.
+
+    Returns:
+        bytes: Packet of 51, 123 or 379 bytes.
+    """
+    import marketFeed as mf
+
+    paise = round(ltp * 100)
+    values = (mode, exchange_type, str(token).encode(), sequence, ts_ms, paise)
+    if mode >= 2:
+        values += (75, paise - 120, 1000000 + sequence, 500000.0, 600000.0, paise - 2000, paise + 1500, paise - 2500, paise - 1000)
+    if mode == 3:
+        depth = ()
+        for level in range(5):
+            depth += (1, 100 * (level + 1), paise - 5 * (level + 1), level + 1)
+        for level in range(5):
+            depth += (0, 120 * (level + 1), paise + 5 * (level + 1), level + 2)
+        values += (ts_ms, 123456, 1.5) + depth + (paise * 11 // 10, paise * 9 // 10, paise * 13 // 10, paise * 7 // 10)
+    return mf.PACKETS[mode].pack(*values)
+
+
+class FakeFeedServer:
+    """
+    Local stand-in for the SmartAPI WebSocket 2.0 market feed, on the standard library only.
+
+    Speaks enough RFC 6455 for websocket-client: the upgrade handshake,
+    masked client frames, ping/pong and close. JSON subscribe/unsubscribe
+    requests are honoured per connection, and every `interval` seconds each
+    subscribed token gets a binary tick in its mode. `drop_connections()`
+    cuts every client off, to exercise reconnects.
+    """
+
+    def __init__(self, interval=0.1, host='127.0.0.1', port=0):
+        import socket
+
+        self.interval = interval
+        self.connections = 0
+        self.subscribes = 0
+        self.headers = {}
+        self._clients = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._listener = socket.create_server((host, port))
+        self.url = "ws://{}:{}/smart-stream".format(*self._listener.getsockname())
+
+    def start(self):
+        """
+        Serve on daemon threads.
+
+        Returns:
+            str: ws:// URL to give MarketFeed.
+        """
+        threading.Thread(target=self._accept, daemon=True).start()
+        threading.Thread(target=self._push, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        """Close every connection and the listener."""
+        self._stop.set()
+        self.drop_connections()
+        self._listener.close()
+
+    def drop_connections(self):
+        """Close every client connection without a close frame."""
+        import socket
+
+        with self._lock:
+            clients, self._clients = list(self._clients), {}
+        for conn in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def _accept(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _read(conn, n):
+        data = b''
+        while len(data) < n:
+            chunk = conn.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("closed")
+            data += chunk
+        return data
+
+    def _send(self, conn, opcode, payload):
+        import struct
+
+        n = len(payload)
+        if n < 126:
+            header = struct.pack('!BB', 0x80 | opcode, n)
+        elif n < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, n)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, n)
+        conn.sendall(header + payload)
+
+    def _serve(self, conn):
+        import base64
+        import hashlib
+        import struct
+
+        try:
+            request = b''
+            while b'\r\n\r\n' not in request:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                request += chunk
+            lines = request.split(b'\r\n\r\n')[0].decode().split('\r\n')
+            headers = {k.strip().lower(): v.strip() for k, v in (line.split(':', 1) for line in lines[1:] if ':' in line)}
+            accept = base64.b64encode(hashlib.sha1(headers['sec-websocket-key'].encode() + WEBSOCKET_GUID).digest()).decode()
+            conn.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                          "Sec-WebSocket-Accept: {}\r\n\r\n".format(accept)).encode())
+            with self._lock:
+                self.headers = headers
+                self.connections += 1
+                self._clients[conn] = {}
+
+            while True:
+                b0, b1 = self._read(conn, 2)
+                opcode, n = b0 & 0x0F, b1 & 0x7F
+                if n == 126:
+                    n = struct.unpack('!H', self._read(conn, 2))[0]
+                elif n == 127:
+                    n = struct.unpack('!Q', self._read(conn, 8))[0]
+                mask = self._read(conn, 4) if b1 & 0x80 else b'\0\0\0\0'
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._read(conn, n)))
+                if opcode == 0x8:
+                    self._send(conn, 0x8, payload[:2])
+                    return
+                if opcode == 0x9:
+                    self._send(conn, 0xA, payload)
+                elif opcode == 0x1:
+                    self._subscription(conn, json.loads(payload))
+        except (ConnectionError, OSError, KeyError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                self._clients.pop(conn, None)
+            conn.close()
+
+    def _subscription(self, conn, request):
+        params = request['params']
+        with self._lock:
+            subscribed = self._clients.get(conn)
+            if subscribed is None:
+                return
+            for entry in params['tokenList']:
+                for token in entry['tokens']:
+                    key = (entry['exchangeType'], int(token))
+                    if request['action'] == 1:
+                        subscribed.setdefault(key, set()).add(params['mode'])
+                    else:
+                        subscribed.get(key, set()).discard(params['mode'])
+            if request['action'] == 1:
+                self.subscribes += 1
+
+    def _push(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                self._sequence += 1
+                clients = [(conn, {k: set(m) for k, m in subscribed.items()}) for conn, subscribed in self._clients.items()]
+            now_ms = int(time.time() * 1000)
+            for conn, subscribed in clients:
+                try:
+                    for (exchange_type, token), modes in subscribed.items():
+                        for mode in modes:
+                            ltp = price(token, self._sequence)
+                            self._send(conn, 0x2, tick_packet(mode, exchange_type, token, self._sequence, now_ms, ltp))
+                except OSError:
+                    pass
@@ -0,0 +1,241 @@
+# indicatorCache.py
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import streamIndicators as si
+
+
+# Indicator name -> (streaming class, price columns it reads, output columns)
+INDICATORS = {
+    'ema': (si.EMA, ('close',), 1),
+    'rsi': (si.RSI, ('close',), 1),
+    'atr': (si.ATR, ('high', 'low', 'close'), 1),
+    'supertrend': (si.Supertrend, ('high', 'low', 'close'), 2),
+}
+
+MAX_BYTES = 64 * 1024 * 1024
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+class _Entry:
+    """Cached series of one indicator: values per bar and the state after the last completed bar."""
+
+    def __init__(self, indicator, params):
+        cls, self.columns, width = INDICATORS[indicator]
+        self.state = cls(*params)
+        self.values = np.empty((256, width))
+        self.n = 0
+        self.last_ts = None
+        self.last_bar = None
+        # Set once `values` has been handed out: the next extend writes to a copy
+        self.shared = False
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def _reserve(self, n):
+        if n > len(self.values) or self.shared:
+            values = np.empty((max(n, 2 * len(self.values)) if n > len(self.values) else len(self.values), self.values.shape[1]))
+            values[:self.n] = self.values[:self.n]
+            self.values = values
+            self.shared = False
+
+    def extend(self, frame):
+        # The held last bar was still forming: recompute it, then the new bars;
+        # the state is advanced over completed bars only
+        start = max(self.n - 1, 0)
+        prices = [getattr(frame, c)[start:].tolist() for c in self.columns]
+        self._reserve(len(frame))
+        rows = list(zip(*prices))
+        for i, row in enumerate(rows[:-1]):
+            self.values[start + i] = self.state.update(*row)
+        forming = copy.deepcopy(self.state)
+        self.values[len(frame) - 1] = forming.update(*rows[-1])
+        self.n = len(frame)
+        self.last_ts = int(frame.ts[-1])
+        self.last_bar = rows[-1]
+
+
+class IndicatorCache:
+    """
+    Indicator series per (exchange, token, interval, indicator, params).
+
+    An entry is valid for the bars up to its last timestamp. A request on
+    the same bars is a hit; a request after new bars have arrived extends
+    the entry by streaming just those bars (the last held bar is redone,
+    as it may still have been forming); anything else, such as rewritten
+    history, is recomputed. Entries are evicted least recently used first
+    once their arrays exceed `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.extensions = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, exchange, symboltoken, interval, frame, indicator, *params):
+        """
+        Get an indicator over the bars of a CandleFrame.
+
+        Parameters:
+            exchange (str): Exchange name (e.g., NSE, NFO).
+            symboltoken (str): Symbol token.
+            interval (str): Candle interval.
+            frame (candleCache.CandleFrame): Bars of the instrument, oldest first.
+            indicator (str): One of INDICATORS (ema, rsi, atr, supertrend).
+            *params: Indicator parameters, e.g. 30 for ema or 10, 3 for supertrend.
+
+        Returns:
+            numpy.ndarray: Read-only values, one per bar; (supertrend, direction) columns for supertrend.
+                They are not changed by later calls.
+        """
+        key = (exchange, str(symboltoken), interval, indicator, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            if not len(frame):
+                return np.empty((0,) if INDICATORS[indicator][2] == 1 else (0, 2))
+            last_ts = int(frame.ts[-1])
+            last_bar = tuple(float(getattr(frame, c)[-1]) for c in INDICATORS[indicator][1])
+            if entry is not None and entry.last_ts == last_ts and entry.last_bar == last_bar and entry.n == len(frame):
+                self.hits += 1
+            elif entry is not None and entry.n <= len(frame) and frame.ts[entry.n - 1] == entry.last_ts:
+                self.extensions += 1
+                self.nbytes -= entry.nbytes
+                entry.extend(frame)
+                self.nbytes += entry.nbytes
+            else:
+                self.misses += 1
+                if entry is not None:
+                    self.nbytes -= entry.nbytes
+                entry = self._entries[key] = _Entry(indicator, params)
+                entry.extend(frame)
+                self.nbytes += entry.nbytes
+            self._evict()
+            # Callers hold on to the returned view; a later extend copies first
+            # rather than rewriting the forming bar under them
+            entry.shared = True
+            values = entry.values[:entry.n]
+            values = values[:, 0] if values.shape[1] == 1 else values
+            values = values.view()
+            values.flags.writeable = False
+            return values
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self.nbytes -= entry.nbytes
+            self.evictions += 1
+
+    def stats(self):
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: Entries, bytes held, hits, extensions, misses and evictions.
+        """
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.nbytes, 'hits': self.hits,
+                    'extensions': self.extensions, 'misses': self.misses, 'evictions': self.evictions}
+
+
+def indicator_cache():
+    """
+    Get the indicator cache shared by every strategy in this process.
+
+    Returns:
+        IndicatorCache: Shared cache.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = IndicatorCache()
+        return _shared
+
+
+def benchmark(days=30, polls=200):
+    """
+    Time polling EMA(30) and Supertrend(10, 3) through the cache against recomputing them.
+
+    Parameters:
+        days (int, optional): Calendar days of one-minute history. Defaults to 30.
+        polls (int, optional): New bars to poll. Defaults to 200.
+
+    Returns:
+        dict: Milliseconds per poll, cached and recomputed.
+    """
+    from datetime import datetime, timedelta
+    import candleCache as cc
+    import candleDecoder as cd
+    import fakeSmartApi as fake
+
+    to_date = datetime(2024, 12, 6, 15, 30)
+    ts, ohlc, volume = cd.decode(fake.candles(26000, 'ONE_MINUTE', to_date - timedelta(days=days), to_date))
+    frame = cc.CandleFrame()
+    frame.merge(ts[:-polls], ohlc[:-polls], volume[:-polls])
+    cache = IndicatorCache()
+
+    def poll():
+        # Two strategies asking for the same indicators on the same bars
+        for _ in range(2):
+            ema = cache.get('NSE', '26000', 'ONE_MINUTE', frame, 'ema', 30)
+            supertrend = cache.get('NSE', '26000', 'ONE_MINUTE', frame, 'supertrend', 10, 3)
+        return ema, supertrend
+
+    cached = recomputed = 0.0
+    for i in range(len(ts) - polls, len(ts)):
+        # A forming bar first, then its final values
+        frame.merge(ts[i:i + 1], ohlc[i:i + 1] * 0.999, volume[i:i + 1])
+        poll()
+        frame.merge(ts[i:i + 1], ohlc[i:i + 1], volume[i:i + 1])
+        start = time.perf_counter()
+        ema, supertrend = poll()
+        cached += time.perf_counter() - start
+    start = time.perf_counter()
+    expected_ema = si.replay(si.EMA(30), frame.close)
+    expected_supertrend = si.replay(si.Supertrend(10, 3), frame.high, frame.low, frame.close)
+    recomputed = (time.perf_counter() - start) * 2
+    assert np.array_equal(ema, expected_ema, equal_nan=True) and np.array_equal(supertrend, expected_supertrend, equal_nan=True)
+
+    stats = cache.stats()
+    print("{} bars, {} polls of 2 x (EMA(30), Supertrend(10, 3)): {}".format(len(frame), polls, stats))
+    print("cached     : {:.3f} ms per poll".format(cached / polls * 1e3))
+    print("recomputed : {:.3f} ms per poll".format(recomputed * 1e3))
+    return {'cached_ms': cached / polls * 1e3, 'recomputed_ms': recomputed * 1e3}
+
+
+if __name__ == "__main__":
+    benchmark()
+
+    # A small budget keeps only the most recently used series
+    import candleCache as cc
+    cache = IndicatorCache(max_bytes=3 * 256 * 8)
+    frame = cc.CandleFrame()
+    frame.merge(np.arange(100, dtype=np.int64), np.full((100, 4), 100.0), np.zeros(100, np.int64))
+    for length in (5, 10, 20, 30, 5):
+        cache.get('NSE', '26000', 'ONE_MINUTE', frame, 'ema', length)
+    print(cache.stats())
+    assert cache.stats()['evictions'] == 2 and cache.stats()['misses'] == 5
+
+    # Values already returned keep their forming bar when the bar is redone
+    cache = IndicatorCache()
+    frame = cc.CandleFrame()
+    frame.merge(np.arange(100, dtype=np.int64), np.full((100, 4), 100.0), np.zeros(100, np.int64))
+    before = cache.get('NSE', '26000', 'ONE_MINUTE', frame, 'ema', 5)
+    held = before.copy()
+    frame.merge(np.array([99, 100], np.int64), np.full((2, 4), 110.0), np.zeros(2, np.int64))
+    after = cache.get('NSE', '26000', 'ONE_MINUTE', frame, 'ema', 5)
+    assert np.array_equal(before, held, equal_nan=True) and after[99] != before[99] and cache.stats()['extensions'] == 1
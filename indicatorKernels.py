@@ -0,0 +1,294 @@
+# indicatorKernels.py
+import sys
+import time
+
+import numpy as np
+
+
+# Kernels take and return symbols x bars arrays. A symbol whose history
+# starts later is padded with leading NaNs; its warm-up starts at its own
+# first bar, as if pandas_ta were run on that symbol's bars alone.
+
+
+def _time_major(values):
+    return np.ascontiguousarray(np.asarray(values, dtype=np.float64).T)
+
+
+def _first_valid(x):
+    # x is bars x symbols; symbols without any bar get len(x)
+    valid = x == x
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), len(x))
+
+
+def _ewm(x, alpha=None, span=None, adjust=True, min_periods=0):
+    # pandas' ewm(...).mean() recursion, one time step for all symbols at once
+    com = (span - 1) / 2.0 if span is not None else 1.0 / alpha - 1.0
+    alpha = 1.0 / (1.0 + com)
+    factor = 1.0 - alpha
+    new_wt = 1.0 if adjust else alpha
+    min_periods = max(int(min_periods), 1)
+
+    out = np.empty_like(x)
+    weighted = np.full(x.shape[1], np.nan)
+    old_wt = np.ones(x.shape[1])
+    nobs = np.zeros(x.shape[1], dtype=np.int64)
+    with np.errstate(invalid='ignore'):
+        for t in range(len(x)):
+            cur = x[t]
+            observed = cur == cur
+            nobs += observed
+            live = weighted == weighted
+            old_wt = np.where(live, old_wt * factor, old_wt)
+            step = live & observed
+            mixed = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+            weighted = np.where(step & (weighted != cur), mixed, weighted)
+            old_wt = np.where(step, old_wt + new_wt if adjust else 1.0, old_wt)
+            weighted = np.where(~live & observed, cur, weighted)
+            out[t] = np.where(nobs >= min_periods, weighted, np.nan)
+    return out
+
+
+def _rma(x, length):
+    return _ewm(x, alpha=1.0 / length, min_periods=length)
+
+
+def ema(close, length):
+    """
+    EMA of every symbol, as `ta.ema(close, length)`.
+
+    Parameters:
+        close (numpy.ndarray): symbols x bars closes.
+        length (int): EMA period.
+
+    Returns:
+        numpy.ndarray: symbols x bars EMA, NaN during each symbol's warm-up.
+    """
+    x = _time_major(close)
+    first = _first_valid(x)
+    symbols = np.flatnonzero(first + length <= len(x))
+    window = first[symbols, None] + np.arange(length)
+    seed = x[window, symbols[:, None]]
+    seed = np.nansum(seed, axis=1) / (seed == seed).sum(axis=1)
+
+    bars = np.arange(len(x))[:, None]
+    x = np.where(bars < first + length - 1, np.nan, x)
+    x[first[symbols] + length - 1, symbols] = seed
+    return _ewm(x, span=length, adjust=False).T
+
+
+def rsi(close, length=14):
+    """
+    Wilder RSI of every symbol, as `ta.rsi(close, length)`.
+
+    Parameters:
+        close (numpy.ndarray): symbols x bars closes.
+        length (int, optional): RSI period. Defaults to 14.
+
+    Returns:
+        numpy.ndarray: symbols x bars RSI.
+    """
+    x = _time_major(close)
+    change = np.full_like(x, np.nan)
+    change[1:] = x[1:] - x[:-1]
+    gain = _rma(np.where(change < 0, 0.0, change), length)
+    loss = _rma(np.where(change > 0, 0.0, change), length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (100 * gain / (gain + np.abs(loss))).T
+
+
+def _true_range(h, l, c):
+    # pandas_ta nudges the high - low range of a series that has a flat bar by epsilon
+    high_low = h - l
+    high_low = high_low + np.where((high_low == 0).any(axis=0), sys.float_info.epsilon, 0.0)
+    prev_close = np.full_like(c, np.nan)
+    prev_close[1:] = c[:-1]
+    true_range = np.fmax(np.fmax(np.abs(high_low), np.abs(h - prev_close)), np.abs(prev_close - l))
+    first = _first_valid(c)
+    has_bars = first < len(c)
+    true_range[first[has_bars], np.flatnonzero(has_bars)] = np.nan
+    return true_range
+
+
+def atr(high, low, close, length=14):
+    """
+    ATR of every symbol, as `ta.atr(high, low, close, length)`.
+
+    Parameters:
+        high, low, close (numpy.ndarray): symbols x bars prices.
+        length (int, optional): ATR period. Defaults to 14.
+
+    Returns:
+        numpy.ndarray: symbols x bars ATR.
+    """
+    return _rma(_true_range(_time_major(high), _time_major(low), _time_major(close)), length).T
+
+
+def _supertrend(h, l, c, matr):
+    # pandas_ta's band/direction loop, run for every column of `matr` at once;
+    # h, l and c are bars x columns or a single bars x 1 column shared by all
+    hl2 = 0.5 * (h + l)
+    upper, lower = hl2 + matr, hl2 - matr
+    first = np.broadcast_to(_first_valid(c), matr.shape[1:])
+
+    trend = np.full(matr.shape, np.nan)
+    direction = np.ones(matr.shape, dtype=np.int8)
+    trend[0, first == 0] = 0.0
+    up, lo, d = upper[0], lower[0], direction[0]
+    with np.errstate(invalid='ignore'):
+        for t in range(1, len(matr)):
+            cur = c[t]
+            long = cur > up
+            short = ~long & (cur < lo)
+            keep = ~long & ~short
+            d = np.where(long, 1, np.where(short, -1, d)).astype(np.int8)
+            lo = np.where(keep & (d > 0) & (lower[t] < lo), lo, lower[t])
+            up = np.where(keep & (d < 0) & (upper[t] > up), up, upper[t])
+            trend[t] = np.where(d > 0, lo, up)
+            # A symbol's first bar: trend 0, direction 1, as pandas_ta leaves it
+            trend[t, first == t] = 0.0
+            direction[t] = d
+    return trend, direction
+
+
+def supertrend(high, low, close, length=7, multiplier=3.0):
+    """
+    Supertrend of every symbol, as `ta.supertrend(high, low, close, length, multiplier)`.
+
+    Parameters:
+        high, low, close (numpy.ndarray): symbols x bars prices.
+        length (int, optional): ATR period. Defaults to 7.
+        multiplier (float, optional): ATR multiplier. Defaults to 3.0.
+
+    Returns:
+        tuple: (trend, direction) symbols x bars arrays; direction is int8 1 or -1.
+    """
+    h, l, c = _time_major(high), _time_major(low), _time_major(close)
+    matr = float(multiplier) * _rma(_true_range(h, l, c), length)
+    trend, direction = _supertrend(h, l, c, matr)
+    return trend.T, direction.T
+
+
+def supertrend_sweep(high, low, close, periods, multipliers):
+    """
+    Supertrend of one symbol over a grid of (period, multiplier).
+
+    The ATR is computed once per period and the band/direction loop runs
+    for all multipliers of that period together. Inputs are not modified.
+
+    Parameters:
+        high, low, close (numpy.ndarray): Prices of one symbol, one value per bar.
+        periods (list): ATR periods.
+        multipliers (list): ATR multipliers.
+
+    Returns:
+        tuple: (trend, direction) arrays of shape periods x multipliers x bars,
+        float64 and int8; entry [i, j] equals `ta.supertrend(..., periods[i], multipliers[j])`.
+    """
+    h, l, c = _time_major(np.atleast_2d(high)), _time_major(np.atleast_2d(low)), _time_major(np.atleast_2d(close))
+    multipliers = np.asarray(multipliers, dtype=np.float64)
+    true_range = _true_range(h, l, c)
+    trend = np.empty((len(periods), len(multipliers), len(c)))
+    direction = np.empty((len(periods), len(multipliers), len(c)), dtype=np.int8)
+    for i, period in enumerate(periods):
+        matr = multipliers * _rma(true_range, period)
+        trend_i, direction_i = _supertrend(h, l, c, matr)
+        trend[i], direction[i] = trend_i.T, direction_i.T
+    return trend, direction
+
+
+def benchmark(symbols=50, days=14):
+    """
+    Compare the kernels with looping indicators.py over the symbols.
+
+    Parameters:
+        symbols (int, optional): Symbols in the batch. Defaults to 50.
+        days (int, optional): Calendar days of one-minute candles. Defaults to 14 (ten sessions).
+
+    Returns:
+        dict: Symbol-bars per second, batched and looped.
+    """
+    from datetime import datetime, timedelta
+    import pandas as pd
+    import candleDecoder as cd
+    import fakeSmartApi as fake
+    import indicators as i
+
+    to_date = datetime(2024, 12, 6, 15, 30)
+    ohlc = np.stack([cd.decode(fake.candles(26000 + k, 'ONE_MINUTE', to_date - timedelta(days=days), to_date))[1]
+                     for k in range(symbols)])
+    # The last symbol listed two sessions late
+    ohlc[-1, :750] = np.nan
+    high, low, close = ohlc[:, :, 1], ohlc[:, :, 2], ohlc[:, :, 3]
+    bars = close.size
+
+    start = time.perf_counter()
+    batched = [ema(close, 30), rsi(close, 14), *supertrend(high, low, close, 10, 3)]
+    batched_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    looped = [[], [], [], []]
+    for k in range(symbols):
+        df = pd.DataFrame({'H': high[k], 'L': low[k], 'C': close[k]}).dropna().reset_index(drop=True)
+        looped[0].append(i.calculate_ema(df, 30))
+        looped[1].append(i.calculate_rsi(df, 14))
+        df = i.calculate_supertrend(df, 10, 3)
+        looped[2].append(df['Supertrend'])
+        looped[3].append(df['Supertrend_Direction'])
+    looped_s = time.perf_counter() - start
+
+    for kernel, reference in zip(batched, looped):
+        for k in range(symbols):
+            row = kernel[k][~np.isnan(close[k])]
+            assert np.array_equal(row, np.asarray(reference[k], dtype=np.float64), equal_nan=True), k
+
+    results = {'batched_per_s': bars / batched_s, 'looped_per_s': bars / looped_s}
+    print("{} symbols x {} bars: EMA(30), RSI(14), Supertrend(10, 3) match indicators.py".format(*close.shape))
+    print("batched kernels  : {:.2f} s, {:,.0f} symbol-bars/s".format(batched_s, results['batched_per_s']))
+    print("indicators.py    : {:.2f} s, {:,.0f} symbol-bars/s".format(looped_s, results['looped_per_s']))
+    return results
+
+
+def benchmark_sweep(periods=(7, 10, 14), multipliers=np.arange(1.0, 4.01, 0.25), days=30):
+    """
+    Compare supertrend_sweep with one calculate_supertrend call per grid point.
+
+    Parameters:
+        periods (tuple, optional): ATR periods. Defaults to (7, 10, 14).
+        multipliers (numpy.ndarray, optional): ATR multipliers. Defaults to 1.0 to 4.0 in steps of 0.25.
+        days (int, optional): Calendar days of one-minute candles. Defaults to 30.
+
+    Returns:
+        dict: Seconds for the grid, swept and looped.
+    """
+    from datetime import datetime, timedelta
+    import candleDecoder as cd
+    import fakeSmartApi as fake
+    import indicators as i
+
+    to_date = datetime(2024, 12, 6, 15, 30)
+    df = cd.to_frame(*cd.decode(fake.candles(26000, 'ONE_MINUTE', to_date - timedelta(days=days), to_date)))
+    columns = list(df.columns)
+
+    start = time.perf_counter()
+    trend, direction = supertrend_sweep(df['H'].to_numpy(), df['L'].to_numpy(), df['C'].to_numpy(), periods, multipliers)
+    sweep_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for p, period in enumerate(periods):
+        for m, multiplier in enumerate(multipliers):
+            result = i.calculate_supertrend(df, period, multiplier)
+            assert np.array_equal(trend[p, m], result['Supertrend'].to_numpy(dtype=np.float64), equal_nan=True)
+            assert np.array_equal(direction[p, m], result['Supertrend_Direction'].to_numpy())
+    looped_s = time.perf_counter() - start
+    assert list(df.columns) == columns
+
+    print("{} x {} grid over {} bars: {} result, matches calculate_supertrend".format(
+        len(periods), len(multipliers), len(df), trend.shape))
+    print("supertrend_sweep     : {:.2f} s".format(sweep_s))
+    print("calculate_supertrend : {:.2f} s".format(looped_s))
+    return {'sweep_s': sweep_s, 'looped_s': looped_s}
+
+
+if __name__ == "__main__":
+    benchmark()
+    benchmark_sweep()
@@ -1,18 +1,30 @@
 # indicators.py
-import pandas_ta as ta
+import indicatorKernels as ik
+import runtime as rt
+
+# pandas_ta takes seconds to import; load it on the first calculation
+ta = rt.lazy_import('pandas_ta')
+
+# candleDecoder.to_frame names the price columns O/H/L/C; frames built the older way use Close/High/Low
+LEGACY_COLUMNS = {'C': 'Close', 'H': 'High', 'L': 'Low'}
+
+
+def _column(df, name):
+    return df[name] if name in df.columns or LEGACY_COLUMNS[name] not in df.columns else df[LEGACY_COLUMNS[name]]
+
 
 def calculate_ema(df, length):
     """
     Calculate Exponential Moving Average (EMA) for the given DataFrame.
 
     Args:
-    df (pandas.DataFrame): The input DataFrame.
+    df (pandas.DataFrame): The input DataFrame, with a 'C' (or 'Close') column.
     length (int): The period length for the EMA.
 
     Returns:
     pandas.Series: The calculated EMA.
     """
-    return ta.ema(df['Close'], length=length)
+    return ta.ema(_column(df, 'C'), length=length)
 
 
 def calculate_rsi(df, length):
@@ -20,13 +32,13 @@ def calculate_rsi(df, length):
     Calculate Relative Strength Index (RSI) for the given DataFrame.
 
     Args:
-    df (pandas.DataFrame): The input DataFrame.
+    df (pandas.DataFrame): The input DataFrame, with a 'C' (or 'Close') column.
     length (int): The period length for the RSI.
 
     Returns:
     pandas.Series: The calculated RSI.
     """
-    return ta.rsi(df['Close'], length=length)
+    return ta.rsi(_column(df, 'C'), length=length)
 
 
 
@@ -35,19 +47,32 @@ def calculate_supertrend(df, period, multiplier):
     Calculate Supertrend for the given DataFrame.
 
     Args:
-    df (pandas.DataFrame): The input DataFrame.
+    df (pandas.DataFrame): The input DataFrame with H/L/C (or High/Low/Close) columns; it is not modified.
     period (int): The lookback period for the Supertrend.
     multiplier (float): The multiplier for the ATR in the Supertrend calculation.
 
     Returns:
-    pandas.DataFrame: The DataFrame with Supertrend columns.
+    pandas.DataFrame: A copy of the DataFrame with Supertrend columns.
     """
-    supertrend = ta.supertrend(high=df['High'], low=df['Low'], close=df['Close'], length=period, multiplier=multiplier)
-    
-    # Supertrend columns include Supertrend line and direction
-    df['Supertrend'] = supertrend['SUPERT_{}'.format(period)]
-    df['Supertrend_Direction'] = supertrend['SUPERTd_{}'.format(period)]
+    supertrend = ta.supertrend(high=_column(df, 'H'), low=_column(df, 'L'), close=_column(df, 'C'), length=period, multiplier=multiplier)
     
-    return df
+    # Supertrend columns include Supertrend line and direction, suffixed "_{length}_{float multiplier}"
+    props = '_{}_{}'.format(period, float(multiplier))
+    return df.assign(Supertrend=supertrend['SUPERT' + props], Supertrend_Direction=supertrend['SUPERTd' + props])
+
+
+def calculate_supertrend_sweep(df, periods, multipliers):
+    """
+    Calculate Supertrend for every (period, multiplier) pair, sharing the ATR of each period.
+
+    Args:
+    df (pandas.DataFrame): The input DataFrame with H/L/C (or High/Low/Close) columns; it is not modified.
+    periods (list): The lookback periods.
+    multipliers (list): The ATR multipliers.
+
+    Returns:
+    tuple: (trend, direction) arrays of shape periods x multipliers x bars.
+    """
+    return ik.supertrend_sweep(_column(df, 'H').to_numpy(), _column(df, 'L').to_numpy(), _column(df, 'C').to_numpy(), periods, multipliers)
 
 # Add more indicators as needed
@@ -1,12 +1,11 @@
 
 #Get Master List
 import pandas as pd
-import requests
-url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
-d = requests.get(url).json()
-token_df = pd.DataFrame.from_dict(d)
-token_df['expiry'] = pd.to_datetime(token_df['expiry'] , format = "mixed").apply(lambda x: x.date())
-token_df = token_df.astype({'strike': float})
+import os
+import scripMaster as sm
+sm.download_scrip_master()
+# Only index rows are parsed; the other segments never reach a DataFrame
+token_df = sm.build_instrument_table(sm.stream_token_df(os.path.join(sm.CACHE_DIR, sm.RAW_FILE), instrumenttype='AMXIDX'))
 #print(token_df)
 
 
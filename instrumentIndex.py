@@ -0,0 +1,298 @@
+# instrumentIndex.py
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import scripMaster as sm
+
+
+RECORD_COLUMNS = ['token', 'symbol', 'name', 'expiry', 'strike', 'lotsize', 'instrumenttype', 'exch_seg']
+
+# Bit layout of the packed option key: (segment, name) code | expiry days | strike in paise | CE/PE
+_NAME_SHIFT = 48
+_EXPIRY_SHIFT = 32
+
+
+def expiry_days(expiry):
+    """
+    Convert an expiry to days since the epoch.
+
+    Parameters:
+        expiry (date | str | numpy.datetime64 | int): Expiry date, or days since epoch.
+
+    Returns:
+        int: Days since 1970-01-01.
+    """
+    if isinstance(expiry, (int, np.integer)):
+        return int(expiry)
+    return int(np.datetime64(expiry, 'D').astype(np.int64))
+
+
+def _scalar(value):
+    # Plain Python values so records can go straight into SmartAPI JSON payloads
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _pack_option_keys(name_codes, days, strike_paise, is_pe):
+    return ((name_codes.astype(np.int64) << _NAME_SHIFT)
+            | (days.astype(np.int64) << _EXPIRY_SHIFT)
+            | (strike_paise.astype(np.int64) << 1)
+            | is_pe.astype(np.int64))
+
+
+class InstrumentIndex:
+    """
+    Hash index over the scrip master, built once per process.
+
+    Lookups are dictionary hits instead of boolean masks over the whole
+    token_df. Strikes are given in rupees, as getTokenInfo takes them.
+    Accepts an instrument table or a token_df in the legacy layout.
+    """
+
+    def __init__(self, token_df):
+        if not pd.api.types.is_integer_dtype(token_df['expiry']):
+            token_df = sm.build_instrument_table(token_df)
+        self.token_df = token_df.reset_index(drop=True)
+        df = self.token_df
+
+        self._columns = {c: df[c].to_numpy() for c in RECORD_COLUMNS}
+        exch_seg = df['exch_seg'].to_numpy(dtype=object)
+        name = df['name'].to_numpy(dtype=object)
+        instrumenttype = df['instrumenttype'].to_numpy(dtype=object)
+        symbol = df['symbol'].to_numpy(dtype=object)
+        days = df['expiry'].to_numpy(dtype=np.int64)
+        strike_paise = df['strike'].to_numpy(dtype=np.int64)
+        self._expiry_days = days
+
+        self._by_segment_name = {}
+        self._by_segment_type_name = {}
+        self._by_option = {}
+        for row, key in enumerate(zip(exch_seg, name)):
+            self._by_segment_name.setdefault(key, row)
+        for row, key in enumerate(zip(exch_seg, instrumenttype, name)):
+            self._by_segment_type_name.setdefault(key, []).append(row)
+        for rows in self._by_segment_type_name.values():
+            rows.sort(key=days.__getitem__)
+
+        # Options: (segment, name, expiry days, strike paise, CE/PE) -> first row in file order
+        option_rows = np.flatnonzero(
+            pd.Series(instrumenttype).str.startswith('OPT').to_numpy(dtype=bool)
+            & pd.Series(symbol).str.endswith(('CE', 'PE')).to_numpy(dtype=bool)
+        )
+        option_pe = np.array([symbol[r].endswith('PE') for r in option_rows], dtype=bool)
+        for row, is_pe in zip(option_rows, option_pe):
+            key = (exch_seg[row], name[row], int(days[row]), int(strike_paise[row]), 'PE' if is_pe else 'CE')
+            self._by_option.setdefault(key, int(row))
+
+        # Sorted packed keys for the vectorized bulk lookup
+        segment_names = np.char.add(np.char.add(exch_seg[option_rows].astype(str), ':'), name[option_rows].astype(str))
+        option_names, name_codes = np.unique(segment_names, return_inverse=True)
+        self._option_name_codes = {tuple(n.split(':', 1)): i for i, n in enumerate(option_names)}
+        packed = _pack_option_keys(name_codes, days[option_rows], strike_paise[option_rows], option_pe)
+        order = np.argsort(packed, kind='stable')
+        self._option_keys = packed[order]
+        self._option_key_rows = option_rows[order]
+
+    def __len__(self):
+        return len(self.token_df)
+
+    def record(self, row):
+        """
+        Get the instrument at a row position as a dict.
+
+        Parameters:
+            row (int): Row position in token_df.
+
+        Returns:
+            dict: token, symbol, name, expiry, strike, lotsize, instrumenttype and exch_seg,
+            with `token` as the string SmartAPI expects and `expiry` as a date or None.
+        """
+        record = {c: _scalar(values[row]) for c, values in self._columns.items()}
+        record['token'] = str(record['token'])
+        record['expiry'] = None if record['expiry'] == sm.NO_EXPIRY else date(1970, 1, 1) + timedelta(days=record['expiry'])
+        return record
+
+    def get(self, exch_seg, name):
+        """
+        Look up the first instrument listed for a name on a segment.
+
+        Parameters:
+            exch_seg (str): Exchange segment (e.g., NSE, NFO).
+            name (str): Underlying name (e.g., NIFTY).
+
+        Returns:
+            dict: Instrument record, or None if not listed.
+        """
+        row = self._by_segment_name.get((exch_seg, name))
+        return None if row is None else self.record(row)
+
+    def get_by_type(self, exch_seg, instrumenttype, name, nth=0):
+        """
+        Look up an instrument by segment, type and name, ordered by expiry.
+
+        Parameters:
+            exch_seg (str): Exchange segment (e.g., NFO).
+            instrumenttype (str): Instrument type (e.g., FUTIDX, FUTSTK).
+            name (str): Underlying name.
+            nth (int, optional): Position in expiry order, 0 is the nearest. Defaults to 0.
+
+        Returns:
+            dict: Instrument record, or None if not listed.
+        """
+        rows = self._by_segment_type_name.get((exch_seg, instrumenttype, name))
+        if not rows or nth >= len(rows):
+            return None
+        return self.record(rows[nth])
+
+    def get_option(self, name, expiry, strike, pe_ce, exch_seg='NFO'):
+        """
+        Look up a single option contract.
+
+        Parameters:
+            name (str): Underlying name (e.g., NIFTY).
+            expiry (date): Expiry date.
+            strike (float): Strike price in rupees.
+            pe_ce (str): 'CE' or 'PE'.
+            exch_seg (str, optional): Exchange segment. Defaults to 'NFO'.
+
+        Returns:
+            dict: Instrument record, or None if not listed.
+        """
+        row = self._by_option.get((exch_seg, name, expiry_days(expiry), int(round(strike * 100)), pe_ce))
+        return None if row is None else self.record(row)
+
+    def option_rows(self, name, expiry, strikes, pe_ce, exch_seg='NFO'):
+        """
+        Resolve many option contracts of one underlying and expiry in one call.
+
+        Parameters:
+            name (str): Underlying name.
+            expiry (date): Expiry date.
+            strikes (array-like): Strike prices in rupees.
+            pe_ce (str | array-like): 'CE'/'PE', either one for all strikes or one per strike.
+            exch_seg (str, optional): Exchange segment. Defaults to 'NFO'.
+
+        Returns:
+            numpy.ndarray: Row positions in token_df, -1 where no contract is listed.
+        """
+        strikes = np.atleast_1d(np.asarray(strikes, dtype=np.float64))
+        code = self._option_name_codes.get((exch_seg, name))
+        if code is None:
+            return np.full(len(strikes), -1, dtype=np.int64)
+        is_pe = np.broadcast_to(np.asarray(pe_ce) == 'PE', strikes.shape)
+        keys = _pack_option_keys(
+            np.full(len(strikes), code),
+            np.full(len(strikes), expiry_days(expiry)),
+            np.rint(strikes * 100),
+            is_pe,
+        )
+        pos = np.searchsorted(self._option_keys, keys)
+        pos_clipped = np.minimum(pos, len(self._option_keys) - 1)
+        found = (pos < len(self._option_keys)) & (self._option_keys[pos_clipped] == keys)
+        return np.where(found, self._option_key_rows[pos_clipped], -1)
+
+    def get_options(self, name, expiry, strikes, pe_ce, exch_seg='NFO'):
+        """
+        Resolve many option contracts and return their records.
+
+        Parameters:
+            name (str): Underlying name.
+            expiry (date): Expiry date.
+            strikes (array-like): Strike prices in rupees.
+            pe_ce (str | array-like): 'CE'/'PE', either one for all strikes or one per strike.
+            exch_seg (str, optional): Exchange segment. Defaults to 'NFO'.
+
+        Returns:
+            pandas.DataFrame: One row per requested contract that is listed, in request order.
+        """
+        rows = self.option_rows(name, expiry, strikes, pe_ce, exch_seg)
+        return self.token_df.iloc[rows[rows >= 0]]
+
+    def token_info(self, symbol, exch_seg='NSE', instrumenttype='OPTIDX', strike_price='', pe_ce='CE', expiry_day=None):
+        """
+        Drop-in for the strategies' getTokenInfo, returning the first match as a record.
+
+        Parameters:
+            symbol (str): Underlying name (e.g., NIFTY).
+            exch_seg (str, optional): NSE for the spot, NFO for derivatives. Defaults to 'NSE'.
+            instrumenttype (str, optional): FUTIDX, FUTSTK, OPTIDX or OPTSTK. Defaults to 'OPTIDX'.
+            strike_price (float, optional): Option strike in rupees.
+            pe_ce (str, optional): 'CE' or 'PE'. Defaults to 'CE'.
+            expiry_day (date, optional): Option expiry.
+
+        Returns:
+            dict: Instrument record, or None if not listed.
+        """
+        if exch_seg == 'NSE':
+            return self.get('NSE', symbol)
+        elif exch_seg == 'NFO' and instrumenttype in ('FUTSTK', 'FUTIDX'):
+            return self.get_by_type('NFO', instrumenttype, symbol)
+        elif exch_seg == 'NFO' and instrumenttype in ('OPTSTK', 'OPTIDX'):
+            row = self._by_option.get(('NFO', symbol, expiry_days(expiry_day), int(round(strike_price * 100)), pe_ce))
+            if row is None or self._columns['instrumenttype'][row] != instrumenttype:
+                return None
+            return self.record(row)
+        return None
+
+
+def benchmark(token_df, name='NIFTY', expiry=None, repeat=200):
+    """
+    Compare InstrumentIndex lookups with the boolean-mask getTokenInfo.
+
+    Parameters:
+        token_df (pandas.DataFrame): Scrip master as returned by scripMaster.load_token_df.
+        name (str, optional): Option underlying to look up. Defaults to 'NIFTY'.
+        expiry (date, optional): Option expiry. Defaults to the nearest listed expiry of `name`.
+        repeat (int, optional): Lookups per timing. Defaults to 200.
+
+    Returns:
+        dict: Mean time per lookup in microseconds for each path.
+    """
+    def getTokenInfo(symbol, exch_seg='NSE', instrumenttype='OPTIDX', strike_price='', pe_ce='CE', expiry_day=None):
+        df = token_df
+        strike_price = strike_price*100
+        if exch_seg == 'NSE':
+            eq_df = df[(df['exch_seg'] == 'NSE')]
+            return eq_df[eq_df['name'] == symbol]
+        elif exch_seg == 'NFO' and ((instrumenttype == 'FUTSTK') or (instrumenttype == 'FUTIDX')):
+            return df[(df['exch_seg'] == 'NFO') & (df['instrumenttype'] == instrumenttype) & (df['name'] == symbol)].sort_values(by=['expiry'])
+        elif exch_seg == 'NFO' and (instrumenttype == 'OPTSTK' or instrumenttype == 'OPTIDX'):
+            return df[(df['exch_seg'] == 'NFO') & (df['expiry'] == expiry_day) & (df['instrumenttype'] == instrumenttype) & (df['name'] == symbol) & (df['strike'] == strike_price) & (df['symbol'].str.endswith(pe_ce))].sort_values(by=['expiry'])
+
+    start = time.perf_counter()
+    index = InstrumentIndex(token_df)
+    build = time.perf_counter() - start
+
+    options = token_df[(token_df['exch_seg'] == 'NFO') & (token_df['instrumenttype'] == 'OPTIDX') & (token_df['name'] == name)]
+    if expiry is None:
+        expiry = min(e for e in options['expiry'] if isinstance(e, date))
+    strikes = np.sort(options[options['expiry'] == expiry]['strike'].unique()) / 100
+    strike = float(strikes[len(strikes) // 2])
+
+    def timed(fn, n):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - start) / n * 1e6
+
+    scan_repeat = max(1, repeat // 20)
+    results = {
+        'build_ms': build * 1e3,
+        'scan_spot_us': timed(lambda: getTokenInfo(name).iloc[0], scan_repeat),
+        'index_spot_us': timed(lambda: index.token_info(name), repeat),
+        'scan_option_us': timed(lambda: getTokenInfo(name, 'NFO', 'OPTIDX', strike, 'CE', expiry).iloc[0], scan_repeat),
+        'index_option_us': timed(lambda: index.token_info(name, 'NFO', 'OPTIDX', strike, 'CE', expiry), repeat),
+        'scan_chain_us': timed(lambda: [getTokenInfo(name, 'NFO', 'OPTIDX', s, 'CE', expiry) for s in strikes], 1),
+        'index_chain_us': timed(lambda: index.option_rows(name, expiry, strikes, 'CE'), repeat),
+    }
+    print("index build                : {:.1f} ms".format(results['build_ms']))
+    print("spot lookup   scan / index : {:.1f} us / {:.2f} us".format(results['scan_spot_us'], results['index_spot_us']))
+    print("option lookup scan / index : {:.1f} us / {:.2f} us".format(results['scan_option_us'], results['index_option_us']))
+    print("{} strikes    scan / bulk  : {:.1f} us / {:.2f} us".format(len(strikes), results['scan_chain_us'], results['index_chain_us']))
+    return results
+
+
+if __name__ == "__main__":
+    benchmark(sm.load_token_df())
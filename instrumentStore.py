@@ -0,0 +1,627 @@
+# instrumentStore.py
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import shutil
+import resource
+import multiprocessing
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+import scripMaster as sm
+import scripMasterDiff as smd
+
+
+MAGIC = b"INSTSTR1"
+HEADER_SIZE = 4096
+ALIGN = 64
+
+STORE_FILE = "InstrumentStore-{day}.bin"
+
+# Spare rows and string slots so the next day's diff can be patched in place
+HEADROOM = 0.125
+MIN_SPARE_ROWS = 1024
+SPARE_STRINGS = 256
+# Rewrite from scratch once this share of the rows are delisted tombstones
+MAX_REMOVED = 0.25
+
+# Fixed-width record; string columns are codes into the string tables
+RECORD_DTYPE = np.dtype([
+    ('token', '<i8'),
+    ('strike', '<i8'),
+    ('tick_size', '<f8'),
+    ('expiry', '<i4'),
+    ('lotsize', '<i4'),
+    ('name', '<i4'),
+    ('instrumenttype', '<i2'),
+    ('exch_seg', '<i1'),
+    ('removed', '<u1'),
+])
+
+# Hash slot values: 0 is empty, -1 a delisted row, otherwise row + 1
+_EMPTY = 0
+_TOMBSTONE = -1
+
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+
+def _token_hash(token, bits):
+    # Fibonacci hashing: token ids are dense runs, the multiply spreads them over the table
+    return ((token * _GOLDEN) & _MASK64) >> (64 - bits)
+
+
+def _symbol_hash(symbol):
+    return zlib.crc32(symbol)
+
+
+def _hash_slots(n):
+    bits = max(4, int(2 * max(n, 1) - 1).bit_length())
+    return bits, 1 << bits
+
+
+def _insert(slots, slot, row):
+    # Linear probing past tombstones too, so duplicates stay in listing order
+    mask = len(slots) - 1
+    while slots[slot] != _EMPTY:
+        slot = (slot + 1) & mask
+    slots[slot] = row + 1
+
+
+def _build_hash(keys, hash_fn, capacity):
+    # Open addressing sized for the row capacity, so appends keep the load under half
+    bits, size = _hash_slots(capacity)
+    slots = np.zeros(size, dtype=np.int64)
+    for row, key in enumerate(keys):
+        _insert(slots, hash_fn(key, bits) & (size - 1), row)
+    return slots
+
+
+def _width(values, minimum=8):
+    # Fixed string width with room for slightly longer symbols in later patches
+    longest = max((len(v) for v in values), default=0)
+    return max(minimum, (longest // 8 + 2) * 8)
+
+
+def _strings_array(values, capacity):
+    array = np.zeros(capacity, dtype='S{}'.format(_width(values)))
+    array[:len(values)] = values
+    return array
+
+
+def store_path(cache_dir=sm.CACHE_DIR, day=None):
+    """
+    Get the path of the instrument store for a trading day.
+
+    Parameters:
+        cache_dir (str): Scrip master cache directory.
+        day (str, optional): Trading day in "YYYY-MM-DD" format. Defaults to today.
+
+    Returns:
+        str: Path of the store file.
+    """
+    return os.path.join(cache_dir, STORE_FILE.format(day=day or sm.trading_day()))
+
+
+def write_store(table, path):
+    """
+    Write an instrument table as a memory-mappable store.
+
+    Parameters:
+        table (pandas.DataFrame): Instrument table from scripMaster.load_instrument_table.
+        path (str): Path of the store file.
+    """
+    n = len(table)
+    capacity = n + max(MIN_SPARE_ROWS, int(n * HEADROOM))
+    records = np.zeros(capacity, dtype=RECORD_DTYPE)
+    for c in ('token', 'strike', 'tick_size', 'expiry', 'lotsize'):
+        records[c][:n] = table[c].to_numpy()
+    arrays = {'records': (records, n)}
+    for c in sm.CATEGORY_COLUMNS:
+        records[c][:n] = table[c].cat.codes.to_numpy()
+        categories = [v.encode() for v in table[c].cat.categories]
+        arrays['strings_' + c] = (_strings_array(categories, len(categories) + SPARE_STRINGS), len(categories))
+
+    symbols = [s.encode() for s in table['symbol']]
+    arrays['symbols'] = (_strings_array(symbols, capacity), n)
+    arrays['token_index'] = (_build_hash(records['token'][:n].tolist(), _token_hash, capacity), None)
+    arrays['symbol_index'] = (_build_hash(symbols, lambda s, bits: _symbol_hash(s), capacity), None)
+
+    layout = {'live': n}
+    offset = HEADER_SIZE
+    for key, (array, count) in arrays.items():
+        layout[key] = {
+            'offset': offset,
+            'dtype': array.dtype.str if array.dtype.names is None else None,
+            'capacity': len(array),
+            'count': len(array) if count is None else count,
+        }
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, 'wb') as file:
+        file.write(_header(layout))
+        for key, (array, count) in arrays.items():
+            file.seek(layout[key]['offset'])
+            file.write(array.tobytes())
+        file.truncate(offset)
+    os.replace(tmp_path, path)
+
+
+def _header(layout):
+    header = MAGIC + json.dumps(layout).encode()
+    if len(header) > HEADER_SIZE:
+        raise ValueError("Instrument store header does not fit in {} bytes".format(HEADER_SIZE))
+    return header.ljust(HEADER_SIZE, b'\0')
+
+
+class _StoreFull(Exception):
+    pass
+
+
+def patch_store(src_path, path, diff):
+    """
+    Write today's store by applying a scrip master diff to yesterday's.
+
+    Yesterday's rows and hash tables are reused: delisted rows become
+    tombstones, changed rows are updated where they are and new listings
+    are appended into the spare rows. Readers of yesterday's file are not
+    disturbed, the patched copy is renamed into place when complete.
+
+    Parameters:
+        src_path (str): Path of yesterday's store.
+        path (str): Path of today's store.
+        diff (scripMasterDiff.ScripMasterDiff): Changes from yesterday's table to today's.
+
+    Returns:
+        bool: True if patched, False if the store is out of headroom and must be rewritten.
+    """
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    shutil.copyfile(src_path, tmp_path)
+    try:
+        store = InstrumentStore(tmp_path, writable=True)
+        try:
+            store._apply(diff)
+        finally:
+            store.close()
+    except _StoreFull:
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+
+def previous_store(cache_dir=sm.CACHE_DIR, day=None):
+    """
+    Find the most recent store written before a trading day.
+
+    Parameters:
+        cache_dir (str): Scrip master cache directory.
+        day (str, optional): Trading day in "YYYY-MM-DD" format. Defaults to today.
+
+    Returns:
+        str: Path of the store, or None if there is none.
+    """
+    current = os.path.basename(store_path(cache_dir, day))
+    prefix, suffix = STORE_FILE.split('{day}')
+    older = sorted(f for f in os.listdir(cache_dir) if f.startswith(prefix) and f.endswith(suffix) and f < current)
+    return os.path.join(cache_dir, older[-1]) if older else None
+
+
+def update_store(cache_dir=sm.CACHE_DIR, day=None, table=None):
+    """
+    Bring the store up to a trading day, patching the previous day's store when there is one.
+
+    Parameters:
+        cache_dir (str): Scrip master cache directory.
+        day (str, optional): Trading day in "YYYY-MM-DD" format. Defaults to today.
+        table (pandas.DataFrame, optional): Today's instrument table. Defaults to the cached scrip master.
+
+    Returns:
+        scripMasterDiff.ScripMasterDiff: Changes applied, or None if the store was written from scratch.
+    """
+    if table is None:
+        table = sm.load_instrument_table(cache_dir)
+    path = store_path(cache_dir, day)
+    src_path = previous_store(cache_dir, day)
+    if src_path is not None:
+        previous = InstrumentStore(src_path)
+        try:
+            diff = smd.diff_tables(previous.to_table(), table)
+        finally:
+            previous.close()
+        if patch_store(src_path, path, diff):
+            logger.info(f"Instrument store patched from {os.path.basename(src_path)}: {diff.summary()}")
+            return diff
+    write_store(table, path)
+    logger.info(f"Instrument store written to {path}")
+    return None
+
+
+class InstrumentStore:
+    """
+    Read-only, memory-mapped instrument table shared by strategy processes.
+
+    Every process maps the same file, so the records live once in the page
+    cache no matter how many strategies run. Opening costs a header read;
+    token->row and symbol->row lookups probe the on-disk hash tables.
+    Instruments delisted by a day-over-day patch stay in `records` with
+    `removed` set and are no longer found by the lookups.
+    """
+
+    def __init__(self, path, writable=False):
+        self.path = path
+        with open(path, 'r+b' if writable else 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError("{} is not an instrument store".format(path))
+        self._layout = json.loads(bytes(self._mmap[len(MAGIC):HEADER_SIZE]).rstrip(b'\0'))
+
+        def view(key, dtype=None):
+            entry = self._layout[key]
+            return np.frombuffer(self._mmap, dtype=dtype or np.dtype(entry['dtype']), count=entry['capacity'], offset=entry['offset'])
+
+        self._all_records = view('records', RECORD_DTYPE)
+        self._all_symbols = view('symbols')
+        self._token_index = view('token_index')
+        self._symbol_index = view('symbol_index')
+        self._token_bits = len(self._token_index).bit_length() - 1
+        self._string_tables = {c: view('strings_' + c) for c in sm.CATEGORY_COLUMNS}
+        self._strings = {c: [s.decode() for s in self._string_tables[c][:self._layout['strings_' + c]['count']]] for c in sm.CATEGORY_COLUMNS}
+        self._codes = None
+        self._set_count(self._layout['records']['count'])
+
+    def _set_count(self, count):
+        self._layout['records']['count'] = self._layout['symbols']['count'] = count
+        # Rows delisted by a patch stay in place with `removed` set
+        self.records = self._all_records[:count]
+        self.symbols = self._all_symbols[:count]
+
+    @classmethod
+    def open(cls, cache_dir=sm.CACHE_DIR, day=None):
+        """
+        Open the store for a trading day, writing it first if this is the first process today.
+
+        Parameters:
+            cache_dir (str): Scrip master cache directory.
+            day (str, optional): Trading day in "YYYY-MM-DD" format. Defaults to today.
+
+        Returns:
+            InstrumentStore: Opened store.
+        """
+        path = store_path(cache_dir, day)
+        if not os.path.exists(path):
+            update_store(cache_dir, day)
+        return cls(path)
+
+    def __len__(self):
+        return self._layout['live']
+
+    def _probe(self, slots, slot, match):
+        mask = len(slots) - 1
+        while True:
+            value = int(slots[slot])
+            if value == _EMPTY:
+                return None
+            if value != _TOMBSTONE and match(value - 1):
+                return value - 1
+            slot = (slot + 1) & mask
+
+    def row_of_token(self, token, exch_seg=None):
+        """
+        Find the row of a token.
+
+        Parameters:
+            token (int | str): Instrument token.
+            exch_seg (str, optional): Exchange segment, for tokens reused across segments.
+
+        Returns:
+            int: Row position, or None if not listed.
+        """
+        token = int(token)
+        tokens = self.records['token']
+        if exch_seg is None:
+            match = lambda row: tokens[row] == token
+        else:
+            segments = self._strings['exch_seg']
+            codes = self.records['exch_seg']
+            match = lambda row: tokens[row] == token and segments[codes[row]] == exch_seg
+        return self._probe(self._token_index, _token_hash(token, self._token_bits), match)
+
+    def row_of_symbol(self, symbol):
+        """
+        Find the row of a trading symbol.
+
+        Parameters:
+            symbol (str): Trading symbol (e.g., NIFTY05DEC2424000CE).
+
+        Returns:
+            int: Row position, or None if not listed.
+        """
+        key = symbol.encode()
+        symbols = self.symbols
+        mask = len(self._symbol_index) - 1
+        return self._probe(self._symbol_index, _symbol_hash(key) & mask, lambda row: symbols[row] == key)
+
+    def record(self, row):
+        """
+        Get the instrument at a row position as a dict.
+
+        Parameters:
+            row (int): Row position.
+
+        Returns:
+            dict: Same fields as InstrumentIndex.record.
+        """
+        rec = self.records[row]
+        expiry = int(rec['expiry'])
+        return {
+            'token': str(int(rec['token'])),
+            'symbol': self.symbols[row].decode(),
+            'name': self._strings['name'][rec['name']],
+            'expiry': None if expiry == sm.NO_EXPIRY else date(1970, 1, 1) + timedelta(days=expiry),
+            'strike': int(rec['strike']),
+            'lotsize': int(rec['lotsize']),
+            'instrumenttype': self._strings['instrumenttype'][rec['instrumenttype']],
+            'exch_seg': self._strings['exch_seg'][rec['exch_seg']],
+        }
+
+    def by_token(self, token, exch_seg=None):
+        """
+        Look up an instrument by token.
+
+        Parameters:
+            token (int | str): Instrument token.
+            exch_seg (str, optional): Exchange segment.
+
+        Returns:
+            dict: Instrument record, or None if not listed.
+        """
+        row = self.row_of_token(token, exch_seg)
+        return None if row is None else self.record(row)
+
+    def by_symbol(self, symbol):
+        """
+        Look up an instrument by trading symbol.
+
+        Parameters:
+            symbol (str): Trading symbol.
+
+        Returns:
+            dict: Instrument record, or None if not listed.
+        """
+        row = self.row_of_symbol(symbol)
+        return None if row is None else self.record(row)
+
+    def token_to_symbol(self, token, exch_seg=None):
+        """
+        Get the trading symbol of a token.
+
+        Parameters:
+            token (int | str): Instrument token.
+            exch_seg (str, optional): Exchange segment.
+
+        Returns:
+            str: Trading symbol, or None if not listed.
+        """
+        row = self.row_of_token(token, exch_seg)
+        return None if row is None else self.symbols[row].decode()
+
+    def to_table(self, names=None):
+        """
+        Copy the store, or the instruments of some underlyings, into an instrument table DataFrame.
+
+        Selecting `names` reads the whole mapping but copies only the matching
+        rows, so a strategy that trades a few underlyings keeps a small private
+        table while the full one stays in the shared page cache.
+
+        Parameters:
+            names (iterable, optional): Underlying names (e.g., ['NIFTY']). Defaults to every instrument.
+
+        Returns:
+            pandas.DataFrame: Instrument table, see scripMaster.build_instrument_table.
+        """
+        live = self.records['removed'] == 0
+        if names is not None:
+            codes = [i for i, name in enumerate(self._strings['name']) if name in set(names)]
+            live &= np.isin(self.records['name'], codes)
+        records = self.records[live]
+        category = {c: pd.Categorical.from_codes(records[c], self._strings[c]) for c in sm.CATEGORY_COLUMNS}
+        return pd.DataFrame({
+            'token': records['token'],
+            'symbol': self.symbols[live].astype(str).astype(object),
+            'name': category['name'],
+            'expiry': records['expiry'],
+            'strike': records['strike'],
+            'lotsize': records['lotsize'],
+            'instrumenttype': category['instrumenttype'],
+            'exch_seg': category['exch_seg'],
+            'tick_size': records['tick_size'],
+        })
+
+    def _code(self, column, value):
+        if self._codes is None:
+            self._codes = {c: {v: i for i, v in enumerate(self._strings[c])} for c in sm.CATEGORY_COLUMNS}
+        code = self._codes[column].get(value)
+        if code is not None:
+            return code
+        strings = self._strings[column]
+        table = self._string_tables[column]
+        encoded = value.encode()
+        if len(strings) == len(table) or len(encoded) > table.dtype.itemsize:
+            raise _StoreFull(column)
+        table[len(strings)] = encoded
+        strings.append(value)
+        self._codes[column][value] = len(strings) - 1
+        self._layout['strings_' + column]['count'] = len(strings)
+        return len(strings) - 1
+
+    def _unlink(self, slots, slot, row):
+        mask = len(slots) - 1
+        while slots[slot] != row + 1:
+            slot = (slot + 1) & mask
+        slots[slot] = _TOMBSTONE
+
+    def _remove(self, row):
+        rec = self._all_records[row]
+        rec['removed'] = 1
+        self._unlink(self._token_index, _token_hash(int(rec['token']), self._token_bits), row)
+        self._unlink(self._symbol_index, _symbol_hash(self._all_symbols[row]) & (len(self._symbol_index) - 1), row)
+        self._layout['live'] -= 1
+
+    def _fill(self, row, instrument):
+        rec = self._all_records[row]
+        for c in ('token', 'strike', 'tick_size', 'expiry', 'lotsize'):
+            rec[c] = instrument[c]
+        for c in sm.CATEGORY_COLUMNS:
+            rec[c] = self._code(c, instrument[c])
+
+    def _append(self, instrument):
+        row = len(self.records)
+        symbol = instrument['symbol'].encode()
+        if row == len(self._all_records) or len(symbol) > self._all_symbols.dtype.itemsize:
+            raise _StoreFull('records')
+        self._fill(row, instrument)
+        self._all_symbols[row] = symbol
+        _insert(self._token_index, _token_hash(int(instrument['token']), self._token_bits), row)
+        _insert(self._symbol_index, _symbol_hash(symbol) & (len(self._symbol_index) - 1), row)
+        self._set_count(row + 1)
+        self._layout['live'] += 1
+
+    def _apply(self, diff):
+        for instrument in diff.removed.to_dict('records'):
+            self._remove(self.row_of_token(instrument['token'], instrument['exch_seg']))
+        for instrument, fields in zip(diff.changed.to_dict('records'), diff.fields):
+            row = self.row_of_token(instrument['token'], instrument['exch_seg'])
+            if 'symbol' in fields:
+                # The symbol hash moves too, so relist it as a new row
+                self._remove(row)
+                self._append(instrument)
+            else:
+                self._fill(row, instrument)
+        for instrument in diff.added.to_dict('records'):
+            self._append(instrument)
+        if len(self.records) - self._layout['live'] > MAX_REMOVED * len(self.records):
+            raise _StoreFull('removed')
+        self._mmap[:HEADER_SIZE] = _header(self._layout)
+        self._mmap.flush()
+
+    def close(self):
+        """Release the mapping. Views taken from `records` must not be used afterwards."""
+        self.records = self.symbols = self._all_records = self._all_symbols = None
+        self._token_index = self._symbol_index = self._string_tables = None
+        self._mmap.close()
+
+
+def _open_and_lookup(args):
+    path, token = args
+    start = time.perf_counter()
+    store = InstrumentStore(path)
+    opened = time.perf_counter() - start
+    symbol = store.token_to_symbol(token)
+    return opened, symbol, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _private_mb():
+    # Memory of this process not shared with others (Linux), in MiB
+    try:
+        with open('/proc/self/smaps_rollup') as file:
+            return sum(int(line.split()[1]) for line in file if line.startswith('Private_')) / 1024
+    except OSError:
+        return float('nan')
+
+
+def _strategy_memory(args):
+    # Instrument table and index as a strategy process builds them, from the snapshot or the store
+    import instrumentIndex as ii
+
+    path, cache_dir, names = args
+    before = _private_mb()
+    if path is None:
+        table = sm.load_instrument_table(cache_dir, refresh=False)
+    else:
+        table = InstrumentStore(path).to_table(names)
+    index = ii.InstrumentIndex(table)
+    return _private_mb() - before, len(index)
+
+
+def benchmark(cache_dir=sm.CACHE_DIR, processes=4, repeat=10000):
+    """
+    Time store build, open and lookups, and the footprint of several reader processes.
+
+    Parameters:
+        cache_dir (str): Scrip master cache directory.
+        processes (int, optional): Reader processes to spawn. Defaults to 4.
+        repeat (int, optional): Lookups per timing. Defaults to 10000.
+
+    Returns:
+        dict: Timings in milliseconds / microseconds.
+    """
+    table = sm.load_instrument_table(cache_dir, refresh=False)
+    path = store_path(cache_dir)
+
+    start = time.perf_counter()
+    write_store(table, path)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store = InstrumentStore(path)
+    opened = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sm.load_instrument_table(cache_dir, refresh=False)
+    snapshot = time.perf_counter() - start
+
+    sample = np.random.default_rng(0).integers(0, len(store), size=repeat)
+    tokens = store.records['token'][sample].tolist()
+    symbols = [store.symbols[i].decode() for i in sample]
+    start = time.perf_counter()
+    for token in tokens:
+        store.row_of_token(token)
+    by_token = (time.perf_counter() - start) / repeat * 1e6
+    start = time.perf_counter()
+    for symbol in symbols:
+        store.row_of_symbol(symbol)
+    by_symbol = (time.perf_counter() - start) / repeat * 1e6
+    assert all(store.row_of_symbol(s) is not None for s in symbols[:100])
+
+    with multiprocessing.get_context('spawn').Pool(processes) as pool:
+        readers = pool.map(_open_and_lookup, [(path, tokens[i]) for i in range(processes)])
+    # A fresh process per measurement, so no reader reuses memory freed by an earlier one
+    names = ['NIFTY', 'BANKNIFTY']
+    with multiprocessing.get_context('spawn').Pool(processes, maxtasksperchild=1) as pool:
+        private = pool.map(_strategy_memory, [(None, cache_dir, None)] * processes + [(path, cache_dir, names)] * processes, chunksize=1)
+    # ru_maxrss is bytes on macOS, KB elsewhere
+    scale = 1 if sys.platform == 'darwin' else 1024
+
+    results = {
+        'build_ms': build * 1e3,
+        'open_ms': opened * 1e3,
+        'snapshot_load_ms': snapshot * 1e3,
+        'token_lookup_us': by_token,
+        'symbol_lookup_us': by_symbol,
+        'reader_open_ms': max(r[0] for r in readers) * 1e3,
+        'snapshot_private_mb': max(p[0] for p in private[:processes]),
+        'store_private_mb': max(p[0] for p in private[processes:]),
+    }
+    print("{} instruments, store {:.1f} MiB".format(len(store), os.path.getsize(path) / 2**20))
+    print("store build                : {:.1f} ms".format(results['build_ms']))
+    print("open mmap / load snapshot  : {:.3f} ms / {:.1f} ms".format(results['open_ms'], results['snapshot_load_ms']))
+    print("token / symbol -> row      : {:.2f} us / {:.2f} us".format(by_token, by_symbol))
+    print("{} reader processes        : open <= {:.3f} ms, peak RSS {:.1f} MiB each".format(
+        processes, results['reader_open_ms'], max(r[2] for r in readers) * scale / 2**20))
+    print("strategy table + index     : {:.1f} MiB private each from the snapshot ({} rows), {:.1f} MiB from the store for {} ({} rows)".format(
+        results['snapshot_private_mb'], private[0][1], results['store_private_mb'], '/'.join(names), private[-1][1]))
+    store.close()
+    return results
+
+
+if __name__ == "__main__":
+    sm.download_scrip_master()
+    benchmark()
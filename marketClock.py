@@ -0,0 +1,360 @@
+# marketClock.py
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from logzero import logger
+
+import scripMaster as sm
+import candleCache as cc
+
+
+SESSION_OPEN = (9, 15)
+SESSION_CLOSE = (15, 30)
+
+# NSE equity and F&O trading holidays; add later years through HOLIDAY_FILE
+NSE_HOLIDAYS = {
+    date(2024, 1, 22), date(2024, 1, 26), date(2024, 3, 8), date(2024, 3, 25), date(2024, 3, 29),
+    date(2024, 4, 11), date(2024, 4, 17), date(2024, 5, 1), date(2024, 5, 20), date(2024, 6, 17),
+    date(2024, 7, 17), date(2024, 8, 15), date(2024, 10, 2), date(2024, 11, 1), date(2024, 11, 15),
+    date(2024, 11, 20), date(2024, 12, 25),
+    date(2025, 2, 26), date(2025, 3, 14), date(2025, 3, 31), date(2025, 4, 10), date(2025, 4, 14),
+    date(2025, 4, 18), date(2025, 5, 1), date(2025, 8, 15), date(2025, 8, 27), date(2025, 10, 2),
+    date(2025, 10, 21), date(2025, 10, 22), date(2025, 11, 5), date(2025, 12, 25),
+    date(2026, 1, 26), date(2026, 3, 3), date(2026, 3, 26), date(2026, 3, 31), date(2026, 4, 3),
+    date(2026, 4, 14), date(2026, 5, 1), date(2026, 5, 28), date(2026, 6, 26), date(2026, 9, 14),
+    date(2026, 10, 2), date(2026, 10, 20), date(2026, 11, 10), date(2026, 11, 24), date(2026, 12, 25),
+}
+
+# One "YYYY-MM-DD" per line, as published in the NSE holiday circular
+HOLIDAY_FILE = "nseHolidays.txt"
+
+
+def load_holidays(path=HOLIDAY_FILE):
+    """
+    Read extra trading holidays from a file.
+
+    Parameters:
+        path (str, optional): File with one "YYYY-MM-DD" per line; '#' starts a comment.
+
+    Returns:
+        set: Holiday dates, empty if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path) as file:
+        lines = (line.split('#')[0].strip() for line in file)
+        return {datetime.strptime(line, "%Y-%m-%d").date() for line in lines if line}
+
+
+class MarketClock:
+    """
+    NSE session calendar: trading days, session times and bar close instants.
+
+    A year without any holiday listed is almost certainly one whose NSE
+    circular has not been added yet; its holidays would be taken for
+    trading days, so a warning is logged the first time such a year is
+    used, and for the current year when the clock is created.
+    """
+
+    def __init__(self, holidays=None, open=SESSION_OPEN, close=SESSION_CLOSE):
+        self.holidays = NSE_HOLIDAYS | load_holidays() | set(holidays or ())
+        self.open = open
+        self.close = close
+        self._years = {day.year for day in self.holidays}
+        self._check_year(datetime.now(sm.IST).year)
+
+    def _check_year(self, year):
+        if year not in self._years:
+            self._years.add(year)
+            logger.warning(f"No NSE holidays known for {year}: every weekday is taken as a trading day. "
+                           f"Add the year's holiday circular to {HOLIDAY_FILE}")
+
+    def is_trading_day(self, day):
+        """
+        Check whether the market trades on a day.
+
+        Parameters:
+            day (date): Calendar day.
+
+        Returns:
+            bool: False on weekends and holidays.
+        """
+        if day.year not in self._years:
+            self._check_year(day.year)
+        return day.weekday() < 5 and day not in self.holidays
+
+    def trading_days(self, start):
+        """
+        Iterate over trading days from a day on.
+
+        Parameters:
+            start (date): First day to consider.
+
+        Yields:
+            date: Trading days in order.
+        """
+        day = start
+        while True:
+            if self.is_trading_day(day):
+                yield day
+            day += timedelta(days=1)
+
+    def session(self, day):
+        """
+        Get the session of a day.
+
+        Parameters:
+            day (date): Trading day.
+
+        Returns:
+            tuple: (open, close) as int epoch seconds.
+        """
+        midnight = sm.IST.localize(datetime(day.year, day.month, day.day))
+        start = int(midnight.timestamp())
+        return start + self.open[0] * 3600 + self.open[1] * 60, start + self.close[0] * 3600 + self.close[1] * 60
+
+    def local_day(self, ts):
+        """
+        Get the IST calendar day of a time.
+
+        Parameters:
+            ts (float): Epoch seconds.
+
+        Returns:
+            date: Day in IST.
+        """
+        return datetime.fromtimestamp(ts, sm.IST).date()
+
+    def is_open(self, ts):
+        """
+        Check whether the market is in session at a time.
+
+        Parameters:
+            ts (float): Epoch seconds.
+
+        Returns:
+            bool: True between the open and the close of a trading day.
+        """
+        day = self.local_day(ts)
+        if not self.is_trading_day(day):
+            return False
+        open, close = self.session(day)
+        return open <= ts < close
+
+    def next_bar_close(self, interval, after):
+        """
+        Get the first bar close strictly after a time.
+
+        Bars are aligned to the open; the last bar of the day closes with the session.
+
+        Parameters:
+            interval (str): Candle interval (e.g., ONE_MINUTE, ONE_DAY).
+            after (float): Epoch seconds.
+
+        Returns:
+            int: Epoch seconds of the close.
+        """
+        step = cc.INTERVAL_SECONDS[interval]
+        for day in self.trading_days(self.local_day(after)):
+            open, close = self.session(day)
+            if after >= close:
+                continue
+            if interval == 'ONE_DAY' or after < open:
+                return close if interval == 'ONE_DAY' else min(open + step, close)
+            return min(open + (int(after - open) // step + 1) * step, close)
+
+
+class Scheduler:
+    """
+    Runs callbacks on the market clock instead of fixed sleeps.
+
+    Bar callbacks fire at each close of their interval (plus `delay`, to
+    give the broker time to publish the bar). Intervals that close at the
+    same instant are coalesced: one wake-up, and a callback subscribed to
+    several of them is called once with all of them. Pre-open hooks run
+    `pre_open` seconds before each session, post-close hooks `post_close`
+    seconds after it; nothing fires on weekends or holidays.
+    """
+
+    def __init__(self, clock=None, delay=0.0, pre_open=15 * 60, post_close=5 * 60, now=time.time, sleep=time.sleep):
+        self.clock = clock or MarketClock()
+        self.delay = delay
+        self.pre_open = pre_open
+        self.post_close = post_close
+        self._now = now
+        self._sleep = sleep
+        self._bars = []
+        self._pre_open_hooks = []
+        self._post_close_hooks = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.fired = 0
+        self.max_jitter = 0.0
+
+    def every(self, interval, callback):
+        """
+        Call `callback(closed_at, intervals)` at every close of an interval.
+
+        Parameters:
+            interval (str | list): Candle interval(s), e.g. 'FIVE_MINUTE'.
+            callback (callable): Receives the close as an IST datetime and the intervals that closed.
+        """
+        intervals = [interval] if isinstance(interval, str) else list(interval)
+        for existing in self._bars:
+            if existing[0] is callback:
+                existing[1].update(intervals)
+                return
+        self._bars.append((callback, set(intervals)))
+
+    def on_pre_open(self, callback):
+        """
+        Call `callback(day)` before each session, for warm-up such as login and backfill.
+
+        Parameters:
+            callback (callable): Receives the trading day.
+        """
+        self._pre_open_hooks.append(callback)
+
+    def on_post_close(self, callback):
+        """
+        Call `callback(day)` after each session, for shutdown and end-of-day work.
+
+        Parameters:
+            callback (callable): Receives the trading day.
+        """
+        self._post_close_hooks.append(callback)
+
+    def next_event(self, after):
+        """
+        Get the next instant anything is due.
+
+        Parameters:
+            after (float): Epoch seconds.
+
+        Returns:
+            tuple: (ts, pre_open_day, closes, post_close_day) with ts in epoch
+            seconds, closes the set of intervals closing at ts and the days
+            set when a pre-open or post-close is due at ts, else None.
+        """
+        candidates = {}
+        intervals = set().union(*(i for _, i in self._bars)) if self._bars else set()
+        for interval in intervals:
+            ts = self.clock.next_bar_close(interval, after - self.delay) + self.delay
+            candidates.setdefault(ts, [set(), None, None])[0].add(interval)
+        day = self.clock.local_day(after - self.post_close)
+        for day in self.clock.trading_days(day):
+            open, close = self.clock.session(day)
+            if self._pre_open_hooks and open - self.pre_open > after:
+                candidates.setdefault(open - self.pre_open, [set(), None, None])[1] = day
+            if self._post_close_hooks and close + self.post_close > after:
+                candidates.setdefault(close + self.post_close, [set(), None, None])[2] = day
+            if open - self.pre_open > after:
+                break
+        if not candidates:
+            return None
+        ts = min(candidates)
+        closes, pre_open_day, post_close_day = candidates[ts]
+        return ts, pre_open_day, closes, post_close_day
+
+    def _sleep_until(self, ts):
+        # Coarse sleep, then short naps for the last few milliseconds
+        while not self._stop.is_set():
+            remaining = ts - self._now()
+            if remaining <= 0:
+                return True
+            self._sleep(remaining - 0.005 if remaining > 0.02 else min(remaining, 0.001))
+        return False
+
+    def _call(self, callback, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.exception(f"Scheduled callback {getattr(callback, '__name__', callback)} failed: {e}")
+
+    def run(self, until=None):
+        """
+        Fire callbacks until stop() is called or `until` is reached.
+
+        Parameters:
+            until (float, optional): Epoch seconds to return at. Defaults to running forever.
+        """
+        self._stop.clear()
+        after = self._now()
+        while not self._stop.is_set():
+            event = self.next_event(after)
+            if event is None or (until is not None and event[0] > until):
+                return
+            ts, pre_open_day, closes, post_close_day = event
+            if not self._sleep_until(ts):
+                return
+            self.max_jitter = max(self.max_jitter, self._now() - ts)
+            self.fired += 1
+            if pre_open_day is not None:
+                for callback in self._pre_open_hooks:
+                    self._call(callback, pre_open_day)
+            if closes:
+                closed_at = datetime.fromtimestamp(ts - self.delay, sm.IST)
+                for callback, intervals in self._bars:
+                    due = intervals & closes
+                    if due:
+                        self._call(callback, closed_at, sorted(due, key=cc.INTERVAL_SECONDS.get))
+            if post_close_day is not None:
+                for callback in self._post_close_hooks:
+                    self._call(callback, post_close_day)
+            after = ts
+
+    def start(self):
+        """Run the scheduler on a daemon thread."""
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop run() after the callback in progress."""
+        self._stop.set()
+
+
+class SimulatedTime:
+    """Clock whose sleep advances time instantly, to run a session through a Scheduler."""
+
+    def __init__(self, start):
+        self.ts = start
+
+    def now(self):
+        return self.ts
+
+    def sleep(self, seconds):
+        self.ts += max(seconds, 0)
+
+
+if __name__ == "__main__":
+    # A simulated day: 2024-12-05 (Thursday) through the next morning
+    start = sm.IST.localize(datetime(2024, 12, 5, 8, 0)).timestamp()
+    sim = SimulatedTime(start)
+    scheduler = Scheduler(now=sim.now, sleep=sim.sleep)
+    calls = []
+    scheduler.every(['FIVE_MINUTE', 'FIFTEEN_MINUTE', 'ONE_HOUR'], lambda at, intervals: calls.append((at, intervals)))
+    scheduler.on_pre_open(lambda day: calls.append(('pre_open', day)))
+    scheduler.on_post_close(lambda day: calls.append(('post_close', day)))
+    scheduler.run(until=start + 86400)
+    print(calls[0], calls[1], calls[3], calls[-2], calls[-1], sep='\n')
+    assert calls[0] == ('pre_open', date(2024, 12, 5)) and calls[-1] == ('post_close', date(2024, 12, 5))
+    assert len(calls) == 2 + 75
+    assert calls[3][1] == ['FIVE_MINUTE', 'FIFTEEN_MINUTE']
+
+    # Holidays and weekends are skipped: the close after Friday 2024-12-20 is Monday 2024-12-23,
+    # and 2024-12-25 is a holiday
+    clock = MarketClock()
+    friday_close = clock.session(date(2024, 12, 20))[1]
+    print(datetime.fromtimestamp(clock.next_bar_close('ONE_MINUTE', friday_close), sm.IST))
+    print(datetime.fromtimestamp(clock.next_bar_close('ONE_DAY', clock.session(date(2024, 12, 24))[1]), sm.IST))
+
+    # Wake-up accuracy on the real clock
+    scheduler = Scheduler()
+    targets = [time.time() + 0.05 * (i + 1) for i in range(20)]
+    jitter = []
+    for ts in targets:
+        scheduler._sleep_until(ts)
+        jitter.append(time.time() - ts)
+    print("wake-up jitter: max {:.2f} ms, mean {:.2f} ms".format(max(jitter) * 1e3, sum(jitter) / len(jitter) * 1e3))
@@ -0,0 +1,285 @@
+# ohlcvStore.py
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import scripMaster as sm
+import candleCache as cc
+
+
+STORE_DIR = "ohlcvStore"
+
+# One fixed-width row per bar; a partition file is a plain array of these
+RECORD_DTYPE = np.dtype([
+    ('ts', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<i8'),
+])
+
+DAY_NS = cc.DAY_NS
+IST_OFFSET_NS = cc.IST_OFFSET_NS
+
+
+def to_ns(value):
+    """
+    Convert a time to int64 ns since the epoch.
+
+    Parameters:
+        value (datetime | pandas.Timestamp | str | int): Time; naive values are taken as IST, ints as ns.
+
+    Returns:
+        int: Nanoseconds since 1970-01-01 UTC.
+    """
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    value = pd.Timestamp(value)
+    if value.tzinfo is None:
+        value = value.tz_localize(sm.IST)
+    return value.value
+
+
+def partition_of(interval, ts):
+    """
+    Get the partition name of a bar.
+
+    Intraday bars are partitioned per IST trading day, daily bars per year.
+
+    Parameters:
+        interval (str): Candle interval (e.g., ONE_MINUTE).
+        ts (int): Bar time in ns since the epoch.
+
+    Returns:
+        str: "YYYY-MM-DD", or "YYYY" for ONE_DAY.
+    """
+    return str(_partition_keys(interval, np.array([ts], dtype=np.int64))[0])
+
+
+def _partition_keys(interval, ts):
+    days = ((ts + IST_OFFSET_NS) // DAY_NS).astype('datetime64[D]')
+    return days.astype('datetime64[Y]') if interval == 'ONE_DAY' else days
+
+
+class OHLCVStore:
+    """
+    Append-only candle store under `root/exchange/token/interval/partition.bin`.
+
+    Partitions are read through read-only memory maps, so a range query
+    touches only the pages it slices: whole partitions inside the range are
+    taken as they are and the two edge partitions are cut by binary search
+    on their timestamp column.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+
+    def _dir(self, exchange, symboltoken, interval):
+        return os.path.join(self.root, exchange, str(symboltoken), interval)
+
+    def partitions(self, exchange, symboltoken, interval):
+        """
+        List the partitions held for an instrument.
+
+        Parameters:
+            exchange (str): Exchange name (e.g., NSE, NFO).
+            symboltoken (str): Symbol token.
+            interval (str): Candle interval.
+
+        Returns:
+            list: Partition names in time order.
+        """
+        path = self._dir(exchange, symboltoken, interval)
+        if not os.path.isdir(path):
+            return []
+        return sorted(f[:-4] for f in os.listdir(path) if f.endswith('.bin'))
+
+    def _map(self, exchange, symboltoken, interval, partition):
+        path = os.path.join(self._dir(exchange, symboltoken, interval), partition + '.bin')
+        count = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        if count == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(count,))
+
+    def last_ts(self, exchange, symboltoken, interval):
+        """
+        Get the time of the latest stored bar.
+
+        Parameters:
+            exchange (str): Exchange name.
+            symboltoken (str): Symbol token.
+            interval (str): Candle interval.
+
+        Returns:
+            int: ns since the epoch, or None if nothing is stored.
+        """
+        for partition in reversed(self.partitions(exchange, symboltoken, interval)):
+            bars = self._map(exchange, symboltoken, interval, partition)
+            if len(bars):
+                return int(bars['ts'][-1])
+        return None
+
+    def append(self, exchange, symboltoken, interval, ts, ohlc, volume):
+        """
+        Append completed bars.
+
+        Bars at or before the latest stored bar are skipped, so writing an
+        overlapping download twice is harmless.
+
+        Parameters:
+            exchange (str): Exchange name.
+            symboltoken (str): Symbol token.
+            interval (str): Candle interval.
+            ts (numpy.ndarray): int64 ns timestamps, ascending.
+            ohlc (numpy.ndarray): float64 (n, 4) open/high/low/close.
+            volume (numpy.ndarray): int64 volume.
+
+        Returns:
+            int: Number of bars written.
+        """
+        last = self.last_ts(exchange, symboltoken, interval)
+        keep = slice(None) if last is None else slice(int(np.searchsorted(ts, last, side='right')), None)
+        ts, ohlc, volume = ts[keep], ohlc[keep], volume[keep]
+        if len(ts) == 0:
+            return 0
+
+        rows = np.empty(len(ts), dtype=RECORD_DTYPE)
+        rows['ts'] = ts
+        rows['open'], rows['high'], rows['low'], rows['close'] = ohlc.T
+        rows['volume'] = volume
+
+        directory = self._dir(exchange, symboltoken, interval)
+        os.makedirs(directory, exist_ok=True)
+        keys = _partition_keys(interval, ts)
+        bounds = np.r_[0, np.flatnonzero(keys[1:] != keys[:-1]) + 1, len(ts)]
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            path = os.path.join(directory, str(keys[lo]) + '.bin')
+            with open(path, 'ab') as file:
+                # Drop a torn row left by an interrupted write before appending
+                size = file.tell()
+                if size % RECORD_DTYPE.itemsize:
+                    file.truncate(size - size % RECORD_DTYPE.itemsize)
+                file.write(rows[lo:hi].tobytes())
+        return len(rows)
+
+    def append_frame(self, exchange, symboltoken, interval, frame):
+        """
+        Append the bars of a CandleFrame.
+
+        Parameters:
+            exchange (str): Exchange name.
+            symboltoken (str): Symbol token.
+            interval (str): Candle interval.
+            frame (candleCache.CandleFrame): Completed bars.
+
+        Returns:
+            int: Number of bars written.
+        """
+        ohlc = np.column_stack([frame.open, frame.high, frame.low, frame.close])
+        return self.append(exchange, symboltoken, interval, frame.ts, ohlc, frame.volume)
+
+    def iter_range(self, exchange, symboltoken, interval, start=None, end=None):
+        """
+        Yield the stored bars of a time range, one partition at a time.
+
+        Parameters:
+            exchange (str): Exchange name.
+            symboltoken (str): Symbol token.
+            interval (str): Candle interval.
+            start (datetime | int, optional): First bar time, inclusive. Defaults to the first stored bar.
+            end (datetime | int, optional): Last bar time, inclusive. Defaults to the latest stored bar.
+
+        Yields:
+            numpy.ndarray: Read-only memory-mapped RECORD_DTYPE slices; no bars are copied.
+        """
+        start = None if start is None else to_ns(start)
+        end = None if end is None else to_ns(end)
+        first = None if start is None else partition_of(interval, start)
+        last = None if end is None else partition_of(interval, end)
+        for partition in self.partitions(exchange, symboltoken, interval):
+            if (first is not None and partition < first) or (last is not None and partition > last):
+                continue
+            bars = self._map(exchange, symboltoken, interval, partition)
+            lo = 0 if start is None or partition != first else int(np.searchsorted(bars['ts'], start))
+            hi = len(bars) if end is None or partition != last else int(np.searchsorted(bars['ts'], end, side='right'))
+            if hi > lo:
+                yield bars[lo:hi]
+
+    def read(self, exchange, symboltoken, interval, start=None, end=None):
+        """
+        Copy the stored bars of a time range into a CandleFrame.
+
+        Parameters:
+            exchange (str): Exchange name.
+            symboltoken (str): Symbol token.
+            interval (str): Candle interval.
+            start (datetime | int, optional): First bar time, inclusive.
+            end (datetime | int, optional): Last bar time, inclusive.
+
+        Returns:
+            candleCache.CandleFrame: Bars in the range.
+        """
+        parts = list(self.iter_range(exchange, symboltoken, interval, start, end))
+        frame = cc.CandleFrame(max(1, sum(len(p) for p in parts)))
+        for bars in parts:
+            ohlc = np.column_stack([bars['open'], bars['high'], bars['low'], bars['close']])
+            frame.merge(np.asarray(bars['ts']), ohlc, np.asarray(bars['volume']))
+        return frame
+
+
+def benchmark(root, days=250, repeat=20):
+    """
+    Time appends and range queries over a year of one-minute bars.
+
+    Parameters:
+        root (str): Scratch directory for the store.
+        days (int, optional): Sessions to write. Defaults to 250.
+        repeat (int, optional): Queries per timing. Defaults to 20.
+
+    Returns:
+        dict: Timings in milliseconds.
+    """
+    store = OHLCVStore(root)
+    sessions = pd.bdate_range('2024-01-01', periods=days)
+    ts = np.concatenate([
+        (pd.Timestamp(d).tz_localize(sm.IST) + pd.Timedelta('9h15min')).value + np.arange(375) * 60 * cc.NS
+        for d in sessions
+    ])
+    close = 22000 + np.cumsum(np.random.default_rng(0).normal(0, 5, len(ts)))
+    ohlc = np.column_stack([close, close + 2, close - 2, close])
+    volume = np.full(len(ts), 1000, dtype=np.int64)
+
+    start = time.perf_counter()
+    for lo in range(0, len(ts), 375):
+        store.append('NSE', '26000', 'ONE_MINUTE', ts[lo:lo + 375], ohlc[lo:lo + 375], volume[lo:lo + 375])
+    write = (time.perf_counter() - start) / days * 1e3
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = fn()
+        return (time.perf_counter() - start) / repeat * 1e3, result
+
+    month = (sessions[100].to_pydatetime().replace(hour=11), sessions[121].to_pydatetime().replace(hour=14))
+    month_ms, frame = timed(lambda: store.read('NSE', '26000', 'ONE_MINUTE', *month))
+    lo = np.searchsorted(ts, to_ns(month[0]))
+    hi = np.searchsorted(ts, to_ns(month[1]), side='right')
+    assert np.array_equal(frame.ts, ts[lo:hi]) and np.array_equal(frame.close, close[lo:hi])
+    scan_ms, mean = timed(lambda: np.mean([p['close'].mean() for p in store.iter_range('NSE', '26000', 'ONE_MINUTE')]))
+
+    results = {'append_day_ms': write, 'read_month_ms': month_ms, 'scan_year_ms': scan_ms}
+    print("{} bars in {} partitions".format(len(ts), days))
+    print("append one session         : {:.3f} ms".format(write))
+    print("read a month ({} bars)   : {:.2f} ms".format(len(frame), month_ms))
+    print("scan a year of closes      : {:.2f} ms".format(scan_ms))
+    return results
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as root:
+        benchmark(root)
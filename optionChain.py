@@ -0,0 +1,230 @@
+# optionChain.py
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+import scripMaster as sm
+import instrumentIndex as ii
+
+
+class OptionChain:
+    """
+    Strike ladder of one (underlying, expiry) with parallel CE/PE contracts.
+
+    Strikes are held sorted, in rupees, so ATM and ATM±k are a binary
+    search away. The strike step is inferred from the listed strikes
+    instead of being assumed to be 100.
+    """
+
+    def __init__(self, table, name, expiry, instrumenttype=None):
+        """
+        Build the chain from the instrument table.
+
+        Parameters:
+            table (pandas.DataFrame): Instrument table from scripMaster.load_instrument_table.
+            name (str): Underlying name (e.g., NIFTY, BANKNIFTY).
+            expiry (date): Expiry date.
+            instrumenttype (str, optional): OPTIDX or OPTSTK. Defaults to any option type.
+        """
+        if expiry is None:
+            raise ValueError("No expiry given for the {} option chain".format(name))
+        if not pd.api.types.is_integer_dtype(table['expiry']):
+            table = sm.build_instrument_table(table)
+        self.name = name
+        self.expiry = expiry
+        self.expiry_day = ii.expiry_days(expiry)
+
+        mask = (table['name'] == name) & (table['expiry'] == self.expiry_day)
+        if instrumenttype is None:
+            mask &= table['instrumenttype'].astype(str).str.startswith('OPT')
+        else:
+            mask &= table['instrumenttype'] == instrumenttype
+        options = table[mask]
+        symbol = options['symbol'].to_numpy(dtype=object)
+        is_ce = np.array([s.endswith('CE') for s in symbol], dtype=bool)
+        is_pe = np.array([s.endswith('PE') for s in symbol], dtype=bool)
+
+        strike_paise = np.unique(options['strike'].to_numpy()[is_ce | is_pe])
+        self.strikes = strike_paise / 100
+        self._strike_list = self.strikes.tolist()
+        self.step = self._infer_step(self.strikes)
+
+        n = len(self.strikes)
+        self.ce_token = np.full(n, -1, dtype=np.int64)
+        self.pe_token = np.full(n, -1, dtype=np.int64)
+        self.ce_symbol = np.full(n, None, dtype=object)
+        self.pe_symbol = np.full(n, None, dtype=object)
+        pos = np.searchsorted(strike_paise, options['strike'].to_numpy())
+        token = options['token'].to_numpy()
+        # Reversed so the first listing in file order wins, as getTokenInfo's iloc[0] did
+        for flag, tokens, symbols in ((is_ce, self.ce_token, self.ce_symbol), (is_pe, self.pe_token, self.pe_symbol)):
+            tokens[pos[flag][::-1]] = token[flag][::-1]
+            symbols[pos[flag][::-1]] = symbol[flag][::-1]
+        self.lotsize = int(options['lotsize'].iloc[0]) if len(options) else None
+        self.exch_seg = str(options['exch_seg'].iloc[0]) if len(options) else None
+        self._atm = n // 2
+
+    def __len__(self):
+        return len(self.strikes)
+
+    @staticmethod
+    def _infer_step(strikes):
+        if len(strikes) < 2:
+            return None
+        # Most common gap; far OTM strikes are often listed at a wider step
+        gaps, counts = np.unique(np.round(np.diff(strikes), 2), return_counts=True)
+        return float(gaps[np.argmax(counts)])
+
+    def atm_index(self, spot):
+        """
+        Get the position of the strike nearest to the spot.
+
+        Parameters:
+            spot (float): Underlying price.
+
+        Returns:
+            int: Position in `strikes`; ties go to the higher strike.
+        """
+        strikes = self._strike_list
+        i = bisect_left(strikes, spot)
+        if i == 0:
+            return 0
+        if i == len(strikes):
+            return i - 1
+        return i if strikes[i] - spot <= spot - strikes[i - 1] else i - 1
+
+    def recenter(self, spot):
+        """
+        Move the cached ATM to the strike nearest to a new spot.
+
+        The search walks from the previous ATM, so intraday moves of a few
+        strikes cost a few comparisons instead of a full search.
+
+        Parameters:
+            spot (float): Underlying price.
+
+        Returns:
+            int: Position of the new ATM strike.
+        """
+        strikes = self._strike_list
+        i = self._atm
+        if not strikes:
+            return i
+        while i + 1 < len(strikes) and strikes[i + 1] - spot <= spot - strikes[i]:
+            i += 1
+        while i > 0 and spot - strikes[i - 1] < strikes[i] - spot:
+            i -= 1
+        self._atm = i
+        return i
+
+    def atm(self, spot):
+        """
+        Get the ATM strike.
+
+        Parameters:
+            spot (float): Underlying price.
+
+        Returns:
+            float: Strike in rupees, or None if no strikes are listed.
+        """
+        return self._strike_list[self.recenter(spot)] if self._strike_list else None
+
+    def strike_at(self, spot, k=0):
+        """
+        Get the strike k steps away from ATM.
+
+        Parameters:
+            spot (float): Underlying price.
+            k (int, optional): Strikes above (+) or below (-) ATM. Defaults to 0.
+
+        Returns:
+            float: Strike in rupees, or None if the ladder is not that wide.
+        """
+        i = self.recenter(spot) + k
+        return self._strike_list[i] if 0 <= i < len(self._strike_list) else None
+
+    def leg(self, spot, pe_ce, k=0):
+        """
+        Get the contract k strikes from ATM.
+
+        Parameters:
+            spot (float): Underlying price.
+            pe_ce (str): 'CE' or 'PE'.
+            k (int, optional): Strikes above (+) or below (-) ATM. Defaults to 0.
+
+        Returns:
+            dict: token, symbol, strike and lotsize, or None if not listed.
+        """
+        return self._record(self.recenter(spot) + k, pe_ce)
+
+    def otm(self, spot, pe_ce, k=1):
+        """
+        Get the contract k strikes out of the money.
+
+        Parameters:
+            spot (float): Underlying price.
+            pe_ce (str): 'CE' (higher strikes) or 'PE' (lower strikes).
+            k (int, optional): Strikes away from ATM. Defaults to 1.
+
+        Returns:
+            dict: token, symbol, strike and lotsize, or None if not listed.
+        """
+        return self.leg(spot, pe_ce, k if pe_ce == 'CE' else -k)
+
+    def ladder(self, spot, width):
+        """
+        Get the strikes within `width` steps of ATM with both legs.
+
+        Parameters:
+            spot (float): Underlying price.
+            width (int): Strikes on each side of ATM.
+
+        Returns:
+            pandas.DataFrame: strike, ce_token, ce_symbol, pe_token and pe_symbol.
+        """
+        i = self.recenter(spot)
+        window = slice(max(0, i - width), i + width + 1)
+        return pd.DataFrame({
+            'strike': self.strikes[window],
+            'ce_token': self.ce_token[window],
+            'ce_symbol': self.ce_symbol[window],
+            'pe_token': self.pe_token[window],
+            'pe_symbol': self.pe_symbol[window],
+        })
+
+    def nearest_premium(self, premiums, target, pe_ce):
+        """
+        Get the contract whose premium is nearest to a target.
+
+        Call premiums fall as strikes rise and put premiums rise, so the
+        search is a bisection over the premiums in that order.
+
+        Parameters:
+            premiums (array-like): Premium per strike, aligned with `strikes`; NaN where unknown.
+            target (float): Premium to look for.
+            pe_ce (str): 'CE' or 'PE'.
+
+        Returns:
+            dict: token, symbol, strike and lotsize, or None if no premium is known.
+        """
+        premiums = np.asarray(premiums, dtype=np.float64)
+        known = np.flatnonzero(~np.isnan(premiums))
+        if pe_ce == 'CE':
+            known = known[::-1]
+        if len(known) == 0:
+            return None
+        ordered = premiums[known]
+        j = int(np.searchsorted(ordered, target))
+        if j == len(ordered) or (j > 0 and target - ordered[j - 1] <= ordered[j] - target):
+            j -= 1
+        return self._record(int(known[j]), pe_ce)
+
+    def _record(self, i, pe_ce):
+        if not 0 <= i < len(self._strike_list):
+            return None
+        token = (self.ce_token if pe_ce == 'CE' else self.pe_token)[i]
+        if token < 0:
+            return None
+        symbol = (self.ce_symbol if pe_ce == 'CE' else self.pe_symbol)[i]
+        return {'token': str(token), 'symbol': symbol, 'strike': self._strike_list[i], 'lotsize': self.lotsize}
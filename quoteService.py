@@ -0,0 +1,258 @@
+# quoteService.py
+import threading
+import time
+
+import numpy as np
+from logzero import logger
+
+import rateLimiter as rl
+
+
+# Tokens getMarketData accepts per request
+MAX_TOKENS = 50
+
+# Seconds a quote is served from the cache without asking the broker again
+TTL = 1.0
+
+# Seconds an old quote may still be served when a refresh fails
+MAX_STALENESS = 30.0
+
+
+class _Pending:
+    """Fetch in flight for some tokens; later callers asking for the same tokens wait on it."""
+
+    __slots__ = ('done',)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class QuoteService:
+    """
+    Quotes through batched getMarketData calls, in place of one ltpData call per price.
+
+    The tokens a caller asks for that are not in the cache (or older than
+    its `max_age`) are fetched together, `MAX_TOKENS` per request. A token
+    already being fetched for another thread is not asked for again: the
+    caller waits for that fetch instead. If a refresh fails, a quote up to
+    `max_staleness` seconds old is served rather than none.
+    """
+
+    def __init__(self, smartApi, mode='LTP', ttl=TTL, max_staleness=MAX_STALENESS, clock=time.monotonic):
+        self.smartApi = smartApi
+        self.mode = mode
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+        self.stale = 0
+        self._clock = clock
+        self._quotes = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def quotes(self, keys, max_age=None):
+        """
+        Get the quotes of several instruments.
+
+        Parameters:
+            keys (list): (exchange, token) pairs, e.g. [('NSE', '26000'), ('NFO', '43512')].
+            max_age (float, optional): Oldest cached quote to accept, in seconds. Defaults to `ttl`.
+
+        Returns:
+            dict: (exchange, token) -> quote dict as getMarketData returns it (ltp, and
+            open/high/low/close in OHLC mode). Instruments without a quote are left out.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        keys = list(dict.fromkeys((exchange, str(token)) for exchange, token in keys))
+        result, waits, fetch = {}, [], []
+        with self._lock:
+            now = self._clock()
+            for key in keys:
+                cached = self._quotes.get(key)
+                if cached is not None and now - cached[1] <= max_age:
+                    result[key] = cached[0]
+                    self.hits += 1
+                elif key in self._pending:
+                    waits.append(self._pending[key])
+                    self.joined += 1
+                else:
+                    self._pending[key] = _Pending()
+                    fetch.append(key)
+                    self.misses += 1
+        if fetch:
+            self._fetch(fetch)
+        for pending in waits:
+            pending.done.wait()
+
+        with self._lock:
+            now = self._clock()
+            for key in keys:
+                if key in result:
+                    continue
+                cached = self._quotes.get(key)
+                if cached is None:
+                    continue
+                age = now - cached[1]
+                if age <= max(max_age, self.max_staleness):
+                    result[key] = cached[0]
+                    if age > max_age:
+                        self.stale += 1
+        return result
+
+    def _fetch(self, keys):
+        try:
+            for i in range(0, len(keys), MAX_TOKENS):
+                exchange_tokens = {}
+                for exchange, token in keys[i:i + MAX_TOKENS]:
+                    exchange_tokens.setdefault(exchange, []).append(token)
+                rl.rate_limiter('getMarketData').acquire()
+                try:
+                    response = self.smartApi.getMarketData(self.mode, exchange_tokens)
+                except Exception as e:
+                    logger.warning(f"getMarketData failed for {len(keys[i:i + MAX_TOKENS])} tokens: {e}")
+                    continue
+                finally:
+                    with self._lock:
+                        self.requests += 1
+                if not response or not response.get('status'):
+                    logger.warning(f"getMarketData failed: {response and response.get('message')}")
+                    continue
+                now = self._clock()
+                with self._lock:
+                    for quote in response['data']['fetched']:
+                        self._quotes[(quote['exchange'], str(quote['symbolToken']))] = (quote, now)
+        finally:
+            with self._lock:
+                for key in keys:
+                    self._pending.pop(key).done.set()
+
+    def ltp(self, exchange, token, max_age=None):
+        """
+        Get the last traded price of an instrument.
+
+        Parameters:
+            exchange (str): Exchange segment (e.g., NSE, NFO).
+            token (str): Symbol token.
+            max_age (float, optional): Oldest cached quote to accept, in seconds. Defaults to `ttl`.
+
+        Returns:
+            float: Last traded price, or None.
+        """
+        quote = self.quotes([(exchange, token)], max_age).get((exchange, str(token)))
+        return None if quote is None else quote['ltp']
+
+    def ltps(self, exchange, tokens, max_age=None):
+        """
+        Get the last traded prices of instruments of one exchange in one round trip.
+
+        Parameters:
+            exchange (str): Exchange segment.
+            tokens (list): Symbol tokens.
+            max_age (float, optional): Oldest cached quote to accept, in seconds. Defaults to `ttl`.
+
+        Returns:
+            numpy.ndarray: Price per token, NaN where there is none.
+        """
+        tokens = [str(t) for t in tokens]
+        quotes = self.quotes([(exchange, t) for t in tokens], max_age)
+        return np.array([quotes[(exchange, t)]['ltp'] if (exchange, t) in quotes else np.nan for t in tokens])
+
+    def chain_premiums(self, chain, spot=None, width=None, max_age=None):
+        """
+        Get the premiums of an option chain, both legs in one round trip per MAX_TOKENS contracts.
+
+        Parameters:
+            chain (optionChain.OptionChain): Chain to price.
+            spot (float, optional): Underlying price; with `width`, only strikes near ATM are priced.
+            width (int, optional): Strikes on each side of ATM. Defaults to the whole chain.
+            max_age (float, optional): Oldest cached quote to accept, in seconds. Defaults to `ttl`.
+
+        Returns:
+            tuple: (ce, pe) arrays aligned with `chain.strikes`, NaN where not priced;
+            suitable for OptionChain.nearest_premium.
+        """
+        if width is None or spot is None:
+            rows = np.arange(len(chain))
+        else:
+            i = chain.atm_index(spot)
+            rows = np.arange(max(0, i - width), min(len(chain), i + width + 1))
+        premiums = []
+        tokens = [chain.ce_token[rows], chain.pe_token[rows]]
+        prices = self.ltps(chain.exch_seg, [t for leg in tokens for t in leg[leg >= 0].tolist()], max_age)
+        offset = 0
+        for leg in tokens:
+            listed = leg >= 0
+            premium = np.full(len(chain), np.nan)
+            premium[rows[listed]] = prices[offset:offset + listed.sum()]
+            offset += listed.sum()
+            premiums.append(premium)
+        return tuple(premiums)
+
+    def stats(self):
+        """
+        Get the service counters.
+
+        Returns:
+            dict: Requests sent, cache hits, misses, joined fetches and stale quotes served.
+        """
+        with self._lock:
+            return {'requests': self.requests, 'hits': self.hits, 'misses': self.misses,
+                    'joined': self.joined, 'stale': self.stale}
+
+
+if __name__ == "__main__":
+    # Offline check against the local getMarketData stand-in
+    from concurrent.futures import ThreadPoolExecutor
+    import pandas as pd
+    from SmartApi import SmartConnect
+
+    import scripMaster as sm
+    import optionChain as oc
+    import fakeSmartApi as fake
+
+    server = fake.FakeSmartApiServer(latency=0.05)
+    obj = SmartConnect(api_key='fake', root=server.start())
+
+    # A 61-strike chain: 122 contracts
+    strikes = np.arange(23000, 26001, 50)
+    rows = [{'token': 50000 + 2 * i + k, 'symbol': 'NIFTY12DEC24{}{}'.format(s, pe_ce), 'name': 'NIFTY',
+             'expiry': '12DEC2024', 'strike': s * 100.0, 'lotsize': 25, 'instrumenttype': 'OPTIDX',
+             'exch_seg': 'NFO', 'tick_size': 5.0}
+            for i, s in enumerate(strikes) for k, pe_ce in enumerate(('CE', 'PE'))]
+    table = sm.build_instrument_table(pd.DataFrame(rows).assign(expiry=lambda df: pd.to_datetime(df['expiry'], format='%d%b%Y')))
+    chain = oc.OptionChain(table, 'NIFTY', table['expiry'].iloc[0], 'OPTIDX')
+
+    service = QuoteService(obj)
+    start = time.perf_counter()
+    ce, pe = service.chain_premiums(chain)
+    batched_s = time.perf_counter() - start
+    assert not np.isnan(ce).any() and not np.isnan(pe).any()
+    assert service.requests == -(-2 * len(strikes) // MAX_TOKENS)
+
+    start = time.perf_counter()
+    for token in chain.ce_token[:10]:
+        obj.getMarketData('LTP', {'NFO': [str(token)]})
+    single_s = (time.perf_counter() - start) / 10 * 2 * len(strikes)
+    print("{} contracts: {} getMarketData requests, {:.2f} s ({:.2f} s one request per contract)".format(
+        2 * len(strikes), service.requests, batched_s, single_s))
+
+    # Cached within the TTL, refetched past a caller's own bound
+    service.chain_premiums(chain, spot=24500, width=5)
+    assert service.requests == 3
+    service.quotes([('NFO', chain.ce_token[0])], max_age=0.0)
+    assert service.requests == 4
+
+    # Eight threads asking for the spot at once: one request
+    service = QuoteService(obj)
+    with ThreadPoolExecutor(8) as pool:
+        spots = list(pool.map(lambda _: service.ltp('NSE', '26000'), range(8)))
+    assert len(set(spots)) == 1 and service.requests == 1, service.stats()
+
+    # A failed refresh serves the last quote within the staleness bound
+    server.stop()
+    assert service.ltp('NSE', '26000', max_age=0.0) == spots[0]
+    assert service.ltp('NSE', '26000', max_age=0.0) is not None and service.stale == 2
+    print(service.stats())
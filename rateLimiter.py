@@ -0,0 +1,88 @@
+# rateLimiter.py
+import threading
+import time
+
+
+# SmartAPI requests per second per endpoint
+RATE_LIMITS = {
+    'getCandleData': 3,
+    'getMarketData': 10,
+    'ltpData': 10,
+    'placeOrder': 20,
+    'modifyOrder': 20,
+    'cancelOrder': 20,
+}
+
+# Stay a little under the published limits, arrival jitter at the broker would otherwise trip them
+HEADROOM = 0.9
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: `burst` calls may go at once, then one every `1/rate` seconds.
+
+    Each caller reserves the next free slot under the lock and sleeps
+    outside it, so waiting threads never serialize on the lock and slots
+    are handed out in arrival order. `_next` is when the bucket would be
+    full again; a call may go up to `burst - 1` intervals before it.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.interval = 1.0 / rate
+        self.burst = max(1, int(rate if burst is None else burst))
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until the caller may send a request.
+
+        Returns:
+            float: Seconds waited.
+        """
+        with self._lock:
+            now = time.monotonic()
+            full = max(now, self._next)
+            slot = max(now, full - (self.burst - 1) * self.interval)
+            self._next = full + self.interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def rate_limiter(endpoint):
+    """
+    Get the limiter shared by every caller of an endpoint in this process.
+
+    Parameters:
+        endpoint (str): SmartConnect method name (e.g., getCandleData).
+
+    Returns:
+        RateLimiter: Shared limiter.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(endpoint)
+        if limiter is None:
+            limiter = _limiters[endpoint] = RateLimiter(RATE_LIMITS.get(endpoint, 10) * HEADROOM)
+        return limiter
+
+
+if __name__ == "__main__":
+    # A full bucket lets `burst` calls through at once, then spaces the rest
+    limiter = RateLimiter(20)
+    start = time.monotonic()
+    sent = [limiter.acquire() for _ in range(25)]
+    elapsed = time.monotonic() - start
+    print("25 calls at 20/s, burst 20: {:.3f} s".format(elapsed))
+    assert max(sent[:20]) < 0.01 and 0.2 <= elapsed < 0.3
+    # Idle time refills it, up to `burst`
+    time.sleep(0.5)
+    start = time.monotonic()
+    for _ in range(10):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.01
+    assert limiter.acquire() > 0
@@ -0,0 +1,270 @@
+# resampler.py
+import time
+
+import numpy as np
+
+import candleCache as cc
+import candleDecoder as cd
+
+
+TIMEFRAMES = ['THREE_MINUTE', 'FIVE_MINUTE', 'TEN_MINUTE', 'FIFTEEN_MINUTE', 'THIRTY_MINUTE', 'ONE_HOUR', 'ONE_DAY']
+
+# NSE cash and F&O session in IST, as ns after midnight
+SESSION_OPEN_NS = (9 * 3600 + 15 * 60) * cc.NS
+SESSION_CLOSE_NS = (15 * 3600 + 30 * 60) * cc.NS
+
+
+def bucket_start(ts, step):
+    """
+    Get the start of the bar containing a time, aligned to the 09:15 IST open.
+
+    Parameters:
+        ts (int): Time in ns since the epoch.
+        step (int): Bar length in ns, or None for daily bars (stamped at IST midnight, as SmartAPI does).
+
+    Returns:
+        int: Bar start in ns since the epoch.
+    """
+    local = ts + cc.IST_OFFSET_NS
+    day = local - local % cc.DAY_NS
+    if step is None:
+        return day - cc.IST_OFFSET_NS
+    return day + SESSION_OPEN_NS + (local - day - SESSION_OPEN_NS) // step * step - cc.IST_OFFSET_NS
+
+
+def bucket_end(start, step):
+    """
+    Get the time a bar closes; the last bar of the session is cut short at 15:30.
+
+    Parameters:
+        start (int): Bar start in ns since the epoch.
+        step (int): Bar length in ns, or None for daily bars.
+
+    Returns:
+        int: Close time in ns since the epoch.
+    """
+    local = start + cc.IST_OFFSET_NS
+    close = local - local % cc.DAY_NS + SESSION_CLOSE_NS - cc.IST_OFFSET_NS
+    return close if step is None else min(start + step, close)
+
+
+class Resampler:
+    """
+    Higher-timeframe bars built from one base feed of bars or ticks.
+
+    Each timeframe keeps the committed part of its forming bar; the base
+    bar still forming is held apart, so a re-delivered (updated) base bar
+    replaces it instead of being counted twice. Every base bar costs O(1)
+    per timeframe. Completed bars go to a CandleFrame per (key, timeframe)
+    and to the subscribed callbacks.
+    """
+
+    def __init__(self, timeframes=TIMEFRAMES, base='ONE_MINUTE'):
+        self.base = base
+        self.base_step = cc.INTERVAL_SECONDS[base] * cc.NS
+        self.timeframes = list(timeframes)
+        self._steps = [(tf, None if tf == 'ONE_DAY' else cc.INTERVAL_SECONDS[tf] * cc.NS) for tf in self.timeframes]
+        self._step_of = dict(self._steps)
+        self._forming = {}
+        self._committed = {}
+        self._partial = {}
+        self._frames = {}
+        self._subscribers = {}
+        self._fed = {}
+
+    def subscribe(self, key, timeframe, callback):
+        """
+        Call `callback(key, timeframe, bar)` whenever a bar of a timeframe closes.
+
+        Parameters:
+            key (tuple): Instrument key, e.g. (exchange, token).
+            timeframe (str): One of `timeframes`.
+            callback (callable): Receives the bar as (ts, open, high, low, close, volume).
+        """
+        if timeframe not in self.timeframes:
+            raise ValueError("Timeframe {} is not resampled here".format(timeframe))
+        self._subscribers.setdefault((key, timeframe), []).append(callback)
+
+    def frame(self, key, timeframe):
+        """
+        Get the completed bars of a timeframe.
+
+        Parameters:
+            key (tuple): Instrument key.
+            timeframe (str): One of `timeframes`.
+
+        Returns:
+            candleCache.CandleFrame: Completed bars, oldest first.
+        """
+        frame = self._frames.get((key, timeframe))
+        if frame is None:
+            frame = self._frames[(key, timeframe)] = cc.CandleFrame()
+        return frame
+
+    def current(self, key, timeframe):
+        """
+        Get the forming bar of a timeframe, including the forming base bar.
+
+        Parameters:
+            key (tuple): Instrument key.
+            timeframe (str): One of `timeframes`.
+
+        Returns:
+            tuple: (ts, open, high, low, close, volume), or None before the first bar.
+        """
+        step = self._step_of[timeframe]
+        partial = self._partial.get((key, timeframe))
+        forming = self._forming.get(key)
+        if forming is None or (partial is not None and bucket_start(forming[0], step) != partial[0]):
+            return None if partial is None else tuple(partial)
+        if partial is None:
+            return (bucket_start(forming[0], step),) + tuple(forming[1:])
+        return (partial[0], partial[1], max(partial[2], forming[2]), min(partial[3], forming[3]),
+                forming[4], partial[5] + forming[5])
+
+    def _emit(self, key, timeframe, bar):
+        self.frame(key, timeframe).append(*bar)
+        for callback in self._subscribers.get((key, timeframe), ()):
+            callback(key, timeframe, tuple(bar))
+
+    def _commit(self, key, bar):
+        ts, o, h, l, c, v = bar
+        self._committed[key] = ts
+        for timeframe, step in self._steps:
+            start = bucket_start(ts, step)
+            partial = self._partial.get((key, timeframe))
+            if partial is not None and partial[0] == start:
+                if h > partial[2]:
+                    partial[2] = h
+                if l < partial[3]:
+                    partial[3] = l
+                partial[4] = c
+                partial[5] += v
+            else:
+                if partial is not None:
+                    self._emit(key, timeframe, partial)
+                self._partial[(key, timeframe)] = [start, o, h, l, c, v]
+
+    def add_bar(self, key, ts, open, high, low, close, volume):
+        """
+        Feed one base bar; a bar with the timestamp of the forming one replaces it.
+
+        Parameters:
+            key (tuple): Instrument key.
+            ts (int): Base bar start in ns since the epoch.
+            open, high, low, close (float): Prices.
+            volume (int): Volume.
+        """
+        if ts <= self._committed.get(key, -1):
+            return
+        forming = self._forming.get(key)
+        if forming is not None:
+            if ts == forming[0]:
+                forming[1:] = open, high, low, close, volume
+                return
+            if ts < forming[0]:
+                return
+            self._commit(key, forming)
+            # The new base bar opens a later bucket: close the ones it has left behind
+            for timeframe, step in self._steps:
+                partial = self._partial.get((key, timeframe))
+                if partial is not None and bucket_start(ts, step) != partial[0]:
+                    self._emit(key, timeframe, partial)
+                    del self._partial[(key, timeframe)]
+        self._forming[key] = [ts, open, high, low, close, volume]
+
+    def add_tick(self, key, ts, price, quantity=0):
+        """
+        Feed one trade; it updates the base bar it falls in.
+
+        Parameters:
+            key (tuple): Instrument key.
+            ts (int): Trade time in ns since the epoch.
+            price (float): Trade price.
+            quantity (int, optional): Traded quantity. Defaults to 0.
+        """
+        start = bucket_start(ts, self.base_step)
+        forming = self._forming.get(key)
+        if forming is not None and forming[0] == start:
+            if price > forming[2]:
+                forming[2] = price
+            if price < forming[3]:
+                forming[3] = price
+            forming[4] = price
+            forming[5] += quantity
+        else:
+            self.add_bar(key, start, price, price, price, price, quantity)
+
+    def feed(self, key, frame):
+        """
+        Feed the new bars of a base CandleFrame, as kept by candleCache.CandleCache.
+
+        The last bar fed before is fed again, since the broker updates the forming bar.
+
+        Parameters:
+            key (tuple): Instrument key.
+            frame (candleCache.CandleFrame): Base interval bars.
+        """
+        ts, o, h, l, c, v = frame.ts, frame.open, frame.high, frame.low, frame.close, frame.volume
+        for i in range(max(self._fed.get(key, 0) - 1, 0), len(frame)):
+            self.add_bar(key, int(ts[i]), float(o[i]), float(h[i]), float(l[i]), float(c[i]), int(v[i]))
+        self._fed[key] = len(frame)
+
+    def advance(self, now):
+        """
+        Close every bar that has ended by a time, without waiting for the next base bar.
+
+        Parameters:
+            now (int): Current time in ns since the epoch.
+        """
+        for key, forming in list(self._forming.items()):
+            if bucket_end(forming[0], self.base_step) <= now:
+                self._commit(key, forming)
+                del self._forming[key]
+        for (key, timeframe), partial in list(self._partial.items()):
+            if bucket_end(partial[0], self._step_of[timeframe]) <= now:
+                self._emit(key, timeframe, partial)
+                del self._partial[(key, timeframe)]
+
+
+def benchmark(days=10):
+    """
+    Resample synthetic one-minute bars and check them against the broker's own candles.
+
+    Parameters:
+        days (int, optional): Calendar days of one-minute bars. Defaults to 10.
+
+    Returns:
+        dict: Microseconds per base bar for all timeframes.
+    """
+    from datetime import datetime, timedelta
+    import fakeSmartApi as fake
+
+    to_date = datetime(2024, 12, 6, 15, 30)
+    from_date = to_date - timedelta(days=days)
+    base = cc.CandleFrame()
+    base.merge(*cd.decode(fake.candles(26000, 'ONE_MINUTE', from_date, to_date)))
+
+    resampler = Resampler()
+    closed = []
+    resampler.subscribe(('NSE', '26000'), 'FIVE_MINUTE', lambda key, tf, bar: closed.append(bar))
+    start = time.perf_counter()
+    resampler.feed(('NSE', '26000'), base)
+    resampler.advance(int(base.ts[-1]) + cc.DAY_NS)
+    per_bar = (time.perf_counter() - start) / len(base) * 1e6
+
+    for timeframe in TIMEFRAMES:
+        ts, ohlc, volume = cd.decode(fake.candles(26000, timeframe, from_date, to_date))
+        frame = resampler.frame(('NSE', '26000'), timeframe)
+        assert np.array_equal(frame.ts, ts), timeframe
+        assert np.allclose(np.column_stack([frame.open, frame.high, frame.low, frame.close]), ohlc), timeframe
+        assert np.array_equal(frame.volume, volume), timeframe
+    assert len(closed) == len(resampler.frame(('NSE', '26000'), 'FIVE_MINUTE'))
+
+    print("{} one-minute bars -> {} timeframes : {:.1f} us per bar, matches getCandleData".format(
+        len(base), len(TIMEFRAMES), per_bar))
+    return {'us_per_bar': per_bar}
+
+
+if __name__ == "__main__":
+    benchmark()
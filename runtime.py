@@ -0,0 +1,350 @@
+# runtime.py
+import base64
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import types
+from datetime import datetime
+
+
+CONFIG_PATH = '/Users/swapnilk/Desktop/GITHUB/Config.yaml'
+SESSION_FILE = 'data.json'
+
+# Record the session's ticks and API responses into a directory, or replay recordings
+# (os.pathsep-separated log files, see tickRecorder) instead of trading live; replay runs
+# at ALGO_REPLAY_SPEED times real time, as fast as possible if unset
+RECORD_DIR = os.environ.get('ALGO_RECORD')
+REPLAY_PATHS = os.environ.get('ALGO_REPLAY')
+REPLAY_SPEED = float(os.environ['ALGO_REPLAY_SPEED']) if os.environ.get('ALGO_REPLAY_SPEED') else None
+
+_resources = {}
+_lock = threading.RLock()
+
+
+def lazy_import(name):
+    """
+    Import a module on first attribute access instead of now.
+
+    Parameters:
+        name (str): Module name (e.g., pandas_ta).
+
+    Returns:
+        module: The module, or a stand-in that loads it when first used.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError("No module named '{}'".format(name), name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def _once(name, build):
+    # Built on first use and kept for the life of the process (and its forks, see warmHost)
+    with _lock:
+        if name not in _resources:
+            _resources[name] = build()
+        return _resources[name]
+
+
+def _daily(name, build):
+    # Built on first use each trading day; a long-lived process (or a fork of one) rebuilds it the next day
+    import scripMaster as sm
+
+    day = sm.trading_day()
+    with _lock:
+        built = _resources.get(name)
+        if built is None or built[0] != day:
+            built = _resources[name] = (day, build())
+        return built[1]
+
+
+def _forget(*names):
+    with _lock:
+        for name in names:
+            _resources.pop(name, None)
+
+
+def _jwt_expiry(token):
+    # `exp` claim of a JWT in seconds since the epoch, None if it cannot be read
+    try:
+        payload = token.split()[-1].split('.')[1]
+        return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))['exp']
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def session_valid(smartApi=None):
+    """
+    Check that a SmartAPI session's access token has not expired.
+
+    Parameters:
+        smartApi (SmartConnect, optional): Session to check. Defaults to the one saved in data.json.
+
+    Returns:
+        bool: False if the token has expired or there is no saved session; True if it is
+        valid or carries no readable expiry.
+    """
+    if smartApi is not None:
+        token = smartApi.access_token
+    else:
+        try:
+            with open(SESSION_FILE, 'r') as jsonFile:
+                token = json.load(jsonFile)['access_token']
+        except (FileNotFoundError, KeyError, json.JSONDecodeError):
+            return False
+    expiry = _jwt_expiry(token)
+    return expiry is None or expiry > time.time()
+
+
+def config():
+    """
+    Read Config.yaml once.
+
+    Returns:
+        dict: The parsed config. Exits if the file or the AngelOne username is missing.
+    """
+    def build():
+        import yaml
+
+        if not os.path.exists(CONFIG_PATH):
+            print(f"Error: Config file not found at {CONFIG_PATH}")
+            sys.exit(1)
+        with open(CONFIG_PATH) as file:
+            try:
+                databaseConfig = yaml.safe_load(file)
+            except yaml.YAMLError as exc:
+                print(f"Error reading the config file: {exc}")
+                sys.exit(1)
+        if databaseConfig.get('AngelOneCred', {}).get('username') is None:
+            print("Error: 'username' not found in the config file.")
+            sys.exit(1)
+        print("Config file loaded successfully.")
+        return databaseConfig
+
+    return _once('config', build)
+
+
+def telegram():
+    """
+    Get the Telegram credentials from the config.
+
+    Returns:
+        tuple: (TelegramBotCredential, Chat_Id).
+    """
+    telegram = config()['Telegram']
+    return telegram['TelegramBotCredential'], telegram['Chat_Id']
+
+
+def recorder():
+    """
+    Get the recorder of this process, when RECORD_DIR is set.
+
+    Returns:
+        tickRecorder.Recorder: Recorder writing to RECORD_DIR, or None.
+    """
+    import tickRecorder as tr
+
+    if not RECORD_DIR:
+        return None
+    return _once('recorder', lambda: tr.Recorder(RECORD_DIR))
+
+
+def replay_feed():
+    """
+    Get the replay of REPLAY_PATHS, when set.
+
+    Returns:
+        tickRecorder.ReplayFeed: Replay whose simulated clock starts at the first recorded
+        tick or call, or None.
+    """
+    def build():
+        import marketClock as mc
+        import tickRecorder as tr
+
+        feed = tr.ReplayFeed(REPLAY_PATHS.split(os.pathsep), speed=REPLAY_SPEED)
+        feed.clock = mc.SimulatedTime(feed.start_time() or time.time())
+        return feed
+
+    if not REPLAY_PATHS:
+        return None
+    return _once('replay_feed', build)
+
+
+def clock():
+    """
+    Get the clock strategies run on: the replay's simulated clock, or the system clock.
+
+    Returns:
+        object: With now() in seconds since the epoch and sleep(seconds), as marketClock.Scheduler takes.
+    """
+    feed = replay_feed()
+    if feed is not None:
+        return feed.clock
+    return _once('clock', lambda: types.SimpleNamespace(now=time.time, sleep=time.sleep))
+
+
+def now():
+    """
+    Get the current time on clock().
+
+    Returns:
+        datetime: Naive IST time, as candleCache.CandleCache.get takes.
+    """
+    import scripMaster as sm
+
+    return datetime.fromtimestamp(clock().now(), sm.IST).replace(tzinfo=None)
+
+
+def smart_api():
+    """
+    Get the SmartAPI session saved by angelOneLoginGenerateSession.py.
+
+    The session is read again on a new trading day, or when its token has
+    expired (data.json may hold a newer login by then). With RECORD_DIR set
+    the responses of tickRecorder.RECORDED_METHODS are recorded; with
+    REPLAY_PATHS set they are answered from the recording instead.
+
+    Returns:
+        SmartConnect: Session built from data.json, shared by every caller in the process.
+        Exits if the saved session has expired.
+    """
+    if REPLAY_PATHS:
+        return _once('replay_smart_api', lambda: replay_feed().smart_api())
+
+    def build():
+        from SmartApi import SmartConnect
+
+        with open(SESSION_FILE, 'r') as jsonFile:
+            cred = json.load(jsonFile)
+        smartApi = SmartConnect(api_key=cred['api_key'], access_token=cred['access_token'], refresh_token=cred['refresh_token'],
+                                feed_token=cred['feed_token'], userId=cred['userId'])
+        return smartApi if not RECORD_DIR else recorder().wrap(smartApi)
+
+    smartApi = _daily('smart_api', build)
+    if not session_valid(smartApi):
+        _forget('smart_api', 'quote_service')
+        smartApi = _daily('smart_api', build)
+        if not session_valid(smartApi):
+            _forget('smart_api', 'quote_service')
+            print(f"Error: the session in {SESSION_FILE} has expired; run angelOneLoginGenerateSession.py")
+            sys.exit(1)
+    return smartApi
+
+
+def market_feed():
+    """
+    Get the market feed of the session, recorded with RECORD_DIR set and replayed with REPLAY_PATHS.
+
+    Returns:
+        marketFeed.MarketFeed: Feed shared by every caller in the process (a
+        tickRecorder.ReplayFeed on a replay). Start it once subscribed.
+    """
+    def build():
+        import marketFeed as mf
+
+        feed = mf.MarketFeed.from_session(smart_api())
+        if RECORD_DIR:
+            recorder().attach_feed(feed)
+        return feed
+
+    if REPLAY_PATHS:
+        return replay_feed()
+    return _daily('market_feed', build)
+
+
+def instrument_store():
+    """
+    Get today's instrument store, written by the first process of the day.
+
+    Returns:
+        instrumentStore.InstrumentStore: Memory-mapped store, its pages shared by every strategy process.
+    """
+    import instrumentStore as ist
+
+    return _daily('instrument_store', ist.InstrumentStore.open)
+
+
+def instrument_table(names=None):
+    """
+    Get today's instrument table, read from the shared instrument store.
+
+    Parameters:
+        names (iterable, optional): Underlyings traded (e.g., ['NIFTY']); only their
+            instruments are copied into the process. Defaults to every instrument.
+
+    Returns:
+        pandas.DataFrame: Instrument table, see scripMaster.build_instrument_table.
+    """
+    names = None if names is None else tuple(sorted(names))
+    return _daily(('instrument_table', names), lambda: instrument_store().to_table(names))
+
+
+def instrument_index(names=None):
+    """
+    Get the instrument index of today's table.
+
+    Parameters:
+        names (iterable, optional): Underlyings traded, as for instrument_table().
+
+    Returns:
+        instrumentIndex.InstrumentIndex: Shared index.
+    """
+    import instrumentIndex as ii
+
+    names = None if names is None else tuple(sorted(names))
+    return _daily(('instrument_index', names), lambda: ii.InstrumentIndex(instrument_table(names)))
+
+
+def quote_service():
+    """
+    Get the quote service of the session.
+
+    Returns:
+        quoteService.QuoteService: Batched, cached quotes shared by every caller in the process.
+    """
+    import quoteService as qs
+
+    session = smart_api()
+    service = _daily('quote_service', lambda: qs.QuoteService(session))
+    if service.smartApi is not session:
+        _forget('quote_service')
+        service = _daily('quote_service', lambda: qs.QuoteService(session))
+    return service
+
+
+def warm(modules=('numpy', 'pandas', 'SmartApi', 'pandas_ta', 'yaml', 'pyotp')):
+    """
+    Import the heavy libraries, build today's session and map today's instrument store now.
+
+    A session that has expired is not loaded; strategies then exit on
+    smart_api() until a new login is saved.
+
+    Parameters:
+        modules (tuple, optional): Libraries to import. Missing ones are skipped.
+
+    Returns:
+        list: Modules that could not be imported.
+    """
+    missing = []
+    for name in modules:
+        try:
+            # Touch an attribute, so a module imported through lazy_import loads now
+            getattr(importlib.import_module(name), '__file__', None)
+        except ImportError:
+            missing.append(name)
+    config()
+    if session_valid():
+        smart_api()
+    else:
+        print(f"Warning: no valid session in {SESSION_FILE}; log in before starting strategies")
+    instrument_store()
+    return missing
@@ -0,0 +1,565 @@
+# scripMaster.py
+import os
+import re
+import sys
+import json
+import time
+from datetime import datetime, date, timedelta
+
+import numpy as np
+import pandas as pd
+import requests
+from pytz import timezone
+from logzero import logger
+
+
+SCRIP_MASTER_URL = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
+
+CACHE_DIR = "scripMasterCache"
+RAW_FILE = "ScripMaster.json"
+META_FILE = "ScripMaster.meta.json"
+SNAPSHOT_FILE = "InstrumentTable.npz"
+
+IST = timezone('Asia/Kolkata')
+
+# Columns that arrive as strings, in scrip master order.
+STRING_COLUMNS = ['token', 'symbol', 'name', 'instrumenttype', 'exch_seg']
+
+# Low-cardinality columns stored as categoricals in the instrument table.
+CATEGORY_COLUMNS = ['name', 'instrumenttype', 'exch_seg']
+
+# Instrument table `expiry` value for instruments without an expiry.
+NO_EXPIRY = -1
+
+# Scrip master records are flat objects, so each one is a brace pair with no braces inside.
+_RECORD_RE = re.compile(r'\{[^{}]*\}')
+
+
+def trading_day(now=None):
+    """
+    Get the current trading day in IST.
+
+    Parameters:
+        now (datetime, optional): Reference time. Defaults to the current time.
+
+    Returns:
+        str: Trading day in "YYYY-MM-DD" format.
+    """
+    now = now or datetime.now(IST)
+    if now.tzinfo is None:
+        now = IST.localize(now)
+    return now.astimezone(IST).strftime("%Y-%m-%d")
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, META_FILE), 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_meta(cache_dir, meta):
+    path = os.path.join(cache_dir, META_FILE)
+    with open(path + ".tmp", 'w') as file:
+        json.dump(meta, file)
+    os.replace(path + ".tmp", path)
+
+
+def download_scrip_master(cache_dir=CACHE_DIR, force=False, url=SCRIP_MASTER_URL):
+    """
+    Download the scrip master at most once per trading day.
+
+    The request is conditional on the ETag/Last-Modified of the cached copy,
+    so an unchanged file costs one 304 round trip. When the server sends
+    neither header the trading day stamp alone decides freshness.
+
+    Parameters:
+        cache_dir (str): Directory holding the raw file, metadata and snapshot.
+        force (bool, optional): Skip the trading day check. Defaults to False.
+        url (str, optional): Scrip master URL.
+
+    Returns:
+        bool: True if a new scrip master was downloaded, False if the cache was reused.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    raw_path = os.path.join(cache_dir, RAW_FILE)
+    meta = _read_meta(cache_dir) if os.path.exists(raw_path) else {}
+    today = trading_day()
+
+    if not force and meta.get('day') == today:
+        return False
+
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+
+    try:
+        response = requests.get(url, headers=headers, timeout=60)
+    except Exception as e:
+        if meta:
+            logger.error(f"Scrip master download failed, using cached copy: {e}")
+            return False
+        raise
+
+    if response.status_code == 304:
+        meta['day'] = today
+        _write_meta(cache_dir, meta)
+        logger.info("Scrip master not modified since last download.")
+        return False
+
+    if response.status_code != 200:
+        if meta:
+            logger.error(f"Scrip master download returned {response.status_code}, using cached copy.")
+            return False
+        response.raise_for_status()
+
+    with open(raw_path + ".tmp", 'wb') as file:
+        file.write(response.content)
+    os.replace(raw_path + ".tmp", raw_path)
+
+    build_snapshot(json.loads(response.content), os.path.join(cache_dir, SNAPSHOT_FILE))
+    _write_meta(cache_dir, {
+        'day': today,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    })
+    logger.info(f"Scrip master downloaded to {raw_path}")
+    return True
+
+
+def _parse_expiry(values):
+    expiry = pd.to_datetime(pd.Series(values, dtype=object), format="%d%b%Y", errors='coerce')
+    return expiry.to_numpy(dtype='datetime64[D]')
+
+
+def _typed_columns(records):
+    columns = {c: np.array([r[c] for r in records], dtype=str) for c in STRING_COLUMNS}
+    columns['expiry'] = _parse_expiry([r['expiry'] for r in records])
+    columns['strike'] = np.array([r['strike'] for r in records], dtype=np.float64)
+    columns['lotsize'] = np.array([r['lotsize'] for r in records], dtype=np.int64)
+    columns['tick_size'] = np.array([r['tick_size'] for r in records], dtype=np.float64)
+    return columns
+
+
+def _frame_from_columns(columns):
+    return pd.DataFrame({
+        'token': columns['token'].astype(object),
+        'symbol': columns['symbol'].astype(object),
+        'name': columns['name'].astype(object),
+        'expiry': columns['expiry'].astype(object),
+        'strike': columns['strike'],
+        'lotsize': columns['lotsize'],
+        'instrumenttype': columns['instrumenttype'].astype(object),
+        'exch_seg': columns['exch_seg'].astype(object),
+        'tick_size': columns['tick_size'],
+    })
+
+
+def build_instrument_table(columns):
+    """
+    Normalize scrip master columns into the compact instrument table.
+
+    `name`, `instrumenttype` and `exch_seg` become categoricals, `expiry`
+    is int32 days since the epoch (NO_EXPIRY when blank), `strike` is int64
+    in paise as listed in the scrip master and `token` is int64, so filters
+    are integer comparisons instead of Python object compares.
+
+    Parameters:
+        columns (dict | pandas.DataFrame): Typed columns or a token_df in the load_token_df layout.
+
+    Returns:
+        pandas.DataFrame: Instrument table.
+    """
+    days = pd.to_datetime(pd.Series(np.asarray(columns['expiry']))).to_numpy(dtype='datetime64[D]')
+    expiry = np.where(np.isnat(days), NO_EXPIRY, days.astype(np.int64)).astype(np.int32)
+    return pd.DataFrame({
+        'token': np.asarray(columns['token']).astype(np.int64),
+        'symbol': np.asarray(columns['symbol']).astype(object),
+        'name': pd.Categorical(np.asarray(columns['name']).astype(object)),
+        'expiry': expiry,
+        'strike': np.rint(np.asarray(columns['strike'], dtype=np.float64)).astype(np.int64),
+        'lotsize': np.asarray(columns['lotsize']).astype(np.int32),
+        'instrumenttype': pd.Categorical(np.asarray(columns['instrumenttype']).astype(object)),
+        'exch_seg': pd.Categorical(np.asarray(columns['exch_seg']).astype(object)),
+        'tick_size': np.asarray(columns['tick_size'], dtype=np.float64),
+    })
+
+
+def expiry_to_days(expiry):
+    """
+    Convert an expiry date to the instrument table's int expiry.
+
+    Parameters:
+        expiry (date): Expiry date.
+
+    Returns:
+        int: Days since 1970-01-01.
+    """
+    return (expiry - date(1970, 1, 1)).days
+
+
+def legacy_token_df(table):
+    """
+    Expand an instrument table into the layout the strategies used to build.
+
+    Parameters:
+        table (pandas.DataFrame): Instrument table from build_instrument_table.
+
+    Returns:
+        pandas.DataFrame: token_df with string tokens, `expiry` as dates and `strike` as float.
+    """
+    expiry = table['expiry'].to_numpy().astype(np.int64).astype('datetime64[D]')
+    expiry[table['expiry'].to_numpy() == NO_EXPIRY] = np.datetime64('NaT')
+    return pd.DataFrame({
+        'token': table['token'].astype(str).to_numpy(dtype=object),
+        'symbol': table['symbol'].to_numpy(dtype=object),
+        'name': table['name'].to_numpy(dtype=object),
+        'expiry': expiry.astype(object),
+        'strike': table['strike'].to_numpy(dtype=np.float64),
+        'lotsize': table['lotsize'].to_numpy(dtype=np.int64),
+        'instrumenttype': table['instrumenttype'].to_numpy(dtype=object),
+        'exch_seg': table['exch_seg'].to_numpy(dtype=object),
+        'tick_size': table['tick_size'].to_numpy(),
+    })
+
+
+def build_snapshot(records, snapshot_path):
+    """
+    Write the instrument table of the scrip master as an .npz snapshot.
+
+    Parameters:
+        records (list): Scrip master records as returned by the download URL.
+        snapshot_path (str): Path of the .npz file to write.
+    """
+    table = build_instrument_table(_typed_columns(records))
+    arrays = {
+        'token': table['token'].to_numpy(),
+        'symbol': table['symbol'].to_numpy(dtype=str),
+        'expiry': table['expiry'].to_numpy(),
+        'strike': table['strike'].to_numpy(),
+        'lotsize': table['lotsize'].to_numpy(),
+        'tick_size': table['tick_size'].to_numpy(),
+    }
+    for c in CATEGORY_COLUMNS:
+        arrays[c + '_codes'] = table[c].cat.codes.to_numpy()
+        arrays[c + '_categories'] = table[c].cat.categories.to_numpy(dtype=str)
+    tmp_path = snapshot_path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, snapshot_path)
+
+
+def load_snapshot(snapshot_path):
+    """
+    Load a snapshot written by build_snapshot.
+
+    Parameters:
+        snapshot_path (str): Path of the .npz snapshot.
+
+    Returns:
+        pandas.DataFrame: Instrument table.
+    """
+    with np.load(snapshot_path, allow_pickle=False) as data:
+        category = {c: pd.Categorical.from_codes(data[c + '_codes'], data[c + '_categories'].astype(object))
+                    for c in CATEGORY_COLUMNS}
+        return pd.DataFrame({
+            'token': data['token'],
+            'symbol': data['symbol'].astype(object),
+            'name': category['name'],
+            'expiry': data['expiry'],
+            'strike': data['strike'],
+            'lotsize': data['lotsize'],
+            'instrumenttype': category['instrumenttype'],
+            'exch_seg': category['exch_seg'],
+            'tick_size': data['tick_size'],
+        })
+
+
+def _allowed(value):
+    if value is None:
+        return None
+    return {value} if isinstance(value, str) else set(value)
+
+
+def iter_scrip_master(path, exch_seg=None, name=None, instrumenttype=None, chunk_size=1 << 20):
+    """
+    Stream matching records out of a scrip master JSON file.
+
+    The file is read in chunks and each record is decoded on its own, so only
+    the records that pass the filters are ever kept. Each filter is a value
+    or a collection of values; None accepts everything.
+
+    Parameters:
+        path (str): Path of the scrip master JSON.
+        exch_seg (str | list, optional): Exchange segments to keep (e.g., 'NFO').
+        name (str | list, optional): Underlying names to keep (e.g., 'NIFTY').
+        instrumenttype (str | list, optional): Instrument types to keep (e.g., 'OPTIDX').
+        chunk_size (int, optional): Characters read per chunk. Defaults to 1 MiB.
+
+    Yields:
+        dict: Scrip master record.
+    """
+    filters = [(field, allowed, tuple('"{}"'.format(v) for v in allowed))
+               for field, allowed in (('exch_seg', _allowed(exch_seg)),
+                                      ('name', _allowed(name)),
+                                      ('instrumenttype', _allowed(instrumenttype)))
+               if allowed is not None]
+    loads = json.loads
+
+    with open(path, 'r') as file:
+        tail = ''
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            buffer = tail + chunk
+            end = 0
+            for match in _RECORD_RE.finditer(buffer):
+                end = match.end()
+                text = match.group()
+                # Cheap substring test first; only candidates get decoded
+                if not all(any(q in text for q in quoted) for _, _, quoted in filters):
+                    continue
+                record = loads(text)
+                if all(record.get(field) in allowed for field, allowed, _ in filters):
+                    yield record
+            tail = buffer[end:]
+
+
+def stream_token_df(path, exch_seg=None, name=None, instrumenttype=None, capacity=4096):
+    """
+    Build a token_df from the scrip master JSON, keeping only matching rows.
+
+    Rows are written straight into preallocated column arrays that double
+    when full, so rows outside the filters are never materialized.
+
+    Parameters:
+        path (str): Path of the scrip master JSON.
+        exch_seg (str | list, optional): Exchange segments to keep.
+        name (str | list, optional): Underlying names to keep.
+        instrumenttype (str | list, optional): Instrument types to keep.
+        capacity (int, optional): Initial rows to preallocate. Defaults to 4096.
+
+    Returns:
+        pandas.DataFrame: Same layout as load_token_df.
+    """
+    columns = {c: np.empty(capacity, dtype=object) for c in STRING_COLUMNS + ['expiry']}
+    columns['strike'] = np.empty(capacity, dtype=np.float64)
+    columns['lotsize'] = np.empty(capacity, dtype=np.int64)
+    columns['tick_size'] = np.empty(capacity, dtype=np.float64)
+
+    n = 0
+    for record in iter_scrip_master(path, exch_seg, name, instrumenttype):
+        if n == capacity:
+            capacity *= 2
+            for c in columns:
+                columns[c] = np.resize(columns[c], capacity)
+        for c in STRING_COLUMNS:
+            columns[c][n] = record[c]
+        columns['expiry'][n] = record['expiry']
+        columns['strike'][n] = float(record['strike'])
+        columns['lotsize'][n] = int(record['lotsize'])
+        columns['tick_size'][n] = float(record['tick_size'])
+        n += 1
+
+    columns = {c: values[:n] for c, values in columns.items()}
+    columns['expiry'] = _parse_expiry(columns['expiry'])
+    return _frame_from_columns(columns)
+
+
+def load_instrument_table(cache_dir=CACHE_DIR, refresh=True):
+    """
+    Get the scrip master as an instrument table, downloading it only when stale.
+
+    Parameters:
+        cache_dir (str): Scrip master cache directory.
+        refresh (bool, optional): Check for a new trading day download first. Defaults to True.
+
+    Returns:
+        pandas.DataFrame: Instrument table, see build_instrument_table. The snapshot
+        alone is enough; it is rebuilt when the raw scrip master is newer.
+    """
+    if refresh:
+        download_scrip_master(cache_dir)
+
+    raw_path = os.path.join(cache_dir, RAW_FILE)
+    snapshot_path = os.path.join(cache_dir, SNAPSHOT_FILE)
+    has_raw, has_snapshot = os.path.exists(raw_path), os.path.exists(snapshot_path)
+    if not has_raw and not has_snapshot:
+        raise FileNotFoundError("No scrip master in {}: neither {} nor {}".format(cache_dir, RAW_FILE, SNAPSHOT_FILE))
+    if not has_snapshot or (has_raw and os.path.getmtime(snapshot_path) < os.path.getmtime(raw_path)):
+        with open(raw_path, 'r') as file:
+            build_snapshot(json.load(file), snapshot_path)
+    return load_snapshot(snapshot_path)
+
+
+def load_token_df(cache_dir=CACHE_DIR, refresh=True):
+    """
+    Get the scrip master in the token_df layout the strategies built from the JSON.
+
+    Parameters:
+        cache_dir (str): Scrip master cache directory.
+        refresh (bool, optional): Check for a new trading day download first. Defaults to True.
+
+    Returns:
+        pandas.DataFrame: token_df with `expiry` as dates and `strike` as float.
+    """
+    return legacy_token_df(load_instrument_table(cache_dir, refresh))
+
+
+def benchmark(cache_dir=CACHE_DIR, repeat=3):
+    """
+    Compare the cold JSON load used by the strategies with a warm snapshot load.
+
+    Parameters:
+        cache_dir (str): Scrip master cache directory with a downloaded raw file.
+        repeat (int, optional): Runs per path; the best time is reported. Defaults to 3.
+
+    Returns:
+        dict: Best wall time in seconds for each path.
+    """
+    raw_path = os.path.join(cache_dir, RAW_FILE)
+
+    def cold():
+        with open(raw_path, 'r') as file:
+            token_df = pd.DataFrame.from_dict(json.load(file))
+        token_df['expiry'] = pd.to_datetime(token_df['expiry'], format="mixed").apply(lambda x: x.date())
+        return token_df.astype({'strike': float})
+
+    def warm():
+        return load_instrument_table(cache_dir, refresh=False)
+
+    results = {}
+    for label, fn in (('cold_json', cold), ('warm_snapshot', warm)):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        results[label] = min(timings)
+    print("cold JSON load     : {:.3f}s".format(results['cold_json']))
+    print("warm snapshot load : {:.3f}s".format(results['warm_snapshot']))
+    print("speedup            : {:.1f}x".format(results['cold_json'] / results['warm_snapshot']))
+    return results
+
+
+def benchmark_table(cache_dir=CACHE_DIR, name='NIFTY', repeat=20):
+    """
+    Compare memory and filter time of the legacy token_df with the instrument table.
+
+    Parameters:
+        cache_dir (str): Scrip master cache directory with a downloaded raw file.
+        name (str, optional): Option underlying used for the filter. Defaults to 'NIFTY'.
+        repeat (int, optional): Filter runs per timing. Defaults to 20.
+
+    Returns:
+        dict: Memory in bytes and time in seconds for each layout.
+    """
+    with open(os.path.join(cache_dir, RAW_FILE), 'r') as file:
+        records = json.load(file)
+
+    start = time.perf_counter()
+    token_df = pd.DataFrame.from_dict(records)
+    token_df['expiry'] = pd.to_datetime(token_df['expiry'], format="mixed").apply(lambda x: x.date())
+    token_df = token_df.astype({'strike': float})
+    legacy_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = build_instrument_table(_typed_columns(records))
+    table_build = time.perf_counter() - start
+
+    options = table[(table['name'] == name) & (table['instrumenttype'] == 'OPTIDX')]
+    expiry_day = int(options['expiry'].min())
+    strike = int(options[options['expiry'] == expiry_day]['strike'].median() // 100 * 100)
+    legacy_expiry = date(1970, 1, 1) + timedelta(days=expiry_day)
+
+    def legacy_filter():
+        df = token_df
+        return df[(df['exch_seg'] == 'NFO') & (df['expiry'] == legacy_expiry) & (df['instrumenttype'] == 'OPTIDX') & (df['name'] == name) & (df['strike'] == strike)]
+
+    def table_filter():
+        df = table
+        return df[(df['exch_seg'] == 'NFO') & (df['expiry'] == expiry_day) & (df['instrumenttype'] == 'OPTIDX') & (df['name'] == name) & (df['strike'] == strike)]
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat
+
+    results = {
+        'legacy_bytes': token_df.memory_usage(deep=True).sum(),
+        'table_bytes': table.memory_usage(deep=True).sum(),
+        'legacy_build': legacy_build,
+        'table_build': table_build,
+        'legacy_filter': timed(legacy_filter),
+        'table_filter': timed(table_filter),
+    }
+    print("memory  legacy / table : {:.1f} MiB / {:.1f} MiB".format(results['legacy_bytes'] / 2**20, results['table_bytes'] / 2**20))
+    print("build   legacy / table : {:.3f}s / {:.3f}s".format(results['legacy_build'], results['table_build']))
+    print("filter  legacy / table : {:.2f} ms / {:.2f} ms".format(results['legacy_filter'] * 1e3, results['table_filter'] * 1e3))
+    return results
+
+
+def _measure(target, args):
+    import resource
+    import gc
+
+    gc.collect()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    rows = len(target(*args))
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return rows, elapsed, (peak - before) * scale
+
+
+def _load_json_filtered(path, exch_seg, name, instrumenttype):
+    with open(path, 'r') as file:
+        token_df = pd.DataFrame.from_dict(json.load(file))
+    token_df['expiry'] = pd.to_datetime(token_df['expiry'], format="mixed").apply(lambda x: x.date())
+    token_df = token_df.astype({'strike': float})
+    for field, allowed in (('exch_seg', exch_seg), ('name', name), ('instrumenttype', instrumenttype)):
+        if allowed is not None:
+            token_df = token_df[token_df[field].isin(_allowed(allowed))]
+    return token_df
+
+
+def benchmark_stream(path, exch_seg='NFO', name=None, instrumenttype='OPTIDX'):
+    """
+    Compare peak RSS and wall time of the streaming loader with pd.DataFrame.from_dict.
+
+    Each path runs in a fresh interpreter so the peak RSS of one does not
+    hide the other. Peak RSS is reported as growth over the post-import baseline.
+
+    Parameters:
+        path (str): Path of the scrip master JSON.
+        exch_seg (str | list, optional): Segment filter. Defaults to 'NFO'.
+        name (str | list, optional): Name filter. Defaults to None.
+        instrumenttype (str | list, optional): Type filter. Defaults to 'OPTIDX'.
+
+    Returns:
+        dict: (rows, seconds, peak RSS growth in bytes) for each path.
+    """
+    import multiprocessing
+
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    args = (path, exch_seg, name, instrumenttype)
+    for label, target in (('from_dict', _load_json_filtered), ('stream', stream_token_df)):
+        with context.Pool(1) as pool:
+            results[label] = pool.apply(_measure, (target, args))
+    for label, (rows, elapsed, peak) in results.items():
+        print("{:<10}: {:>7} rows  {:7.3f}s  peak RSS +{:7.1f} MiB".format(label, rows, elapsed, peak / 2**20))
+    return results
+
+
+if __name__ == "__main__":
+    download_scrip_master()
+    benchmark()
+    benchmark_table()
+    benchmark_stream(os.path.join(CACHE_DIR, RAW_FILE))
@@ -0,0 +1,179 @@
+# scripMasterDiff.py
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import scripMaster as sm
+
+
+# Tokens are only unique within a segment, so the diff key includes it
+KEY_COLUMNS = ['exch_seg', 'token']
+VALUE_COLUMNS = ['symbol', 'name', 'expiry', 'strike', 'lotsize', 'instrumenttype', 'tick_size']
+TABLE_COLUMNS = ['token', 'symbol', 'name', 'expiry', 'strike', 'lotsize', 'instrumenttype', 'exch_seg', 'tick_size']
+
+
+def _keyed(table, segments):
+    exch_seg = table['exch_seg'].cat
+    segment = np.array([segments[s] for s in exch_seg.categories], dtype=np.int64)[exch_seg.codes.to_numpy()]
+    # One int64 key per (exch_seg, token): segment number in the top byte
+    table = table.set_axis(pd.Index((segment << 56) | table['token'].to_numpy(dtype=np.int64)))
+    return table[~table.index.duplicated()]
+
+
+def _rows(table, mask=slice(None)):
+    rows = table[mask].reset_index(drop=True)[TABLE_COLUMNS]
+    return rows.assign(**{c: rows[c].astype(str) for c in sm.CATEGORY_COLUMNS})
+
+
+class ScripMasterDiff:
+    """
+    Instruments added, removed and changed between two scrip master days.
+
+    `added` and `changed` hold today's rows, `removed` and `previous` hold
+    yesterday's; all are instrument tables with plain string columns.
+    `fields` lists the columns that changed for each row of `changed`.
+    """
+
+    def __init__(self, added, removed, changed, previous, fields):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.previous = previous
+        self.fields = fields
+
+    def __bool__(self):
+        return bool(len(self.added) or len(self.removed) or len(self.changed))
+
+    def __repr__(self):
+        return "ScripMasterDiff(added={}, removed={}, changed={})".format(len(self.added), len(self.removed), len(self.changed))
+
+    def option_chains(self):
+        """
+        Get the option chains touched by the diff.
+
+        Returns:
+            set: (name, expiry date) of every chain with a listed, delisted or changed contract.
+        """
+        chains = set()
+        for df in (self.added, self.removed, self.changed, self.previous):
+            options = df[df['instrumenttype'].str.startswith('OPT') & (df['expiry'] != sm.NO_EXPIRY)]
+            for name, days in options[['name', 'expiry']].drop_duplicates().itertuples(index=False):
+                chains.add((name, date(1970, 1, 1) + timedelta(days=int(days))))
+        return chains
+
+    def stale_chains(self, chains):
+        """
+        Get the option chains that must be rebuilt.
+
+        Parameters:
+            chains (dict): Underlying name -> OptionChain, as kept by ExpiryCalendar.watch_chains.
+
+        Returns:
+            list: Names whose chain has a listed, delisted or changed contract.
+        """
+        touched = self.option_chains()
+        return [name for name, chain in chains.items() if (name, chain.expiry) in touched]
+
+    def stale_tokens(self, tokens):
+        """
+        Get the subscribed instruments that were delisted or changed.
+
+        Tokens are only unique within a segment, so they are matched on
+        (exch_seg, token) like the diff itself.
+
+        Parameters:
+            tokens (iterable): Subscribed (exch_seg, token) pairs, tokens as str or int.
+
+        Returns:
+            list: Pairs, as given, that need to be dropped or resubscribed.
+        """
+        stale = set()
+        for df in (self.removed, self.changed):
+            stale.update(zip(df['exch_seg'].tolist(), df['token'].tolist()))
+        return [(exch_seg, token) for exch_seg, token in tokens if (exch_seg, int(token)) in stale]
+
+    def summary(self):
+        """
+        Summarise the diff for the log.
+
+        Returns:
+            str: Counts of added, removed and changed instruments and the fields that changed.
+        """
+        counts = pd.Series([f for fields in self.fields for f in fields], dtype=object).value_counts()
+        changed = ", ".join("{} {}".format(n, c) for c, n in counts.items())
+        return "{} added, {} removed, {} changed{}".format(
+            len(self.added), len(self.removed), len(self.changed), " ({})".format(changed) if changed else "")
+
+
+def diff_tables(old, new):
+    """
+    Compare two instrument tables keyed by (exch_seg, token).
+
+    Parameters:
+        old (pandas.DataFrame): Yesterday's instrument table.
+        new (pandas.DataFrame): Today's instrument table.
+
+    Returns:
+        ScripMasterDiff: Instruments added, removed and changed, in today's file order.
+    """
+    if not pd.api.types.is_integer_dtype(old['expiry']):
+        old = sm.build_instrument_table(old)
+    if not pd.api.types.is_integer_dtype(new['expiry']):
+        new = sm.build_instrument_table(new)
+    segments = {s: i for i, s in enumerate(sorted(set(old['exch_seg'].cat.categories) | set(new['exch_seg'].cat.categories)))}
+    old = _keyed(old, segments)
+    new = _keyed(new, segments)
+    in_old = new.index.isin(old.index)
+    added = new[~in_old]
+    removed = old[~old.index.isin(new.index)]
+
+    common = new[in_old]
+    previous = old.loc[common.index]
+    # Categoricals are compared by value, the two days' category lists differ
+    differs = np.column_stack([np.asarray(common[c], dtype=object) != np.asarray(previous[c], dtype=object)
+                               if c in sm.CATEGORY_COLUMNS else common[c].to_numpy() != previous[c].to_numpy()
+                               for c in VALUE_COLUMNS])
+    is_changed = differs.any(axis=1)
+    names = np.array(VALUE_COLUMNS, dtype=object)
+    fields = pd.Series([tuple(names[row]) for row in differs[is_changed]], dtype=object)
+
+    return ScripMasterDiff(
+        _rows(added),
+        _rows(removed),
+        _rows(common, is_changed),
+        _rows(previous, is_changed),
+        fields,
+    )
+
+
+def benchmark(old, new, repeat=3):
+    """
+    Time the diff of two instrument tables.
+
+    Parameters:
+        old (pandas.DataFrame): Yesterday's instrument table.
+        new (pandas.DataFrame): Today's instrument table.
+        repeat (int, optional): Runs to average. Defaults to 3.
+
+    Returns:
+        ScripMasterDiff: Result of the last run.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        diff = diff_tables(old, new)
+    print("diff {} -> {} instruments : {:.1f} ms, {}".format(
+        len(old), len(new), (time.perf_counter() - start) / repeat * 1e3, diff.summary()))
+    return diff
+
+
+if __name__ == "__main__":
+    import instrumentStore as ist
+
+    src_path = ist.previous_store()
+    if src_path is None:
+        print("No earlier instrument store in", sm.CACHE_DIR)
+    else:
+        previous = ist.InstrumentStore(src_path)
+        benchmark(previous.to_table(), sm.load_instrument_table())
@@ -52,13 +52,13 @@ def Config_reading():
 Config_reading()
 
 
-with open('data.json','r') as jsonFile:
-    cred = json.load(jsonFile)
+import runtime as rt
 
-obj = SmartConnect(api_key=cred['api_key'],access_token=cred['access_token'],refresh_token=cred['refresh_token'],feed_token=cred['feed_token'],userId=cred['userId'])
+# The session saved in data.json; recorded with ALGO_RECORD set, answered from a recording with ALGO_REPLAY
+obj = rt.smart_api()
 
 
-#print(obj.getProfile(cred['refresh_token']))
+#print(obj.getProfile(obj.refresh_token))
 
 
 
@@ -72,13 +72,19 @@ f.SendMessageToTelegram(message,TelegramBotCredential,ReceiverTelegramID)
 # Angel LTP Data Fetching
 
 
+import marketFeed as mf
+
+# NIFTY quotes stream over the WebSocket instead of one ltpData call per read
+feed = rt.market_feed()
+feed.subscribe('NSE', ['26000'], 'QUOTE')
+feed.start()
+
 def getLTP_data():
-    LTP = obj.ltpData(exchange='NSE',tradingsymbol='NIFTY',symboltoken='26000')['data']
-    open = LTP['open']
-    high = LTP['high']
-    low = LTP['low']
-    close = LTP['close']
-    ltp = LTP['ltp']
+    tick = feed.last('NSE', '26000', timeout=5)
+    if tick is None:
+        LTP = obj.ltpData(exchange='NSE',tradingsymbol='NIFTY',symboltoken='26000')['data']
+        return LTP['open'], LTP['high'], LTP['low'], LTP['close'], LTP['ltp']
+    return tick.open, tick.high, tick.low, tick.close, tick.ltp
 
 
 import util as u
@@ -92,14 +98,13 @@ interval = "ONE_MINUTE"
 
 
 fromdate, todate  = u.get_dynamic_dates(10)
-hist_data = u.fetch_historical_data(obj, exchange, symboltoken, interval, fromdate, todate)
-
-import pandas as pd
-df = pd.DataFrame(hist_data['data'])
+candles = u.fetch_candles(obj, exchange, symboltoken, interval, fromdate, todate)
 
-df = df.rename(columns={0:"datetime",1:"open",2:"high",3:"low",4:"Close",5:"volume"})
-df['datetime'] = pd.to_datetime(df["datetime"])
-df = df.set_index('datetime')
+import candleDecoder as cd
+if candles is None:
+    # Failed request: go on with no candles, as the DataFrame of an empty response did
+    candles = cd.decode([])
+df = cd.to_frame(*candles).set_index('timestamp')
 print(df)
 
 import pandas_ta as ta
@@ -112,13 +117,11 @@ print(df)
 
 import requests
 
+import scripMaster as sm
+
 def initializeSymbolTokenMap():
-    url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
-    d = requests.get(url).json()
     global token_df
-    token_df = pd.DataFrame.from_dict(d)
-    token_df['expiry'] = pd.to_datetime(token_df['expiry'])
-    token_df = token_df.astype({{'strike':float}})
+    token_df = rt.instrument_table(UNDERLYINGS)
 
 
 
@@ -133,41 +136,42 @@ from datetime import datetime,date
 import math
 
 
-url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
-d = requests.get(url).json()
-token_df = pd.DataFrame.from_dict(d)
-print(token_df)
-token_df['expiry'] = pd.to_datetime(token_df['expiry']).apply(lambda x: x.date())
-token_df = token_df.astype({'strike': float})
+# Only the underlyings traded here are copied out of the shared instrument store
+UNDERLYINGS = ['NIFTY', 'BANKNIFTY']
+token_df = rt.instrument_table(UNDERLYINGS)
 
 print(token_df)
 
-def getTokenInfo (symbol, exch_seg ='NSE',instrumenttype='OPTIDX',strike_price = '',pe_ce = 'CE',expiry_day = None):
-    df = token_df
-    strike_price = strike_price*100
-    if exch_seg == 'NSE':
-        eq_df = df[(df['exch_seg'] == 'NSE') ]
-        return eq_df[eq_df['name'] == symbol]
-    elif exch_seg == 'NFO' and ((instrumenttype == 'FUTSTK') or (instrumenttype == 'FUTIDX')):
-        return df[(df['exch_seg'] == 'NFO') & (df['instrumenttype'] == instrumenttype) & (df['name'] == symbol)].sort_values(by=['expiry'])
-    elif exch_seg == 'NFO' and (instrumenttype == 'OPTSTK' or instrumenttype == 'OPTIDX'):
-        return df[(df['exch_seg'] == 'NFO') & (df['expiry']==expiry_day) &  (df['instrumenttype'] == instrumenttype) & (df['name'] == symbol) & (df['strike'] == strike_price) & (df['symbol'].str.endswith(pe_ce))].sort_values(by=['expiry'])
+import instrumentIndex as ii
 
+instrument_index = rt.instrument_index(UNDERLYINGS)
+getTokenInfo = instrument_index.token_info
+
+
+import expiryCalendar as ec
 
-expiry_day = date(2024,12,5)
 symbol = 'NIFTY' #BANKNIFTY | NIFTY
-spot_token = getTokenInfo(symbol).iloc[0]['token']
+expiry_day = ec.ExpiryCalendar(token_df).current(symbol,'OPTIDX')
+print(expiry_day)
+spot_token = getTokenInfo(symbol)['token']
 ltpInfo = obj.ltpData('NSE',symbol,spot_token)
 
 indexLtp = ltpInfo['data']['ltp']
 print(indexLtp)
-ATMStrike = math.ceil(indexLtp/100)*100
+import optionChain as oc
+
+# Strike step comes from the listed strikes, not a hardcoded 100
+chain = oc.OptionChain(token_df,symbol,expiry_day,'OPTIDX')
+ATMStrike = chain.atm(indexLtp)
 print(ATMStrike)
+if ATMStrike is None:
+    print(f"Error: no {symbol} options listed for expiry {expiry_day}")
+    sys.exit(1)
 
-ce_strike_symbol = getTokenInfo(symbol,'NFO','OPTIDX',ATMStrike,'CE',expiry_day).iloc[0]
+ce_strike_symbol = chain.leg(indexLtp,'CE')
 print(ce_strike_symbol)
 
-pe_strike_symbol = getTokenInfo(symbol,'NFO','OPTIDX',ATMStrike,'PE',expiry_day).iloc[0]
+pe_strike_symbol = chain.leg(indexLtp,'PE')
 print(pe_strike_symbol)
 
 
@@ -196,8 +200,19 @@ def place_order(token,symbol,qty,buy_sell,ordertype,price,variety= 'NORMAL',exch
         print("Order placement failed: {}".format(e.message))
 
 
-place_order(ce_strike_symbol['token'],ce_strike_symbol['symbol'],ce_strike_symbol['lotsize'],'SELL','MARKET',0,'NORMAL','NFO')
-place_order(pe_strike_symbol['token'],pe_strike_symbol['symbol'],pe_strike_symbol['lotsize'],'SELL','MARKET',0,'NORMAL','NFO')
+if rt.REPLAY_PATHS:
+    # A replay has no session to send orders on
+    sys.exit(0)
+
+import basketOrder as bo
+
+# Both legs go out together; if one is rejected the other is bought back
+basket = bo.BasketOrder(bo.OrderClient(obj), on_reject='flatten')
+result = basket.submit([
+    bo.leg(ce_strike_symbol['token'],ce_strike_symbol['symbol'],ce_strike_symbol['lotsize'],'SELL','MARKET',0,'NORMAL','NFO'),
+    bo.leg(pe_strike_symbol['token'],pe_strike_symbol['symbol'],pe_strike_symbol['lotsize'],'SELL','MARKET',0,'NORMAL','NFO'),
+])
+print(result)
 
 # response = requests.get(url)
 
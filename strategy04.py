@@ -71,24 +71,20 @@ import math
 import requests
 import pandas as pd
 
-url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
-d = requests.get(url).json()
-token_df = pd.DataFrame.from_dict(d)
-token_df['expiry'] = pd.to_datetime(token_df['expiry']).apply(lambda x: x.date())
-token_df = token_df.astype({'strike': float})
+import scripMaster as sm
+
+import runtime as rt
+
+# Only the underlyings traded here are copied out of the shared instrument store
+UNDERLYINGS = ['NIFTY', 'BANKNIFTY']
+token_df = rt.instrument_table(UNDERLYINGS)
 print(token_df)
 
 
-def getTokenInfo (symbol, exch_seg ='NSE',instrumenttype='OPTIDX',strike_price = '',pe_ce = 'CE',expiry_day = None):
-    df = token_df
-    strike_price = strike_price*100
-    if exch_seg == 'NSE':
-        eq_df = df[(df['exch_seg'] == 'NSE') ]
-        return eq_df[eq_df['name'] == symbol]
-    elif exch_seg == 'NFO' and ((instrumenttype == 'FUTSTK') or (instrumenttype == 'FUTIDX')):
-        return df[(df['exch_seg'] == 'NFO') & (df['instrumenttype'] == instrumenttype) & (df['name'] == symbol)].sort_values(by=['expiry'])
-    elif exch_seg == 'NFO' and (instrumenttype == 'OPTSTK' or instrumenttype == 'OPTIDX'):
-        return df[(df['exch_seg'] == 'NFO') & (df['expiry']==expiry_day) &  (df['instrumenttype'] == instrumenttype) & (df['name'] == symbol) & (df['strike'] == strike_price) & (df['symbol'].str.endswith(pe_ce))].sort_values(by=['expiry'])
+import instrumentIndex as ii
+
+instrument_index = rt.instrument_index(UNDERLYINGS)
+getTokenInfo = instrument_index.token_info
 
 
 
@@ -116,20 +112,27 @@ def place_order(token,symbol,qty,buy_sell,ordertype,price,variety= 'NORMAL',exch
         print("Order placement failed: {}".format(e.message))
 
 
-expiry_day = date(2024,12,5)
+import expiryCalendar as ec
+
 symbol = 'NIFTY' #BANKNIFTY | NIFTY
-spot_token = getTokenInfo(symbol).iloc[0]['token']
+expiry_day = ec.ExpiryCalendar(token_df).current(symbol,'OPTIDX')
+print(expiry_day)
+spot_token = getTokenInfo(symbol)['token']
 ltpInfo = obj.ltpData('NSE',symbol,spot_token)
 
 indexLtp = ltpInfo['data']['ltp']
 print(indexLtp)
-ATMStrike = math.ceil(indexLtp/100)*100
+import optionChain as oc
+
+# Strike step comes from the listed strikes, not a hardcoded 100
+chain = oc.OptionChain(token_df,symbol,expiry_day,'OPTIDX')
+ATMStrike = chain.atm(indexLtp)
 print(ATMStrike)
 
-ce_strike_symbol = getTokenInfo(symbol,'NFO','OPTIDX',ATMStrike,'CE',expiry_day).iloc[0]
+ce_strike_symbol = chain.leg(indexLtp,'CE')
 print(ce_strike_symbol)
 
-pe_strike_symbol = getTokenInfo(symbol,'NFO','OPTIDX',ATMStrike,'PE',expiry_day).iloc[0]
+pe_strike_symbol = chain.leg(indexLtp,'PE')
 print(pe_strike_symbol)
 
 #place_order(ce_strike_symbol['token'],ce_strike_symbol['symbol'],ce_strike_symbol['lotsize'],'SELL','MARKET',0,'NORMAL','NFO')
@@ -1,62 +1,10 @@
-from SmartApi import SmartConnect  # or from SmartApi.smartConnect import SmartConnect
-import pyotp
-from logzero import logger
-import os
-import json
-import yaml
-import sys
 import functionFile as f
+import runtime as rt
 
-
-def Config_reading():
-    print("Reading Config file...\n")
-    global api_key,username,pwd,token
-    global TelegramBotCredential,ReceiverTelegramID
-
-    # Specify the path to the file
-    config_path = '/Users/swapnilk/Desktop/GITHUB/Config.yaml'
-
-    if not os.path.exists(config_path):
-        print(f"Error: Config file not found at {config_path}")
-        sys.exit(1)  # Exit if the config file doesn't exist
-    
-    with open(config_path) as file:
-        try:
-            databaseConfig = yaml.safe_load(file)
-            print("Config file loaded successfully.")
-
-            # Access the nested dictionary properly
-            credentials = databaseConfig.get('AngelOneCred', {})
-            username = credentials.get('username')
-            api_key = credentials.get('api_key')
-            pwd = credentials.get('pwd')
-            token = credentials.get('token')
-
-
-            # TradeMode = databaseConfig['Algo_Setup']['TradeMode'].upper()
-            
-            TelegramBotCredential = databaseConfig['Telegram']['TelegramBotCredential']
-            ReceiverTelegramID = databaseConfig['Telegram']['Chat_Id']
-
-            if username is None:
-                print("Error: 'username' not found in the config file.")
-                sys.exit(1)  # Exit if 'userid' is not found
-            
-        except yaml.YAMLError as exc:
-            print(f"Error reading the config file: {exc}")
-            sys.exit(1)  # Exit on YAML parsing error
-
-# Call the config reading function
-Config_reading()
-
-
-with open('data.json','r') as jsonFile:
-    cred = json.load(jsonFile)
-
-obj = SmartConnect(api_key=cred['api_key'],access_token=cred['access_token'],refresh_token=cred['refresh_token'],feed_token=cred['feed_token'],userId=cred['userId'])
-
-
-#print(obj.getProfile(cred['refresh_token']))
+# Config, session and instrument index are built once per process; launched
+# through warmHost.py they are already loaded when the strategy starts
+TelegramBotCredential,ReceiverTelegramID = rt.telegram()
+obj = rt.smart_api()
 
 
 # Send message to Telegram
@@ -71,24 +19,18 @@ import math
 import requests
 import pandas as pd
 
-url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
-d = requests.get(url).json()
-token_df = pd.DataFrame.from_dict(d)
-token_df['expiry'] = pd.to_datetime(token_df['expiry']).apply(lambda x: x.date())
-token_df = token_df.astype({'strike': float})
+import scripMaster as sm
+
+# Only the underlyings traded here are copied out of the shared instrument store
+UNDERLYINGS = ['NIFTY', 'BANKNIFTY']
+token_df = rt.instrument_table(UNDERLYINGS)
 print(token_df)
 
 
-def getTokenInfo (symbol, exch_seg ='NSE',instrumenttype='OPTIDX',strike_price = '',pe_ce = 'CE',expiry_day = None):
-    df = token_df
-    strike_price = strike_price*100
-    if exch_seg == 'NSE':
-        eq_df = df[(df['exch_seg'] == 'NSE') ]
-        return eq_df[eq_df['name'] == symbol]
-    elif exch_seg == 'NFO' and ((instrumenttype == 'FUTSTK') or (instrumenttype == 'FUTIDX')):
-        return df[(df['exch_seg'] == 'NFO') & (df['instrumenttype'] == instrumenttype) & (df['name'] == symbol)].sort_values(by=['expiry'])
-    elif exch_seg == 'NFO' and (instrumenttype == 'OPTSTK' or instrumenttype == 'OPTIDX'):
-        return df[(df['exch_seg'] == 'NFO') & (df['expiry']==expiry_day) &  (df['instrumenttype'] == instrumenttype) & (df['name'] == symbol) & (df['strike'] == strike_price) & (df['symbol'].str.endswith(pe_ce))].sort_values(by=['expiry'])
+import instrumentIndex as ii
+
+instrument_index = rt.instrument_index(UNDERLYINGS)
+getTokenInfo = instrument_index.token_info
 
 
 
@@ -116,20 +58,27 @@ def place_order(token,symbol,qty,buy_sell,ordertype,price,variety= 'NORMAL',exch
         print("Order placement failed: {}".format(e.message))
 
 
-expiry_day = date(2024,12,5)
-symbol = 'NIFTY' #BANKNIFTY | NIFTY
-spot_token = getTokenInfo(symbol).iloc[0]['token']
-ltpInfo = obj.ltpData('NSE',symbol,spot_token)
+import expiryCalendar as ec
 
-indexLtp = ltpInfo['data']['ltp']
+symbol = 'NIFTY' #BANKNIFTY | NIFTY
+expiry_day = ec.ExpiryCalendar(token_df).current(symbol,'OPTIDX')
+print(expiry_day)
+spot_token = getTokenInfo(symbol)['token']
+# Spot and option prices come from batched getMarketData calls through a short-lived cache
+quotes = rt.quote_service()
+indexLtp = quotes.ltp('NSE',spot_token)
 print(indexLtp)
-ATMStrike = math.ceil(indexLtp/100)*100
+import optionChain as oc
+
+# Strike step comes from the listed strikes, not a hardcoded 100
+chain = oc.OptionChain(token_df,symbol,expiry_day,'OPTIDX')
+ATMStrike = chain.atm(indexLtp)
 print(ATMStrike)
 
-ce_strike_symbol = getTokenInfo(symbol,'NFO','OPTIDX',ATMStrike,'CE',expiry_day).iloc[0]
+ce_strike_symbol = chain.leg(indexLtp,'CE')
 print(ce_strike_symbol)
 
-pe_strike_symbol = getTokenInfo(symbol,'NFO','OPTIDX',ATMStrike,'PE',expiry_day).iloc[0]
+pe_strike_symbol = chain.leg(indexLtp,'PE')
 print(pe_strike_symbol)
 
 #place_order(ce_strike_symbol['token'],ce_strike_symbol['symbol'],ce_strike_symbol['lotsize'],'SELL','MARKET',0,'NORMAL','NFO')
@@ -138,49 +87,28 @@ print(pe_strike_symbol)
 
 
 
-# Function to fetch historical data
-def fetch_historical_data(smartApi, exchange, symboltoken, interval,days):
-    """
-    Fetch historical candle data using SmartAPI.
+import candleCache as cc
+import ohlcvStore as ohlcv
 
-    Parameters:
-        smartApi (SmartConnect): SmartAPI instance.
-        exchange (str): Exchange name (e.g., NSE, BSE).
-        symboltoken (str): Symbol token of the stock.
-        interval (str): Time interval (e.g., ONE_MINUTE, ONE_DAY).
-        fromdate (str): Start date in "YYYY-MM-DD HH:MM" format.
-        todate (str): End date in "YYYY-MM-DD HH:MM" format.
+# Backfills 10 days once, then each poll fetches only the bars since the last completed one.
+# Completed bars are kept in ohlcvStore/, so a restart only downloads what it missed.
+candle_cache = cc.CandleCache(obj, days=10, store=ohlcv.OHLCVStore())
 
-    Returns:
-        dict: Historical data retrieved from the API.
-    """
-    to_date= datetime.now()
-    from_date = to_date - timedelta(days=days)
-    from_date_format = from_date.strftime("%Y-%m-%d %H:%M")
-    to_date_format = to_date.strftime("%Y-%m-%d %H:%M")
+import marketClock as mc
+
+# Wakes at each one-minute close (plus a second for the broker to publish the bar)
+# instead of polling on a fixed sleep; weekends and NSE holidays are skipped.
+# On rt.clock(), so a replay (ALGO_REPLAY) runs the session on the recording's simulated time
+scheduler = mc.Scheduler(delay=1.0, now=rt.clock().now, sleep=rt.clock().sleep)
 
-    try:
-        historicParam = {
-            "exchange": exchange,
-            "symboltoken": symboltoken,
-            "interval": interval,
-            "fromdate": from_date_format,
-            "todate": to_date_format,
-        }
-        hist_data = smartApi.getCandleData(historicParam)
-        columns = ['timestamp','O','H','L','C','V']
-        hist_data = pd.DataFrame(hist_data['data'], columns=columns)
-        logger.info("Historical data fetched successfully.")
-        return hist_data
-    except Exception as e:
-        logger.exception(f"Failed to fetch historical data: {e}")
-        return None
 
+def on_bar_close(closed_at, intervals):
 
-while True:
+    hist_data = candle_cache.get('NSE', spot_token, 'ONE_MINUTE', now=rt.now())
 
-    time.sleep(10)
+    print(hist_data.tail(10))
 
-    hist_data = fetch_historical_data(obj, exchange='NSE', symboltoken=spot_token, interval='ONE_MINUTE', days=10)
 
-    print(hist_data.tail(10))
\ No newline at end of file
+scheduler.every('ONE_MINUTE', on_bar_close)
+scheduler.on_post_close(lambda day: scheduler.stop())
+scheduler.run()
@@ -0,0 +1,282 @@
+# streamIndicators.py
+import math
+import sys
+import time
+
+import numpy as np
+
+
+NAN = float('nan')
+
+
+class EWM:
+    """
+    Exponentially weighted mean updated one value at a time.
+
+    Follows the recursion of pandas' `Series.ewm(...).mean()` step for step,
+    including the leading-NaN and min_periods handling, so a streamed series
+    equals the batch one bit for bit.
+    """
+
+    def __init__(self, alpha=None, span=None, adjust=True, min_periods=0):
+        # pandas turns every parametrisation into a centre of mass first
+        com = (span - 1) / 2.0 if span is not None else 1.0 / alpha - 1.0
+        self.alpha = 1.0 / (1.0 + com)
+        self.adjust = adjust
+        self.min_periods = max(int(min_periods), 1)
+        self._old_wt_factor = 1.0 - self.alpha
+        self._new_wt = 1.0 if adjust else self.alpha
+        self._weighted = NAN
+        self._old_wt = 1.0
+        self._nobs = 0
+        self.value = NAN
+
+    def update(self, x):
+        """
+        Add the next value.
+
+        Parameters:
+            x (float): Next value; NaN counts as missing.
+
+        Returns:
+            float: Mean so far, NaN before `min_periods` values.
+        """
+        observed = x == x
+        self._nobs += observed
+        weighted = self._weighted
+        if weighted == weighted:
+            self._old_wt *= self._old_wt_factor
+            if observed:
+                if weighted != x:
+                    weighted = (self._old_wt * weighted + self._new_wt * x) / (self._old_wt + self._new_wt)
+                self._old_wt = self._old_wt + self._new_wt if self.adjust else 1.0
+        elif observed:
+            weighted = x
+        self._weighted = weighted
+        self.value = weighted if self._nobs >= self.min_periods else NAN
+        return self.value
+
+
+class EMA:
+    """Streaming `ta.ema(close, length)`: SMA seed over the first `length` closes, then an unadjusted EWM."""
+
+    def __init__(self, length):
+        self.length = length
+        self._seed = []
+        self._ewm = EWM(span=length, adjust=False)
+        self.value = NAN
+
+    def update(self, close):
+        """
+        Add the next close.
+
+        Parameters:
+            close (float): Close price.
+
+        Returns:
+            float: EMA, NaN for the first `length - 1` bars.
+        """
+        if self._seed is not None:
+            self._seed.append(close)
+            if len(self._seed) < self.length:
+                return NAN
+            close = np.sum(np.array(self._seed, dtype=np.float64)) / self.length
+            self._seed = None
+        self.value = self._ewm.update(close)
+        return self.value
+
+
+class RMA:
+    """Streaming `pandas_ta.rma`: Wilder's smoothing, an adjusted EWM with alpha 1/length."""
+
+    def __init__(self, length):
+        self.length = length
+        self._ewm = EWM(alpha=1.0 / length, min_periods=length)
+        self.value = NAN
+
+    def update(self, x):
+        self.value = self._ewm.update(x)
+        return self.value
+
+
+class RSI:
+    """Streaming `ta.rsi(close, length)` with Wilder-smoothed gains and losses."""
+
+    def __init__(self, length=14):
+        self.length = length
+        self._gain = RMA(length)
+        self._loss = RMA(length)
+        self._prev = NAN
+        self.value = NAN
+
+    def update(self, close):
+        """
+        Add the next close.
+
+        Parameters:
+            close (float): Close price.
+
+        Returns:
+            float: RSI in [0, 100], NaN for the first `length` bars.
+        """
+        change = close - self._prev
+        self._prev = close
+        gain = self._gain.update(max(change, 0.0) if change == change else NAN)
+        loss = self._loss.update(min(change, 0.0) if change == change else NAN)
+        self.value = 100 * gain / (gain + abs(loss)) if gain + abs(loss) != 0 else NAN
+        return self.value
+
+
+class ATR:
+    """
+    Streaming `ta.atr(high, low, close, length)`: Wilder-smoothed true range.
+
+    pandas_ta adds machine epsilon to every high - low range of a frame in
+    which any bar has high == low; pass `nudge=True` to do the same when
+    replaying such a frame bit for bit.
+    """
+
+    def __init__(self, length=14, nudge=False):
+        self.length = length
+        self.nudge = nudge
+        self._rma = RMA(length)
+        self._prev_close = NAN
+        self.value = NAN
+
+    def update(self, high, low, close):
+        """
+        Add the next bar.
+
+        Parameters:
+            high, low, close (float): Bar prices.
+
+        Returns:
+            float: ATR, NaN for the first `length` bars.
+        """
+        prev_close = self._prev_close
+        self._prev_close = close
+        if prev_close != prev_close:
+            true_range = NAN
+        else:
+            high_low = high - low + sys.float_info.epsilon if self.nudge else high - low
+            true_range = max(abs(high_low), abs(high - prev_close), abs(prev_close - low))
+        self.value = self._rma.update(true_range)
+        return self.value
+
+
+class Supertrend:
+    """
+    Streaming `ta.supertrend(high, low, close, length, multiplier)`.
+
+    Keeps the previous final bands and direction of the pandas_ta loop, so
+    each bar costs one ATR update and a few comparisons.
+    """
+
+    def __init__(self, length=7, multiplier=3.0, nudge=False):
+        self.length = length
+        self.multiplier = float(multiplier)
+        self._atr = ATR(length, nudge)
+        self._upper = NAN
+        self._lower = NAN
+        self._bars = 0
+        self.direction = 1
+        self.value = NAN
+
+    def update(self, high, low, close):
+        """
+        Add the next bar.
+
+        Parameters:
+            high, low, close (float): Bar prices.
+
+        Returns:
+            tuple: (supertrend, direction) with direction 1 (long) or -1 (short).
+        """
+        matr = self.multiplier * self._atr.update(high, low, close)
+        hl2 = 0.5 * (high + low)
+        upper, lower = hl2 + matr, hl2 - matr
+        if self._bars == 0:
+            # pandas_ta leaves the first bar at trend 0, direction 1
+            self.value = 0.0
+        else:
+            if close > self._upper:
+                self.direction = 1
+            elif close < self._lower:
+                self.direction = -1
+            else:
+                if self.direction > 0 and lower < self._lower:
+                    lower = self._lower
+                if self.direction < 0 and upper > self._upper:
+                    upper = self._upper
+            self.value = lower if self.direction > 0 else upper
+        self._bars += 1
+        self._upper, self._lower = upper, lower
+        return self.value, self.direction
+
+
+def replay(indicator, *columns):
+    """
+    Feed whole columns through a streaming indicator.
+
+    Parameters:
+        indicator: EMA, RSI, ATR or Supertrend instance.
+        *columns (numpy.ndarray): close, or high, low and close.
+
+    Returns:
+        numpy.ndarray: One output per bar; (n, 2) for Supertrend.
+    """
+    out = [indicator.update(*row) for row in zip(*(np.asarray(c, dtype=np.float64).tolist() for c in columns))]
+    return np.array(out, dtype=np.float64)
+
+
+def benchmark(days=30):
+    """
+    Check parity with indicators.py and time a new bar both ways.
+
+    Parameters:
+        days (int, optional): Calendar days of one-minute candles. Defaults to 30.
+
+    Returns:
+        dict: Microseconds per new bar, streaming and full recompute.
+    """
+    from datetime import datetime, timedelta
+    import pandas as pd
+    import candleDecoder as cd
+    import fakeSmartApi as fake
+    import indicators as i
+
+    to_date = datetime(2024, 12, 6, 15, 30)
+    df = cd.to_frame(*cd.decode(fake.candles(26000, 'ONE_MINUTE', to_date - timedelta(days=days), to_date)))
+    high, low, close = df['H'].to_numpy(), df['L'].to_numpy(), df['C'].to_numpy()
+
+    def same(a, b):
+        return np.array_equal(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64), equal_nan=True)
+
+    assert same(replay(EMA(30), close), i.calculate_ema(df, 30))
+    assert same(replay(RSI(14), close), i.calculate_rsi(df, 14))
+    nudge = bool((high == low).any())
+    supertrend = replay(Supertrend(10, 3, nudge), high, low, close)
+    expected = i.calculate_supertrend(df, 10, 3)
+    assert same(supertrend[:, 0], expected['Supertrend']) and same(supertrend[:, 1], expected['Supertrend_Direction'])
+
+    # One more bar: recompute over the whole frame against one streaming update
+    ema, rsi, st = EMA(30), RSI(14), Supertrend(10, 3, nudge)
+    for h, l, c in zip(high[:-1].tolist(), low[:-1].tolist(), close[:-1].tolist()):
+        ema.update(c), rsi.update(c), st.update(h, l, c)
+    start = time.perf_counter()
+    i.calculate_ema(df, 30), i.calculate_rsi(df, 14), i.calculate_supertrend(df, 10, 3)
+    full_us = (time.perf_counter() - start) * 1e6
+    h, l, c = float(high[-1]), float(low[-1]), float(close[-1])
+    start = time.perf_counter()
+    ema.update(c), rsi.update(c), st.update(h, l, c)
+    stream_us = (time.perf_counter() - start) * 1e6
+    assert math.isclose(st.value, expected['Supertrend'].iloc[-1])
+
+    print("{} bars: EMA(30), RSI(14), Supertrend(10, 3) match indicators.py".format(len(df)))
+    print("new bar, full recompute : {:.0f} us".format(full_us))
+    print("new bar, streaming      : {:.1f} us".format(stream_us))
+    return {'full_us': full_us, 'stream_us': stream_us}
+
+
+if __name__ == "__main__":
+    benchmark()
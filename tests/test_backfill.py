@@ -0,0 +1,75 @@
+# test_backfill.py
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from SmartApi import SmartConnect
+
+import backfill as bf
+import candleCache as cc
+import candleDecoder as cd
+import fakeSmartApi as fake
+import rateLimiter as rl
+
+
+TO_DATE = datetime(2024, 12, 6, 15, 30)
+
+
+@pytest.fixture
+def server():
+    server = fake.FakeSmartApiServer()
+    yield server
+    server.stop()
+
+
+def test_split_range_covers_the_range_in_allowed_windows():
+    from_date = TO_DATE - timedelta(days=90)
+    windows = bf.split_range(from_date, TO_DATE, 'ONE_MINUTE')
+    assert windows[0][0] == from_date and windows[-1][1] == TO_DATE
+    assert all(end - start <= timedelta(days=cc.MAX_DAYS['ONE_MINUTE']) for start, end in windows)
+    assert all(b[0] == a[1] + timedelta(minutes=1) for a, b in zip(windows, windows[1:]))
+
+
+def test_stitch_keeps_the_later_copy_of_a_repeated_bar():
+    first = cd.decode([['2024-12-06T09:15:00+05:30', 1, 1, 1, 1, 10], ['2024-12-06T09:16:00+05:30', 2, 2, 2, 2, 20]])
+    second = cd.decode([['2024-12-06T09:16:00+05:30', 3, 3, 3, 3, 30], ['2024-12-06T09:17:00+05:30', 4, 4, 4, 4, 40]])
+    ts, ohlc, volume = bf.stitch([first, second])
+    assert len(ts) == 3 and np.all(np.diff(ts) > 0)
+    assert ohlc[:, 3].tolist() == [1, 3, 4] and volume.tolist() == [10, 30, 40]
+
+
+def test_run_stitches_every_window_of_every_job(server):
+    obj = SmartConnect(api_key='fake', root=server.start())
+    from_date = TO_DATE - timedelta(days=90)
+    backfill = bf.Backfill(obj, workers=4, limiter=rl.RateLimiter(1e9))
+    frames = backfill.run([('NSE', 26000, 'ONE_MINUTE', from_date, TO_DATE), ('NSE', 26009, 'FIVE_MINUTE', from_date, TO_DATE)])
+    for (exchange, token, interval), frame in frames.items():
+        ts, ohlc, volume = cd.decode(fake.candles(int(token), interval, from_date, TO_DATE))
+        assert np.array_equal(frame.ts, ts) and np.array_equal(frame.close, ohlc[:, 3]) and np.array_equal(frame.volume, volume)
+    stats = backfill.progress.snapshot()
+    assert stats['windows_done'] == stats['windows_total'] == 3 + 1 and stats['failed'] == 0
+
+
+def test_failed_windows_are_retried_then_left_as_gaps(monkeypatch):
+    monkeypatch.setattr(bf.time, 'sleep', lambda seconds: None)
+
+    from_date = TO_DATE - timedelta(days=90)
+    windows = bf.split_range(from_date, TO_DATE, 'ONE_MINUTE')
+    # The first window fails once, the second on every attempt
+    failures = {windows[0][0].strftime("%Y-%m-%d %H:%M"): 1, windows[1][0].strftime("%Y-%m-%d %H:%M"): 99}
+
+    class FlakyApi:
+        def getCandleData(self, params):
+            if failures.get(params['fromdate'], 0) > 0:
+                failures[params['fromdate']] -= 1
+                return {'status': False, 'message': 'Something Went Wrong', 'errorcode': 'AB1004', 'data': None}
+            start = datetime.strptime(params['fromdate'], "%Y-%m-%d %H:%M")
+            end = datetime.strptime(params['todate'], "%Y-%m-%d %H:%M")
+            return {'status': True, 'data': fake.candles(26000, 'ONE_MINUTE', start, end)}
+
+    backfill = bf.Backfill(FlakyApi(), retries=2, limiter=rl.RateLimiter(1e9))
+    frame = backfill.run([('NSE', 26000, 'ONE_MINUTE', from_date, TO_DATE)])[('NSE', '26000', 'ONE_MINUTE')]
+    stats = backfill.progress.snapshot()
+    assert stats['failed'] == 1 and stats['retries'] == 1 + 2
+    expected = [cd.decode(fake.candles(26000, 'ONE_MINUTE', start, end)) for i, (start, end) in enumerate(windows) if i != 1]
+    assert np.array_equal(frame.ts, bf.stitch(expected)[0])
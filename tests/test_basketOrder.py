@@ -0,0 +1,105 @@
+# test_basketOrder.py
+import itertools
+import time
+
+import pytest
+from SmartApi import SmartConnect
+
+import basketOrder as bo
+import fakeSmartApi as fake
+import rateLimiter as rl
+
+
+class Broker:
+    """Order endpoints of the fake API: symbols ending in REJECT are rejected, failing cancels fail."""
+
+    def __init__(self, server, fail_cancels=False):
+        self.orders, self.cancels, self.arrivals = [], [], []
+        self.fail_cancels = fail_cancels
+        self._ids = itertools.count(1)
+        server.route(SmartConnect._routes['api.order.place'], self.place)
+        server.route(SmartConnect._routes['api.order.cancel'], self.cancel)
+
+    def place(self, params):
+        self.orders.append(params)
+        self.arrivals.append(time.monotonic())
+        if params['tradingsymbol'].endswith('REJECT'):
+            return {'status': False, 'message': 'Order rejected: margin exceeds', 'errorcode': 'AB4036', 'data': None}
+        return {'status': True, 'message': 'SUCCESS', 'errorcode': '', 'data': {'orderid': '2412060000{:05d}'.format(next(self._ids))}}
+
+    def cancel(self, params):
+        self.cancels.append(params['orderid'])
+        if self.fail_cancels:
+            return {'status': False, 'message': 'Order already executed', 'errorcode': 'AB2001', 'data': None}
+        return {'status': True, 'message': 'SUCCESS', 'errorcode': '', 'data': {'orderid': params['orderid']}}
+
+
+@pytest.fixture
+def server():
+    server = fake.FakeSmartApiServer(latency=0.05)
+    yield server
+    server.stop()
+
+
+def basket(server, on_reject):
+    obj = SmartConnect(api_key='fake', access_token='jwt', root=server.start())
+    return bo.BasketOrder(bo.OrderClient(obj), on_reject=on_reject)
+
+
+CE = bo.leg('43512', 'NIFTY12DEC2424500CE', 25, 'SELL')
+PE = bo.leg('43513', 'NIFTY12DEC2424500PE', 25, 'SELL')
+PE_REJECT = bo.leg('43513', 'NIFTY12DEC2424500PE-REJECT', 25, 'SELL')
+
+
+def test_legs_are_placed_together(server):
+    broker = Broker(server)
+    orders = basket(server, 'flatten')
+    result = orders.submit([CE, PE])
+    orders.close()
+    assert result.ok and len(set(result.orderids)) == 2 and not result.compensations
+    assert abs(broker.arrivals[1] - broker.arrivals[0]) < 0.5 * rl.rate_limiter('placeOrder').interval
+
+
+def test_rejected_leg_flattens_the_placed_ones(server):
+    broker = Broker(server)
+    orders = basket(server, 'flatten')
+    result = orders.submit([CE, PE_REJECT])
+    orders.close()
+    assert not result.ok and [r.status for r in result.legs] == ['placed', 'rejected']
+    assert [r.status for r in result.compensations] == ['placed']
+    flatten = broker.orders[2]
+    assert (flatten['tradingsymbol'], flatten['transactiontype'], flatten['ordertype'], flatten['quantity']) == \
+        ('NIFTY12DEC2424500CE', 'BUY', 'MARKET', CE['quantity'])
+    assert not broker.cancels
+
+
+def test_rejected_leg_cancels_the_placed_ones(server):
+    broker = Broker(server)
+    orders = basket(server, 'cancel')
+    result = orders.submit([bo.leg('43512', 'NIFTY12DEC2424500CE', 25, 'SELL', 'LIMIT', 120.5), PE_REJECT])
+    orders.close()
+    assert broker.cancels == [result.legs[0].orderid] and len(broker.orders) == 2
+    assert [r.status for r in result.compensations] == ['cancelled']
+
+
+def test_failed_compensation_is_reported(server):
+    Broker(server, fail_cancels=True)
+    orders = basket(server, 'cancel')
+    result = orders.submit([CE, PE_REJECT])
+    orders.close()
+    assert [r.status for r in result.compensations] == ['cancel failed']
+
+
+def test_no_compensation_when_every_leg_is_rejected_or_disabled(server):
+    broker = Broker(server)
+    orders = basket(server, 'flatten')
+    assert not orders.submit([PE_REJECT, PE_REJECT]).compensations
+    orders.on_reject = None
+    assert not orders.submit([CE, PE_REJECT]).compensations
+    orders.close()
+    assert len(broker.orders) == 4
+
+
+def test_unknown_compensation_is_refused(server):
+    with pytest.raises(ValueError):
+        basket(server, 'hedge')
@@ -0,0 +1,65 @@
+# test_marketFeed.py
+import time
+
+import pytest
+
+import fakeSmartApi as fake
+import marketFeed as mf
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.fixture
+def server():
+    server = fake.FakeFeedServer(interval=0.01)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def feed(server):
+    feed = mf.MarketFeed('jwt', 'key', 'client', 'feed', url=server.url, retry_delay=0.2)
+    yield feed
+    feed.stop()
+
+
+@pytest.mark.parametrize('mode', [1, 2, 3])
+def test_decode_agrees_with_smartwebsocketv2(mode):
+    packet = fake.tick_packet(mode, 2, 43512, 7, 1733456700000, 24510.35)
+    tick, parsed = mf.decode(packet), mf._Socket(None, '', 'jwt', 'key', 'client', 'feed')._parse_binary_data(packet)
+    assert tick.token == parsed['token'] and tick.sequence == parsed['sequence_number']
+    assert tick.ltp * 100 == parsed['last_traded_price']
+
+
+def test_dropped_connection_reconnects_and_resubscribes(server, feed):
+    spot = []
+    feed.subscribe('NSE', ['26000'], 'LTP', callback=spot.append)
+    feed.subscribe('NFO', ['43512'], 'SNAP_QUOTE')
+    assert feed.start(timeout=5)
+    assert wait_for(lambda: len(spot) > 10 and feed.last('NFO', '43512') is not None)
+
+    server.drop_connections()
+    before = len(spot)
+    assert wait_for(lambda: feed.connects == 2 and len(spot) > before + 10)
+    assert server.connections == 2 and feed.last('NFO', '43512').mode == 3
+
+
+def test_unsubscribed_tokens_stop_after_a_reconnect(server, feed):
+    spot, other = [], []
+    feed.subscribe('NSE', ['26000'], 'LTP', callback=spot.append)
+    feed.subscribe('NSE', ['26009'], 'LTP', callback=other.append)
+    assert feed.start(timeout=5) and wait_for(lambda: len(spot) > 0)
+    feed.unsubscribe('NSE', ['26000'])
+    server.drop_connections()
+    assert wait_for(lambda: feed.connects == 2)
+    count, before = len(spot), len(other)
+    time.sleep(0.3)
+    assert len(spot) == count and len(other) > before
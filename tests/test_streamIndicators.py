@@ -0,0 +1,46 @@
+# test_streamIndicators.py
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import candleDecoder as cd
+import fakeSmartApi as fake
+import streamIndicators as si
+
+# Parity is checked against pandas_ta through indicators.py
+pytest.importorskip('pandas_ta')
+import indicators as i
+
+
+@pytest.fixture(scope='module')
+def df():
+    to_date = datetime(2024, 12, 6, 15, 30)
+    return cd.to_frame(*cd.decode(fake.candles(26000, 'ONE_MINUTE', to_date - timedelta(days=10), to_date)))
+
+
+def same(a, b):
+    return np.allclose(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64), rtol=1e-12, atol=0, equal_nan=True)
+
+
+@pytest.mark.parametrize('length', [9, 30])
+def test_ema_matches_pandas_ta(df, length):
+    assert same(si.replay(si.EMA(length), df['C'].to_numpy()), i.calculate_ema(df, length))
+
+
+@pytest.mark.parametrize('length', [7, 14])
+def test_rsi_matches_pandas_ta(df, length):
+    assert same(si.replay(si.RSI(length), df['C'].to_numpy()), i.calculate_rsi(df, length))
+
+
+@pytest.mark.parametrize('period, multiplier', [(10, 3), (7, 2.5)])
+def test_supertrend_matches_pandas_ta(df, period, multiplier):
+    high, low, close = df['H'].to_numpy(), df['L'].to_numpy(), df['C'].to_numpy()
+    supertrend = si.replay(si.Supertrend(period, multiplier, bool((high == low).any())), high, low, close)
+    expected = i.calculate_supertrend(df, period, multiplier)
+    assert same(supertrend[:, 0], expected['Supertrend']) and same(supertrend[:, 1], expected['Supertrend_Direction'])
+
+
+def test_legacy_column_names_give_the_same_values(df):
+    legacy = df.rename(columns={'H': 'High', 'L': 'Low', 'C': 'Close'})
+    assert same(i.calculate_ema(legacy, 30), i.calculate_ema(df, 30))
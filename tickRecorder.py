@@ -0,0 +1,744 @@
+# tickRecorder.py
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+from logzero import logger
+
+import candleCache as cc
+import marketClock as mc
+import marketFeed as mf
+import scripMaster as sm
+
+
+RECORDING_DIR = 'recordings'
+
+MAGIC = b'TKL1'
+BLOCK = struct.Struct('<4sBII')
+# Block kinds; a START block holds the time recording began in the file, in ns since the epoch
+TICKS, CALLS, START = 1, 2, 3
+START_TIME = struct.Struct('<q')
+
+# Tick columns, in file order; '*' marks deltas against the instrument's previous tick
+TICK_COLUMNS = ('arrival', 'key', 'mode', 'sequence', '*exchange_ts', '*ltp', 'last_qty', '*volume', '*oi',
+                '*open', '*high', '*low', '*close', '*avg_price', '*buy_qty', '*sell_qty', 'bid', 'ask')
+
+# Columns holding prices, stored in paise (or the exchange's price unit)
+PRICE_COLUMNS = ('ltp', 'open', 'high', 'low', 'close', 'avg_price', 'bid', 'ask')
+
+# SmartConnect methods whose results are recorded
+RECORDED_METHODS = ('ltpData', 'getMarketData', 'getCandleData')
+
+FLUSH_TICKS = 4096
+FLUSH_SECONDS = 1.0
+
+
+def _groups(keys):
+    # Stable order grouping each instrument's ticks, and where each instrument's run starts in it
+    order = np.argsort(keys, kind='stable')
+    ordered = keys[order]
+    first = np.r_[True, ordered[1:] != ordered[:-1]] if len(keys) else np.zeros(0, bool)
+    return order, first
+
+
+def _delta(values, groups):
+    # Difference from the previous value of the same instrument; the first of each is kept as is
+    order, first = groups
+    ordered = values[order]
+    step = np.diff(ordered, prepend=0)
+    step[first] = ordered[first]
+    out = np.empty_like(values)
+    out[order] = step
+    return out
+
+
+def _undelta(steps, groups):
+    order, first = groups
+    ordered = steps[order]
+    total = np.cumsum(ordered)
+    starts = np.flatnonzero(first)
+    base = total[starts] - ordered[starts]
+    out = np.empty_like(steps)
+    out[order] = total - base[np.cumsum(first) - 1]
+    return out
+
+
+def _narrow(values):
+    # Smallest integer type holding the column, so zlib has less to chew through
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if not len(values) or (values.min() >= info.min and values.max() <= info.max):
+            return values.astype(dtype)
+    return values
+
+
+def encode_ticks(columns, keys):
+    """
+    Encode a block of ticks.
+
+    Arrival times are deltas from the previous tick; exchange time, price,
+    volume, OI, the day's OHLC, average price and total buy and sell
+    quantities are deltas from the same instrument's previous tick; bid and
+    ask are offsets from the price. Each column is stored in the
+    narrowest integer type that holds it, then the block is compressed.
+
+    Parameters:
+        columns (dict): Column name (without '*') -> int64 array.
+        keys (list): (exchange_type, token) per key id.
+
+    Returns:
+        bytes: Compressed block payload.
+    """
+    groups = _groups(columns['key'])
+    header, parts = {'keys': keys, 'columns': []}, []
+    for column in TICK_COLUMNS:
+        name = column.lstrip('*')
+        values = columns[name]
+        if column[0] == '*':
+            values = _delta(values, groups)
+        elif name == 'arrival':
+            values = np.diff(values, prepend=0)
+        elif name in ('bid', 'ask'):
+            values = values - columns['ltp']
+        values = _narrow(values)
+        header['columns'].append([name, values.dtype.str])
+        parts.append(values.tobytes())
+    meta = json.dumps(header).encode()
+    return zlib.compress(struct.pack('<I', len(meta)) + meta + b''.join(parts), 6)
+
+
+def decode_ticks(payload, count):
+    """
+    Decode a block of ticks written by encode_ticks.
+
+    Parameters:
+        payload (bytes): Compressed block payload.
+        count (int): Ticks in the block.
+
+    Returns:
+        tuple: (columns, keys) with int64 column arrays by name and the (exchange_type, token) key table.
+    """
+    raw = zlib.decompress(payload)
+    size = struct.unpack_from('<I', raw)[0]
+    header = json.loads(raw[4:4 + size])
+    offset, columns = 4 + size, {}
+    for name, dtype in header['columns']:
+        values = np.frombuffer(raw, dtype=dtype, count=count, offset=offset).astype(np.int64)
+        offset += values.size * np.dtype(dtype).itemsize
+        columns[name] = values
+    groups = _groups(columns['key'])
+    for column in TICK_COLUMNS:
+        name = column.lstrip('*')
+        if name not in columns:
+            # Written before the column existed
+            columns[name] = np.zeros(count, np.int64)
+        elif column[0] == '*':
+            columns[name] = _undelta(columns[name], groups)
+        elif name == 'arrival':
+            columns[name] = np.cumsum(columns[name])
+    columns['bid'] = columns['bid'] + columns['ltp']
+    columns['ask'] = columns['ask'] + columns['ltp']
+    return columns, [tuple(k) for k in header['keys']]
+
+
+def read_blocks(path):
+    """
+    Read the blocks of a log, stopping at a truncated one (a recorder that died mid-write).
+
+    Parameters:
+        path (str): Log file.
+
+    Yields:
+        tuple: (kind, count, payload).
+    """
+    with open(path, 'rb') as file:
+        while True:
+            head = file.read(BLOCK.size)
+            if len(head) < BLOCK.size:
+                return
+            magic, kind, count, size = BLOCK.unpack(head)
+            payload = file.read(size)
+            if magic != MAGIC or len(payload) < size:
+                logger.warning(f"{path}: stopped at a damaged block")
+                return
+            yield kind, count, payload
+
+
+def log_path(directory, day):
+    """
+    Get the log file of a day.
+
+    Parameters:
+        directory (str): Recording directory.
+        day (date): IST trading day.
+
+    Returns:
+        str: Path of the day's log.
+    """
+    return os.path.join(directory, 'ticks-{:%Y-%m-%d}.tkl'.format(day))
+
+
+class Recorder:
+    """
+    Append-only log of feed ticks and SmartAPI responses, one file per IST day.
+
+    Ticks are buffered and written in compressed, delta-encoded blocks of
+    up to `flush_ticks`, or after `flush_seconds`; API calls go in blocks
+    of JSON. A crash loses at most the unflushed block, and a log cut off
+    mid-block is read up to the last whole one.
+    """
+
+    def __init__(self, directory=RECORDING_DIR, flush_ticks=FLUSH_TICKS, flush_seconds=FLUSH_SECONDS, now=time.time_ns):
+        self.directory = directory
+        self.flush_ticks = flush_ticks
+        self.flush_seconds = flush_seconds
+        self.ticks = 0
+        self.calls = 0
+        self.bytes = 0
+        self._now = now
+        self._day = None
+        self._day_span = None
+        self._file = None
+        self._keys = {}
+        self._rows = []
+        self._calls = []
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._started = now()
+        os.makedirs(directory, exist_ok=True)
+
+    def _rotate(self, arrival):
+        if self._day is not None and self._day_span[0] <= arrival < self._day_span[1]:
+            return
+        day = datetime.fromtimestamp(arrival / 1e9, sm.IST).date()
+        self._flush()
+        if self._file is not None:
+            self._file.close()
+        self._day = day
+        start = (arrival + cc.IST_OFFSET_NS) // cc.DAY_NS * cc.DAY_NS - cc.IST_OFFSET_NS
+        self._day_span = (start, start + cc.DAY_NS)
+        self._file = open(log_path(self.directory, day), 'ab')
+        self._write(START, 0, START_TIME.pack(max(self._started, start)))
+
+    def record_tick(self, tick, arrival=None):
+        """
+        Record a marketFeed.Tick: every field of LTP and QUOTE ticks, and of
+        SNAP_QUOTE ticks all but circuit limits, 52-week range, last trade
+        time and OI change. Depth is kept to the best bid and ask.
+
+        Parameters:
+            tick (marketFeed.Tick): Decoded tick.
+            arrival (int, optional): Receive time in ns since the epoch. Defaults to now.
+        """
+        arrival = self._now() if arrival is None else arrival
+        scale = mf.PRICE_DIVISOR.get(tick.exchange_type, 100)
+        with self._lock:
+            self._rotate(arrival)
+            key = (tick.exchange_type, tick.token)
+            key_id = self._keys.get(key)
+            if key_id is None:
+                key_id = self._keys[key] = len(self._keys)
+            ltp = round(tick.ltp * scale)
+            if tick.mode >= 2:
+                quote = (round(tick.open * scale), round(tick.high * scale), round(tick.low * scale),
+                         round(tick.close * scale), round(tick.avg_price * scale), round(tick.buy_qty), round(tick.sell_qty))
+            else:
+                quote = (0, 0, 0, 0, 0, 0, 0)
+            self._rows.append((arrival, key_id, tick.mode, tick.sequence, tick.exchange_ts, ltp, tick.last_qty or 0,
+                               tick.volume or 0, tick.oi or 0) + quote +
+                              (round(tick.bids[0][0] * scale) if tick.bids else ltp,
+                               round(tick.asks[0][0] * scale) if tick.asks else ltp))
+            self.ticks += 1
+            if len(self._rows) >= self.flush_ticks or time.monotonic() - self._flushed_at >= self.flush_seconds:
+                self._flush()
+
+    def record_call(self, method, args, kwargs, response, arrival=None):
+        """
+        Record one SmartConnect call and its response.
+
+        Parameters:
+            method (str): SmartConnect method name.
+            args (tuple): Positional arguments.
+            kwargs (dict): Keyword arguments.
+            response: JSON-serializable response.
+            arrival (int, optional): Response time in ns since the epoch. Defaults to now.
+        """
+        arrival = self._now() if arrival is None else arrival
+        with self._lock:
+            self._rotate(arrival)
+            self._calls.append({'t': arrival, 'method': method, 'args': list(args), 'kwargs': kwargs, 'response': response})
+            self.calls += 1
+
+    def _write(self, kind, count, payload):
+        self._file.write(BLOCK.pack(MAGIC, kind, count, len(payload)) + payload)
+        self.bytes += BLOCK.size + len(payload)
+
+    def _flush(self):
+        if self._rows:
+            names = [c.lstrip('*') for c in TICK_COLUMNS]
+            table = np.array(self._rows, dtype=np.int64)
+            keys = [None] * len(self._keys)
+            for key, key_id in self._keys.items():
+                keys[key_id] = list(key)
+            self._write(TICKS, len(self._rows), encode_ticks(dict(zip(names, table.T)), keys))
+            self._rows = []
+        if self._calls:
+            self._write(CALLS, len(self._calls), zlib.compress(json.dumps(self._calls, default=str).encode(), 6))
+            self._calls = []
+        if self._file is not None:
+            self._file.flush()
+        self._flushed_at = time.monotonic()
+
+    def flush(self):
+        """Write everything buffered."""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Flush and close the log."""
+        with self._lock:
+            self._flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def attach_feed(self, feed):
+        """
+        Record every tick of a market feed.
+
+        Parameters:
+            feed (marketFeed.MarketFeed): Feed to listen to.
+        """
+        feed.on_tick(self.record_tick)
+
+    def wrap(self, smartApi):
+        """
+        Get a SmartConnect stand-in that records the results of RECORDED_METHODS.
+
+        Parameters:
+            smartApi (SmartConnect): Session to pass calls to.
+
+        Returns:
+            RecordingSmartApi: Drop-in for `smartApi`.
+        """
+        return RecordingSmartApi(smartApi, self)
+
+
+class RecordingSmartApi:
+    """SmartConnect proxy recording the responses of RECORDED_METHODS; everything else passes through."""
+
+    def __init__(self, smartApi, recorder):
+        self._smartApi = smartApi
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        attr = getattr(self._smartApi, name)
+        if name not in RECORDED_METHODS:
+            return attr
+
+        def call(*args, **kwargs):
+            response = attr(*args, **kwargs)
+            self._recorder.record_call(name, args, kwargs, response)
+            return response
+
+        return call
+
+
+class ReplaySmartApi:
+    """
+    SmartConnect stand-in answering RECORDED_METHODS from a recording.
+
+    Each method's calls get its recorded responses in the order they were
+    recorded, whatever their arguments: a replayed strategy asks for the
+    same things in the same order, but with dates taken from the day it is
+    replayed on. The last response is repeated once they run out.
+    """
+
+    def __init__(self, calls):
+        self._calls = {}
+        for call in calls:
+            self._calls.setdefault(call['method'], []).append(call)
+        self._served = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name not in RECORDED_METHODS:
+            raise AttributeError("{} was not recorded".format(name))
+
+        def call(*args, **kwargs):
+            calls = self._calls.get(name)
+            if not calls:
+                logger.warning(f"No recorded response for {name}{tuple(args)}")
+                return None
+            with self._lock:
+                i = self._served.get(name, 0)
+                self._served[name] = i + 1
+            recorded = calls[min(i, len(calls) - 1)]
+            if json.loads(json.dumps([list(args), kwargs], default=str)) != [recorded['args'], recorded['kwargs']]:
+                logger.debug(f"{name} call {i} asked for {tuple(args)} {kwargs}, recorded {recorded['args']} {recorded['kwargs']}")
+            return recorded['response']
+
+        return call
+
+
+class ReplayFeed:
+    """
+    MarketFeed stand-in that plays back recorded ticks on a simulated clock.
+
+    Same subscribe/on_tick/last/ltp interface as MarketFeed. Ticks are
+    delivered in recorded order at `speed` times real time, or as fast as
+    possible with speed=None; either way the simulated clock (`clock`, a
+    marketClock.SimulatedTime in epoch seconds) reads each tick's recorded
+    arrival time, so a Scheduler built on it fires its bar closes between
+    the same ticks on every run. Replayed ticks carry the fields
+    Recorder.record_tick keeps, with depth down to the best bid and ask.
+    """
+
+    def __init__(self, paths, speed=None):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.speed = speed
+        self.ticks = 0
+        self.clock = None
+        self._callbacks = {}
+        self._listeners = []
+        self._last = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def calls(self):
+        """
+        Get the recorded API calls.
+
+        Returns:
+            list: Dicts of t, method, args, kwargs and response, in recorded order.
+        """
+        calls = []
+        for path in self.paths:
+            for kind, _, payload in read_blocks(path):
+                if kind == CALLS:
+                    calls.extend(json.loads(zlib.decompress(payload)))
+        return calls
+
+    def start_time(self):
+        """
+        Get the time the recording began: its recorder's start, or its first
+        day's midnight for a recorder that ran over from the day before.
+
+        Returns:
+            float: Seconds since the epoch, or None for an empty recording.
+        """
+        first = None
+        for path in self.paths:
+            for kind, count, payload in read_blocks(path):
+                if kind == START:
+                    t = START_TIME.unpack(payload)[0]
+                elif kind == TICKS:
+                    t = int(decode_ticks(payload, count)[0]['arrival'][0])
+                else:
+                    t = min(call['t'] for call in json.loads(zlib.decompress(payload)))
+                first = t if first is None else min(first, t)
+        return None if first is None else first / 1e9
+
+    def smart_api(self):
+        """
+        Get a SmartConnect stand-in answering from the recorded calls.
+
+        Returns:
+            ReplaySmartApi: Recorded responses.
+        """
+        return ReplaySmartApi(self.calls())
+
+    def blocks(self):
+        """
+        Decode the recorded ticks block by block, for consumers that work on whole arrays.
+
+        Yields:
+            tuple: (columns, keys) as returned by decode_ticks.
+        """
+        for path in self.paths:
+            for kind, count, payload in read_blocks(path):
+                if kind == TICKS:
+                    yield decode_ticks(payload, count)
+
+    def subscribe(self, exchange, tokens, mode='LTP', callback=None):
+        """
+        Deliver the recorded ticks of tokens to a callback.
+
+        Parameters:
+            exchange (str): Exchange segment (e.g., NSE, NFO).
+            tokens (list): Symbol tokens.
+            mode (str, optional): Ignored; ticks replay in their recorded mode.
+            callback (callable, optional): Called with each Tick of these tokens.
+        """
+        for token in tokens:
+            if callback is not None:
+                self._callbacks.setdefault((mf.EXCHANGE_TYPES[exchange], str(token)), []).append(callback)
+
+    def unsubscribe(self, exchange, tokens, mode='LTP'):
+        """
+        Stop delivering tokens to their callbacks.
+
+        Parameters:
+            exchange (str): Exchange segment.
+            tokens (list): Symbol tokens.
+            mode (str, optional): Ignored.
+        """
+        for token in tokens:
+            self._callbacks.pop((mf.EXCHANGE_TYPES[exchange], str(token)), None)
+
+    def on_tick(self, callback):
+        """
+        Call `callback(tick)` for every replayed tick.
+
+        Parameters:
+            callback (callable): Receives a Tick.
+        """
+        self._listeners.append(callback)
+
+    def last(self, exchange, token, timeout=None):
+        """
+        Get the latest replayed tick of a token.
+
+        Parameters:
+            exchange (str): Exchange segment.
+            token (str): Symbol token.
+            timeout (float, optional): Ignored.
+
+        Returns:
+            Tick: Latest tick, or None.
+        """
+        return self._last.get((mf.EXCHANGE_TYPES[exchange], str(token)))
+
+    def ltp(self, exchange, token, timeout=None):
+        """
+        Get the latest replayed price of a token.
+
+        Parameters:
+            exchange (str): Exchange segment.
+            token (str): Symbol token.
+            timeout (float, optional): Ignored.
+
+        Returns:
+            float: Last traded price, or None.
+        """
+        tick = self.last(exchange, token)
+        return None if tick is None else tick.ltp
+
+    def run(self, scheduler=None):
+        """
+        Replay every tick in the calling thread.
+
+        Parameters:
+            scheduler (marketClock.Scheduler, optional): Scheduler on `clock`
+                (now=feed.clock.now, sleep=feed.clock.sleep); its events fire
+                between the ticks they fall between.
+
+        Returns:
+            int: Ticks replayed.
+        """
+        self._stop.clear()
+        tick_class, callbacks, listeners, last = mf.Tick, self._callbacks, self._listeners, self._last
+        started = time.perf_counter()
+        first = None
+        due = None
+        for columns, keys in self.blocks():
+            arrival = columns['arrival']
+            if self.clock is None:
+                self.clock = mc.SimulatedTime(arrival[0] / 1e9)
+            if first is None:
+                first = arrival[0]
+            scales = [mf.PRICE_DIVISOR.get(e, 100.0) for e, _ in keys]
+            rows = zip(*(columns[c.lstrip('*')].tolist() for c in TICK_COLUMNS))
+            for t, k, mode, sequence, exchange_ts, ltp, qty, volume, oi, o, h, l, c, avg, buy, sell, bid, ask in rows:
+                if self._stop.is_set():
+                    return self.ticks
+                now = t / 1e9
+                if scheduler is not None:
+                    if due is None or now >= due:
+                        scheduler.run(until=now)
+                        event = scheduler.next_event(max(now, self.clock.now()))
+                        due = None if event is None else event[0]
+                if self.speed:
+                    wait = (t - first) / 1e9 / self.speed - (time.perf_counter() - started)
+                    if wait > 0.001:
+                        time.sleep(wait)
+                if now > self.clock.ts:
+                    self.clock.ts = now
+                exchange_type, token = keys[k]
+                scale = scales[k]
+                if mode == 1:
+                    tick = tick_class(1, exchange_type, token, sequence, exchange_ts, ltp / scale)
+                elif mode == 2:
+                    tick = tick_class(2, exchange_type, token, sequence, exchange_ts, ltp / scale, qty, avg / scale, volume,
+                                      float(buy), float(sell), o / scale, h / scale, l / scale, c / scale)
+                else:
+                    tick = tick_class(3, exchange_type, token, sequence, exchange_ts, ltp / scale, qty, avg / scale, volume,
+                                      float(buy), float(sell), o / scale, h / scale, l / scale, c / scale, None, oi, None,
+                                      ((bid / scale, 0, 0),), ((ask / scale, 0, 0),))
+                self.ticks += 1
+                key = (exchange_type, token)
+                last[key] = tick
+                for callback in callbacks.get(key, ()):
+                    callback(tick)
+                for callback in listeners:
+                    callback(tick)
+        if scheduler is not None and self.clock is not None:
+            scheduler.run(until=self.clock.now() + 86400)
+        return self.ticks
+
+    def start(self, timeout=None):
+        """
+        Replay on a daemon thread.
+
+        Parameters:
+            timeout (float, optional): Ignored; there is nothing to connect to.
+
+        Returns:
+            bool: True.
+        """
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return True
+
+    def wait_connected(self, timeout=None):
+        return True
+
+    def stop(self):
+        """Stop the replay."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+def benchmark(tokens=200, directory=None):
+    """
+    Record a simulated session, then replay it at full speed into a TickAggregator.
+
+    Parameters:
+        tokens (int, optional): Instruments in the session. Defaults to 200.
+        directory (str, optional): Recording directory. Defaults to a temporary one.
+
+    Returns:
+        dict: Ticks, bytes per tick, and decode and replay rates in ticks per second.
+    """
+    import tempfile
+    import tickAggregator as ta
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = directory or tmp
+        day = datetime(2024, 12, 6)
+        arrival, token, ts, price, cum = ta.simulated_ticks(list(range(26000, 26000 + tokens)), day)
+        recorder = Recorder(directory, flush_seconds=float('inf'))
+        start = time.perf_counter()
+        for i, (t, k, exchange_ts, p, v) in enumerate(zip(arrival.tolist(), token.tolist(), ts.tolist(), price.tolist(), cum.tolist())):
+            recorder.record_tick(mf.Tick(2, 1, str(k), i, exchange_ts // 1_000_000, p, 1, p, v, 0.0, 0.0, p, p, p, p), arrival=t)
+        recorder.close()
+        record_s = time.perf_counter() - start
+        path = log_path(directory, day.date())
+        size = os.path.getsize(path)
+
+        feed = ReplayFeed(path)
+        start = time.perf_counter()
+        decoded = sum(len(columns['arrival']) for columns, _ in feed.blocks())
+        decode_s = time.perf_counter() - start
+
+        bare = ReplayFeed(path)
+        bare.on_tick(lambda tick: None)
+        start = time.perf_counter()
+        bare.run()
+        bare_s = time.perf_counter() - start
+
+        aggregator = ta.TickAggregator(['ONE_MINUTE'])
+        aggregator.attach_feed(feed)
+        sim = mc.SimulatedTime(arrival[0] / 1e9)
+        feed.clock = sim
+        scheduler = mc.Scheduler(now=sim.now, sleep=sim.sleep, delay=aggregator.grace)
+        aggregator.attach(scheduler)
+        start = time.perf_counter()
+        replayed = feed.run(scheduler)
+        replay_s = time.perf_counter() - start
+
+        assert decoded == replayed == len(arrival)
+        frame = aggregator.frame(('NSE', '26000'), 'ONE_MINUTE')
+        assert len(frame) == 375 and aggregator.late == 0
+        last = feed.last('NSE', '26000')
+        assert last.ltp == price[token == 26000][-1] and last.volume == cum[token == 26000][-1]
+
+    print("{:,} ticks recorded at {:,.0f} ticks/s: {:.2f} MB, {:.1f} bytes per tick ({:.0f} raw)".format(
+        len(arrival), len(arrival) / record_s, size / 1e6, size / len(arrival), len(TICK_COLUMNS) * 8))
+    print("decode to arrays         : {:,.0f} ticks/s".format(decoded / decode_s))
+    print("replay as Tick callbacks : {:,.0f} ticks/s".format(len(arrival) / bare_s))
+    print("replay into an aggregator: {:,.0f} ticks/s, {} bars of {} emitted on the simulated clock".format(
+        replayed / replay_s, len(frame), ('NSE', '26000')))
+    return {'ticks': len(arrival), 'bytes_per_tick': size / len(arrival), 'decode_per_s': decoded / decode_s,
+            'callback_per_s': len(arrival) / bare_s, 'replay_per_s': replayed / replay_s}
+
+
+if __name__ == "__main__":
+    benchmark()
+
+    # API responses replay in order, and a log cut off mid-block is read up to the last whole block
+    import tempfile
+    import fakeSmartApi as fake
+
+    class Session:
+        def __init__(self):
+            self.n = 0
+
+        def ltpData(self, exchange, symbol, token):
+            self.n += 1
+            return {'status': True, 'data': {'ltp': 24000.0 + self.n}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        recorder = Recorder(tmp, flush_ticks=2)
+        session = recorder.wrap(Session())
+        answers = [session.ltpData('NSE', 'NIFTY', '26000')['data']['ltp'] for _ in range(3)]
+        for i in range(5):
+            recorder.record_tick(mf.Tick(1, 1, '26000', i, 1733456700000 + i, 24000.0 + i))
+        recorder.close()
+        path = os.listdir(tmp)[0]
+        replay = ReplayFeed(os.path.join(tmp, path)).smart_api()
+        assert [replay.ltpData('NSE', 'NIFTY', '26000')['data']['ltp'] for _ in range(4)] == answers + answers[-1:]
+
+        # A QUOTE and a SNAP_QUOTE tick come back field for field
+        quote = mf.decode(fake.tick_packet(2, 1, '26000', 7, 1733456705000, 24012.35))
+        snap = mf.decode(fake.tick_packet(3, 2, '43512', 8, 1733456705500, 120.55))
+        recorder = Recorder(tmp)
+        recorder.record_tick(quote, arrival=1733456705001000000)
+        recorder.record_tick(snap, arrival=1733456705501000000)
+        recorder.close()
+        replay = ReplayFeed(log_path(tmp, datetime(2024, 12, 6).date()))
+        replay.run()
+        assert [getattr(replay.last('NSE', '26000'), n) for n in mf.Tick.__slots__] == [getattr(quote, n) for n in mf.Tick.__slots__]
+        replayed = replay.last('NFO', '43512')
+        kept = [n for n in mf.Tick.__slots__ if n not in ('last_trade_ts', 'oi_change', 'bids', 'asks', 'upper_circuit',
+                                                         'lower_circuit', 'high_52w', 'low_52w')]
+        assert [getattr(replayed, n) for n in kept] == [getattr(snap, n) for n in kept]
+        assert replayed.bids[0][0] == snap.bids[0][0] and replayed.asks[0][0] == snap.asks[0][0]
+
+        # Calls match by method and order, not by the dates in their arguments
+        class CandleSession:
+            def getCandleData(self, params):
+                return {'status': True, 'data': [[params['todate'], 1, 1, 1, 1, 0]]}
+
+        with tempfile.TemporaryDirectory() as other:
+            times = iter(range(1733456700000000000, 1733456790000000000, 30 * 10 ** 9))
+            recorder = Recorder(other, now=lambda: next(times))
+            session = recorder.wrap(CandleSession())
+            polls = [session.getCandleData({'todate': '2024-12-06 09:{:02d}'.format(m)}) for m in (16, 17)]
+            recorder.close()
+            feed = ReplayFeed(log_path(other, datetime(2024, 12, 6).date()))
+            replay = feed.smart_api()
+            assert [replay.getCandleData({'todate': '2025-01-03 09:{:02d}'.format(m)}) for m in (16, 17)] == polls
+            # Replay starts when the recorder did, not at its first call
+            assert feed.start_time() == 1733456700.0
+
+        with open(os.path.join(tmp, path), 'r+b') as file:
+            file.truncate(os.path.getsize(os.path.join(tmp, path)) - 3)
+        assert ReplayFeed(os.path.join(tmp, path)).run() == 4
+    print("recorded calls replay in order; QUOTE ticks round-trip; a truncated log replays up to its last whole block")
@@ -0,0 +1,300 @@
+# tickStore.py
+import threading
+import time
+
+import numpy as np
+from logzero import logger
+
+import marketFeed as mf
+
+
+TICK_DTYPE = np.dtype([('ts', 'i8'), ('ltp', 'f8'), ('qty', 'i8'), ('bid', 'f8'), ('ask', 'f8'), ('oi', 'i8')])
+
+# Ticks kept per instrument
+CAPACITY = 4096
+
+# Buffer memory of all instruments together
+MAX_BYTES = 128 * 1024 * 1024
+
+
+class _Ring:
+    """
+    Circular buffer of one instrument.
+
+    Every tick is written twice, at its slot and at slot + capacity, so the
+    last n ticks are always one contiguous slice and can be handed out as a
+    view. `count` is published after both writes.
+    """
+
+    __slots__ = ('data', 'capacity', 'count')
+
+    def __init__(self, capacity):
+        self.data = np.zeros(2 * capacity, dtype=TICK_DTYPE)
+        self.capacity = capacity
+        self.count = 0
+
+    def append(self, row):
+        i = self.count % self.capacity
+        self.data[i] = row
+        self.data[i + self.capacity] = row
+        self.count += 1
+
+    def last(self, n, count):
+        n = min(n, count, self.capacity)
+        end = (count - 1) % self.capacity + self.capacity + 1 if count else 0
+        return self.data[end - n:end]
+
+
+class TickStore:
+    """
+    The last `capacity` ticks of every instrument, in preallocated numpy buffers.
+
+    Appending is O(1) and allocates nothing after an instrument's first
+    tick. Readers get the latest ticks as read-only views into the buffer,
+    without copying; a view stays valid until the writer has appended
+    `capacity - len(view)` more ticks of that instrument, after which it
+    shows newer ticks. copy() returns a snapshot checked against that.
+
+    Buffers are allocated as instruments appear, until `max_bytes` is
+    reached; ticks of further instruments are counted in `dropped`. Safe
+    for one writer thread and any number of reader threads.
+    """
+
+    def __init__(self, capacity=CAPACITY, max_bytes=MAX_BYTES):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.max_instruments = max_bytes // (2 * capacity * TICK_DTYPE.itemsize)
+        self.dropped = 0
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rings)
+
+    @property
+    def nbytes(self):
+        return len(self._rings) * 2 * self.capacity * TICK_DTYPE.itemsize
+
+    def _ring(self, key):
+        ring = self._rings.get(key)
+        if ring is None:
+            with self._lock:
+                if len(self._rings) >= self.max_instruments:
+                    if not self.dropped:
+                        logger.warning(f"Tick store full at {len(self._rings)} instruments ({self.max_bytes} bytes); dropping new ones")
+                    self.dropped += 1
+                    return None
+                ring = self._rings[key] = _Ring(self.capacity)
+        return ring
+
+    def append(self, key, ts, ltp, qty=0, bid=np.nan, ask=np.nan, oi=0):
+        """
+        Store one tick. Only the writer thread may call this.
+
+        Parameters:
+            key (tuple): Instrument key, e.g. (exchange, token).
+            ts (int): Exchange time in ns since the epoch.
+            ltp (float): Last traded price.
+            qty (int, optional): Last traded quantity.
+            bid, ask (float, optional): Best bid and ask; NaN if unknown.
+            oi (int, optional): Open interest.
+
+        Returns:
+            bool: False if the store is full and the instrument has no buffer.
+        """
+        ring = self._ring(key)
+        if ring is None:
+            return False
+        ring.append((ts, ltp, qty, bid, ask, oi))
+        return True
+
+    def append_tick(self, tick):
+        """
+        Store a marketFeed.Tick under (exchange, token), e.g. ('NFO', '43512').
+
+        Parameters:
+            tick (marketFeed.Tick): Decoded tick; depth and OI come with SNAP_QUOTE.
+        """
+        return self.append((mf.EXCHANGE_NAMES[tick.exchange_type], tick.token), tick.exchange_ts * 1_000_000, tick.ltp,
+                           tick.last_qty or 0, tick.bids[0][0] if tick.bids else np.nan,
+                           tick.asks[0][0] if tick.asks else np.nan, tick.oi or 0)
+
+    def attach_feed(self, feed):
+        """
+        Store every tick of a market feed; the feed thread becomes the writer.
+
+        Parameters:
+            feed (marketFeed.MarketFeed): Feed to listen to.
+        """
+        feed.on_tick(self.append_tick)
+
+    def count(self, key):
+        """
+        Get how many ticks of an instrument were ever stored.
+
+        Parameters:
+            key (tuple): Instrument key.
+
+        Returns:
+            int: Ticks appended, including those overwritten since.
+        """
+        ring = self._rings.get(key)
+        return 0 if ring is None else ring.count
+
+    def last(self, key, n=None):
+        """
+        Get the latest ticks of an instrument without copying.
+
+        Parameters:
+            key (tuple): Instrument key.
+            n (int, optional): Ticks wanted. Defaults to all held.
+
+        Returns:
+            numpy.ndarray: Read-only view of TICK_DTYPE records, oldest first;
+            fields are views too (e.g. `store.last(key)['ltp']`).
+        """
+        ring = self._rings.get(key)
+        if ring is None:
+            return np.empty(0, dtype=TICK_DTYPE)
+        view = ring.last(self.capacity if n is None else n, ring.count)
+        view.flags.writeable = False
+        return view
+
+    def since(self, key, ts):
+        """
+        Get the held ticks of an instrument from a time on, without copying.
+
+        Parameters:
+            key (tuple): Instrument key.
+            ts (int): Earliest exchange time in ns since the epoch.
+
+        Returns:
+            numpy.ndarray: Read-only view of the ticks at or after `ts`.
+        """
+        view = self.last(key)
+        return view[np.searchsorted(view['ts'], ts):]
+
+    def copy(self, key, n=None):
+        """
+        Get a consistent copy of the latest ticks, safe to keep while the writer runs.
+
+        Parameters:
+            key (tuple): Instrument key.
+            n (int, optional): Ticks wanted. Defaults to all held.
+
+        Returns:
+            numpy.ndarray: TICK_DTYPE records, oldest first.
+        """
+        ring = self._rings.get(key)
+        if ring is None:
+            return np.empty(0, dtype=TICK_DTYPE)
+        n = self.capacity if n is None else n
+        while True:
+            count = ring.count
+            snapshot = ring.last(n, count).copy()
+            # The writer overwrote none of the copied slots meanwhile
+            if ring.count - count <= self.capacity - len(snapshot):
+                return snapshot
+
+    def keys(self):
+        """
+        Get the instruments held.
+
+        Returns:
+            list: Instrument keys.
+        """
+        return list(self._rings)
+
+    def stats(self):
+        """
+        Get the store counters.
+
+        Returns:
+            dict: Instruments, bytes allocated, byte budget and dropped ticks.
+        """
+        return {'instruments': len(self._rings), 'bytes': self.nbytes, 'max_bytes': self.max_bytes, 'dropped': self.dropped}
+
+
+def benchmark(ticks=1_000_000, instruments=200, window=500):
+    """
+    Compare the store with appending tick dicts to lists per instrument.
+
+    Parameters:
+        ticks (int, optional): Ticks to append. Defaults to 1,000,000.
+        instruments (int, optional): Instruments they are spread over. Defaults to 200.
+        window (int, optional): Ticks read back per instrument. Defaults to 500.
+
+    Returns:
+        dict: Appends per second and peak traced memory in MB, for both.
+    """
+    import tracemalloc
+    import pandas as pd
+
+    keys = [('NFO', str(43000 + i)) for i in range(instruments)]
+    rows = [(keys[i % instruments], 1733456700000000000 + i * 1000, 24000.0 + i % 97, i % 50) for i in range(ticks)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = TickStore()
+    for key, ts, ltp, qty in rows:
+        store.append(key, ts, ltp, qty)
+    store_s = time.perf_counter() - start
+    windows = [store.last(key, window)['ltp'].mean() for key in keys]
+    store_mb = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    lists = {}
+    for key, ts, ltp, qty in rows:
+        lists.setdefault(key, []).append({'ts': ts, 'ltp': ltp, 'qty': qty, 'bid': np.nan, 'ask': np.nan, 'oi': 0})
+    lists_s = time.perf_counter() - start
+    expected = [pd.DataFrame(lists[key][-window:])['ltp'].mean() for key in keys]
+    lists_mb = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    assert np.allclose(windows, expected)
+
+    print("{:,} ticks over {} instruments, last {} read back per instrument".format(ticks, instruments, window))
+    print("TickStore     : {:,.0f} appends/s, {:.0f} MB peak (bounded at {} ticks each)".format(ticks / store_s, store_mb, store.capacity))
+    print("list of dicts : {:,.0f} appends/s, {:.0f} MB peak (unbounded)".format(ticks / lists_s, lists_mb))
+    return {'store_per_s': ticks / store_s, 'store_mb': store_mb, 'lists_per_s': ticks / lists_s, 'lists_mb': lists_mb}
+
+
+if __name__ == "__main__":
+    benchmark()
+
+    # One writer at full speed, readers checking every copy is a consistent run of ticks
+    store = TickStore(capacity=1024, max_bytes=4 * 2 * 1024 * TICK_DTYPE.itemsize)
+    key = ('NSE', '26000')
+    done = threading.Event()
+    errors = []
+
+    def write():
+        for i in range(300_000):
+            store.append(key, i, i * 0.05, i % 7)
+        done.set()
+
+    def read():
+        reads = 0
+        while not done.is_set():
+            ticks = store.copy(key, 1000)
+            ts = ticks['ts']
+            if len(ts) and not (np.all(np.diff(ts) == 1) and np.array_equal(ticks['ltp'], ts * 0.05)):
+                errors.append(ts)
+            reads += 1
+        return reads
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and store.count(key) == 300_000
+    view = store.last(key, 10)
+    assert view['ts'][-1] == 299_999 and not view.flags.writeable and view.base is not None
+
+    # The budget holds four instruments; a fifth is dropped
+    for token in range(5):
+        store.append(('NFO', str(token)), 0, 1.0)
+    print(store.stats())
+    assert len(store) == 4 and store.dropped == 2 and store.nbytes <= store.max_bytes
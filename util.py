@@ -6,6 +6,8 @@ from logzero import logger
 import os
 import json
 
+import candleDecoder as cd
+
 
 
 # Function to fetch historical data
@@ -41,6 +43,29 @@ def fetch_historical_data(smartApi, exchange, symboltoken, interval, fromdate, t
 
 
 
+def fetch_candles(smartApi, exchange, symboltoken, interval, fromdate, todate):
+    """
+    Fetch historical candles as typed arrays.
+
+    Parameters:
+        smartApi (SmartConnect): SmartAPI instance.
+        exchange (str): Exchange name (e.g., NSE, BSE).
+        symboltoken (str): Symbol token of the stock.
+        interval (str): Time interval (e.g., ONE_MINUTE, ONE_DAY).
+        fromdate (str): Start date in "YYYY-MM-DD HH:MM" format.
+        todate (str): End date in "YYYY-MM-DD HH:MM" format.
+
+    Returns:
+        tuple: (ts, ohlc, volume) as decoded by candleDecoder.decode; candleDecoder.to_frame gives the DataFrame.
+        None: If the request fails.
+    """
+    hist_data = fetch_historical_data(smartApi, exchange, symboltoken, interval, fromdate, todate)
+    if not hist_data or not hist_data.get('status'):
+        return None
+    return cd.decode(hist_data['data'])
+
+
+
 
 
 
@@ -0,0 +1,251 @@
+# warmHost.py
+import json
+import os
+import re
+import runpy
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+import runtime as rt
+
+
+SOCKET_PATH = 'warmHost.sock'
+
+# Heavy imports of the strategies, profiled by benchmark()
+PROFILED_MODULES = ['numpy', 'pandas', 'SmartApi', 'pandas_ta', 'yaml', 'pyotp', 'requests',
+                    'scripMaster', 'instrumentIndex', 'candleCache', 'indicators']
+
+
+def _run_script(script, args):
+    # Runs in the forked child; returns the exit code
+    sys.argv = [script] + list(args)
+    try:
+        runpy.run_path(script, run_name='__main__')
+        return 0
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+
+class WarmHost:
+    """
+    Long-lived process that keeps libraries and the session loaded and the instrument store mapped.
+
+    Every `launch()` forks the host, so the strategy starts with all of it
+    already in memory (shared copy-on-write) and runs with the caller's
+    stdin/stdout/stderr and working directory, passed over a Unix socket.
+    The session and instrument store are the trading day's: the first
+    launch on a new day warms the host again before forking.
+    """
+
+    def __init__(self, path=SOCKET_PATH, session=True):
+        self.path = os.path.abspath(path)
+        self.session = session
+        self.day = None
+        self._sock = None
+
+    def warm(self):
+        """
+        Load everything strategies share.
+
+        Returns:
+            float: Seconds taken.
+        """
+        import scripMaster as sm
+
+        start = time.perf_counter()
+        self.day = sm.trading_day()
+        if self.session:
+            missing = rt.warm()
+        else:
+            missing = [m for m in PROFILED_MODULES if not _try_import(m)]
+        if missing:
+            print("warmHost: not installed, left to the strategies: {}".format(', '.join(missing)))
+        return time.perf_counter() - start
+
+    def serve(self):
+        """Accept launch requests until interrupted."""
+        print("warmHost: ready in {:.2f} s on {}".format(self.warm(), self.path))
+        sys.stdout.flush()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen()
+        try:
+            while True:
+                conn, _ = self._sock.accept()
+                self._handle(conn)
+        finally:
+            self._sock.close()
+            os.unlink(self.path)
+
+    def _handle(self, conn):
+        import scripMaster as sm
+
+        message, fds, _, _ = socket.recv_fds(conn, 65536, 3)
+        request = json.loads(message)
+        if self.session and sm.trading_day() != self.day:
+            print("warmHost: trading day rolled over from {}, warmed again in {:.2f} s".format(self.day, self.warm()))
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            self._sock.close()
+            conn.close()
+            for target, fd in enumerate(fds):
+                os.dup2(fd, target)
+            os.chdir(request['cwd'])
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            os._exit(_run_script(request['script'], request['args']))
+        for fd in fds:
+            os.close(fd)
+        conn.sendall((json.dumps({'pid': pid}) + '\n').encode())
+        threading.Thread(target=self._reap, args=(conn, pid), daemon=True).start()
+
+    def _reap(self, conn, pid):
+        _, status = os.waitpid(pid, 0)
+        try:
+            conn.sendall((json.dumps({'exit': os.waitstatus_to_exitcode(status)}) + '\n').encode())
+        finally:
+            conn.close()
+
+
+def _try_import(name):
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+
+def launch(script, args=(), path=SOCKET_PATH):
+    """
+    Run a strategy script in the warm host, or here if no host is running.
+
+    Parameters:
+        script (str): Script path.
+        args (list, optional): Script arguments.
+        path (str, optional): Host socket. Defaults to SOCKET_PATH.
+
+    Returns:
+        int: The script's exit code.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return _run_script(script, args)
+
+    request = {'script': os.path.abspath(script), 'args': list(args), 'cwd': os.getcwd()}
+    socket.send_fds(sock, [json.dumps(request).encode()], [0, 1, 2])
+    replies = sock.makefile('r')
+    pid = json.loads(replies.readline())['pid']
+    while True:
+        try:
+            line = replies.readline()
+            break
+        except KeyboardInterrupt:
+            # Ctrl-C stops the strategy, not just this client
+            os.kill(pid, signal.SIGINT)
+    sock.close()
+    return json.loads(line)['exit'] if line else 1
+
+
+def import_times(modules=PROFILED_MODULES):
+    """
+    Measure the cold import time of modules, each in a fresh interpreter.
+
+    Parameters:
+        modules (list, optional): Module names. Defaults to PROFILED_MODULES.
+
+    Returns:
+        dict: Module -> cumulative import milliseconds, None if not installed.
+    """
+    times = {}
+    for name in modules:
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + name],
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode:
+            times[name] = None
+            continue
+        # "import time: self [us] | cumulative | imported package"; the module itself is the last line naming it
+        rows = re.findall(r'import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)', result.stderr)
+        times[name] = next(int(us) / 1e3 for us, indent, module in reversed(rows) if module == name and not indent)
+    return times
+
+
+def benchmark(repeat=5):
+    """
+    Profile imports, then compare starting a script cold with launching it in a warm host.
+
+    Parameters:
+        repeat (int, optional): Starts to average. Defaults to 5.
+
+    Returns:
+        dict: Import milliseconds per module, cold and warm start milliseconds.
+    """
+    import tempfile
+
+    times = import_times()
+    print("cold import (ms):")
+    for name, ms in sorted(times.items(), key=lambda t: -(t[1] or 0)):
+        print("  {:<16} {}".format(name, 'not installed' if ms is None else '{:8.1f}'.format(ms)))
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        probe = os.path.join(tmp, 'probe.py')
+        with open(probe, 'w') as file:
+            file.write("import sys\nsys.path.insert(0, {!r})\n".format(here) +
+                       "".join("try:\n    import {}\nexcept ImportError:\n    pass\n".format(m) for m in PROFILED_MODULES) +
+                       "print('probe ran')\n")
+        socket_path = os.path.join(tmp, 'host.sock')
+        env = dict(os.environ, PYTHONPATH=here)
+
+        def timed(cmd):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                subprocess.run(cmd, check=True, capture_output=True, cwd=tmp, env=env)
+            return (time.perf_counter() - start) / repeat * 1e3
+
+        cold_ms = timed([sys.executable, probe])
+        host = subprocess.Popen([sys.executable, '-c', 'import warmHost; warmHost.WarmHost({!r}, session=False).serve()'.format(socket_path)],
+                                cwd=tmp, env=env, stdout=subprocess.PIPE, text=True)
+        print(host.stdout.readline().strip())
+        while not os.path.exists(socket_path):
+            time.sleep(0.01)
+        warm_ms = timed([sys.executable, os.path.join(here, 'warmHost.py'), 'run', probe, '--socket', socket_path])
+        host.terminate()
+        host.wait()
+
+    print("start a strategy, cold      : {:.0f} ms".format(cold_ms))
+    print("start a strategy, warm host : {:.0f} ms".format(warm_ms))
+    return {'imports_ms': times, 'cold_ms': cold_ms, 'warm_ms': warm_ms}
+
+
+if __name__ == "__main__":
+    # python warmHost.py serve | run <script> [args] [--socket path] | benchmark
+    argv = sys.argv[1:]
+    path = SOCKET_PATH
+    if '--socket' in argv:
+        i = argv.index('--socket')
+        path = argv[i + 1]
+        del argv[i:i + 2]
+    command = argv[0] if argv else 'benchmark'
+    if command == 'serve':
+        WarmHost(path).serve()
+    elif command == 'run':
+        sys.exit(launch(argv[1], argv[2:], path))
+    else:
+        benchmark()